@@ -0,0 +1,1178 @@
+"""
+assessment_store.py — SQLite storage for Page 2 pipeline runs.
+
+Every run of the AI risk assessment is one row of `assessments`, keyed
+by the XYZ tile (zoom, tile_x, tile_y) of its location, so every click
+inside an analysed tile is a cache hit. The database runs in WAL mode,
+so sessions can read while another writes; writes take the write lock
+(BEGIN IMMEDIATE), so rows from concurrent sessions never interleave.
+
+The other tables:
+
+- `descriptions` and `risks`: caches of the image and text model stages;
+- `prompts` and `texts`: every prompt version and every text, stored once;
+- `tile_stats`: pixel statistics of analysed images (see prescreen.py);
+- `stage_timings`: duration of every stage of a run (see timing.py);
+- `assessment_locations`: R*Tree of the latest run of each tile, for the map;
+- `assessment_countries`: country and indicators of each run (see countries.py);
+- `jobs`: queue of analyses run by background workers (see jobs.py).
+
+Schema upgrades are applied in order from _MIGRATIONS. The legacy CSV
+log (database/images.csv) is imported on first open and can be kept as
+an export (see models.yaml, database.csv_export).
+"""
+
+import csv
+import hashlib
+import logging
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+if __package__:
+    from .tiles import mercator, tile_for
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from tiles import mercator, tile_for
+
+logger = logging.getLogger(__name__)
+
+# Column order of a pipeline-run record — also the header of the CSV export
+COLUMNS = [
+    "timestamp",
+    "latitude",
+    "longitude",
+    "zoom",
+    "image_path",
+    "image_prompt",
+    "image_model",
+    "image_description",
+    "text_prompt",
+    "text_model",
+    "text_description",
+    "danger",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assessments (
+    id                INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp         TEXT NOT NULL,
+    latitude          REAL NOT NULL,
+    longitude         REAL NOT NULL,
+    zoom              INTEGER NOT NULL,
+    image_path        TEXT,
+    image_prompt      TEXT,
+    image_model       TEXT,
+    image_description TEXT,
+    text_prompt       TEXT,
+    text_model        TEXT,
+    text_description  TEXT,
+    danger            TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _add_tile_columns(conn: sqlite3.Connection) -> None:
+    """Schema version 2: key every run by its XYZ tile."""
+    conn.execute("ALTER TABLE assessments ADD COLUMN tile_x INTEGER")
+    conn.execute("ALTER TABLE assessments ADD COLUMN tile_y INTEGER")
+    conn.execute("CREATE INDEX idx_assessments_tile ON assessments (zoom, tile_x, tile_y)")
+
+
+def _add_stage_caches(conn: sqlite3.Connection) -> None:
+    """Schema version 3: separate caches for the image-description and risk stages."""
+    conn.execute("ALTER TABLE assessments ADD COLUMN image_sha256 TEXT")
+    conn.execute("""
+        CREATE TABLE descriptions (
+            image_sha256  TEXT NOT NULL,
+            image_model   TEXT NOT NULL,
+            prompt_sha256 TEXT NOT NULL,
+            description   TEXT NOT NULL,
+            created_at    TEXT NOT NULL,
+            PRIMARY KEY (image_sha256, image_model, prompt_sha256)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE risks (
+            description_sha256 TEXT NOT NULL,
+            text_model         TEXT NOT NULL,
+            prompt_sha256      TEXT NOT NULL,
+            risk_text          TEXT NOT NULL,
+            created_at         TEXT NOT NULL,
+            PRIMARY KEY (description_sha256, text_model, prompt_sha256)
+        )
+    """)
+    _add_risks_from_runs(conn)
+
+
+def _text_template(text_prompt: str, description: str, templates=()) -> "str | None":
+    """Return the template a run's text prompt was filled from, or None if it cannot be told.
+
+    A known template that fills in to the prompt is returned as is.
+    Otherwise the description must occur exactly once in the prompt, and
+    that occurrence is the placeholder: a description also found in the
+    fixed text of the template (e.g. "forest") leaves it ambiguous.
+    """
+    for template in templates:
+        if "{description}" in template and template.replace("{description}", description) == text_prompt:
+            return template
+    if text_prompt.count(description) == 1:
+        prefix, suffix = text_prompt.split(description)
+        return f"{prefix}{{description}}{suffix}"
+    return None
+
+
+def _text_templates(conn: sqlite3.Connection) -> list[str]:
+    """Return the stored text prompt templates, newest first."""
+    return [row[0] for row in conn.execute("SELECT prompt FROM prompts WHERE kind = 'text' ORDER BY id DESC")]
+
+
+def _risk_entries(runs, templates=()) -> list[tuple]:
+    """Return risk-cache entries (description SHA-256, text model, prompt SHA-256, risk text, timestamp) for runs.
+
+    The prompt is identified by the template the run's text prompt was
+    filled from (see _text_template); runs whose template cannot be told
+    are left out.
+    """
+    entries = []
+    for run in runs:
+        if not (run["image_description"] and run["text_prompt"] and run["text_description"]):
+            continue
+        template = _text_template(run["text_prompt"], run["image_description"], templates)
+        if template is not None:
+            entries.append((
+                sha256_text(run["image_description"]), run["text_model"], sha256_text(template),
+                run["text_description"], run["timestamp"],
+            ))
+    return entries
+
+
+def _add_risks_from_runs(conn: sqlite3.Connection) -> None:
+    """Seed the risk cache from stored runs (layout of schema version 3, text inline)."""
+    rows = conn.execute(
+        "SELECT timestamp, image_description, text_prompt, text_model, text_description FROM assessments"
+    ).fetchall()
+    conn.executemany("INSERT OR IGNORE INTO risks VALUES (?, ?, ?, ?, ?)", _risk_entries(rows))
+
+
+def _add_jobs(conn: sqlite3.Connection) -> None:
+    """Schema version 4: persistent queue of analyses run by background workers."""
+    conn.execute("""
+        CREATE TABLE jobs (
+            id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_key   TEXT NOT NULL UNIQUE,
+            latitude  REAL NOT NULL,
+            longitude REAL NOT NULL,
+            zoom      INTEGER NOT NULL,
+            status    TEXT NOT NULL,
+            submitted TEXT NOT NULL,
+            started   TEXT,
+            finished  TEXT,
+            error     TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX idx_jobs_status ON jobs (status, id)")
+
+
+def _add_tile_stats(conn: sqlite3.Connection) -> None:
+    """Schema version 5: pixel statistics of analysed images and the pre-screen rule of each run."""
+    conn.execute("ALTER TABLE assessments ADD COLUMN prescreen TEXT")
+    conn.execute("""
+        CREATE TABLE tile_stats (
+            image_sha256 TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            water        REAL NOT NULL,
+            vegetation   REAL NOT NULL,
+            bare         REAL NOT NULL,
+            cloud        REAL NOT NULL,
+            entropy      REAL NOT NULL,
+            brightness   REAL NOT NULL,
+            created_at   TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_tile_stats_content ON tile_stats (content_hash)")
+
+
+def _add_stage_timings(conn: sqlite3.Connection) -> None:
+    """Schema version 6: duration, model timings and token counts of every stage of a run."""
+    conn.execute("""
+        CREATE TABLE stage_timings (
+            assessment_id       INTEGER NOT NULL REFERENCES assessments (id),
+            stage               TEXT NOT NULL,
+            seconds             REAL NOT NULL,
+            model               TEXT,
+            load_seconds        REAL,
+            inference_seconds   REAL,
+            first_token_seconds REAL,
+            prompt_tokens       INTEGER,
+            output_tokens       INTEGER,
+            PRIMARY KEY (assessment_id, stage)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_stage_timings_stage ON stage_timings (stage, model)")
+
+
+def _add_prompts_and_texts(conn: sqlite3.Connection) -> None:
+    """Schema version 7: prompts and texts stored once, referenced by id.
+
+    Runs keep their inline text until AssessmentStore.compact() moves it;
+    the stage caches are rebuilt here to reference `texts`.
+    """
+    conn.execute("""
+        CREATE TABLE prompts (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind          TEXT NOT NULL,
+            version       INTEGER NOT NULL,
+            prompt        TEXT NOT NULL,
+            prompt_sha256 TEXT NOT NULL,
+            created_at    TEXT NOT NULL,
+            UNIQUE (kind, prompt_sha256),
+            UNIQUE (kind, version)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE texts (
+            id         INTEGER PRIMARY KEY,
+            sha256     TEXT NOT NULL UNIQUE,
+            compressed INTEGER NOT NULL,
+            body       BLOB NOT NULL
+        )
+    """)
+    for column in PROMPT_ID_COLUMNS.values():
+        conn.execute(f"ALTER TABLE assessments ADD COLUMN {column} INTEGER REFERENCES prompts (id)")
+    for column in TEXT_ID_COLUMNS.values():
+        conn.execute(f"ALTER TABLE assessments ADD COLUMN {column} INTEGER REFERENCES texts (id)")
+
+    descriptions = conn.execute("SELECT * FROM descriptions").fetchall()
+    risks = conn.execute("SELECT * FROM risks").fetchall()
+    conn.execute("DROP TABLE descriptions")
+    conn.execute("DROP TABLE risks")
+    conn.execute("""
+        CREATE TABLE descriptions (
+            image_sha256  TEXT NOT NULL,
+            image_model   TEXT NOT NULL,
+            prompt_sha256 TEXT NOT NULL,
+            text_id       INTEGER NOT NULL REFERENCES texts (id),
+            created_at    TEXT NOT NULL,
+            PRIMARY KEY (image_sha256, image_model, prompt_sha256)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE risks (
+            description_sha256 TEXT NOT NULL,
+            text_model         TEXT NOT NULL,
+            prompt_sha256      TEXT NOT NULL,
+            text_id            INTEGER NOT NULL REFERENCES texts (id),
+            created_at         TEXT NOT NULL,
+            PRIMARY KEY (description_sha256, text_model, prompt_sha256)
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO descriptions VALUES (?, ?, ?, ?, ?)",
+        [
+            (row["image_sha256"], row["image_model"], row["prompt_sha256"],
+             _text_id(conn, row["description"], compress=False), row["created_at"])
+            for row in descriptions
+        ],
+    )
+    _put_risks(conn, [tuple(row) for row in risks], compress=False)
+
+
+def _add_location_index(conn: sqlite3.Connection) -> None:
+    """Schema version 8: R*Tree index on the latest run of every tile (kept up to date by _index_locations)."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE assessment_locations USING rtree (
+            id, min_lat, max_lat, min_lon, max_lon,
+            +latitude, +longitude, +mercator_x, +mercator_y, +zoom, +danger, +timestamp, +prescreen
+        )
+    """)
+
+
+def _add_assessment_countries(conn: sqlite3.Connection) -> None:
+    """Schema version 9: country and latest Page 1 indicators of every run's location."""
+    conn.execute("""
+        CREATE TABLE assessment_countries (
+            assessment_id       INTEGER PRIMARY KEY REFERENCES assessments (id),
+            iso3                TEXT,
+            forest_cover        REAL,
+            forest_cover_year   INTEGER,
+            deforestation       REAL,
+            deforestation_year  INTEGER,
+            land_protected      REAL,
+            land_protected_year INTEGER,
+            resolved_at         TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_assessment_countries_iso3 ON assessment_countries (iso3)")
+
+
+def _add_pixel_hash(conn: sqlite3.Connection) -> None:
+    """Schema version 10: exact pixel hash of analysed images, the key for sharing descriptions."""
+    conn.execute("ALTER TABLE tile_stats ADD COLUMN pixel_sha256 TEXT")
+    conn.execute("CREATE INDEX idx_tile_stats_pixels ON tile_stats (pixel_sha256)")
+
+
+def _add_job_runs(conn: sqlite3.Connection) -> None:
+    """Schema version 11: the run each finished job logged (or reused)."""
+    conn.execute("ALTER TABLE jobs ADD COLUMN run_id INTEGER")
+
+
+# Schema upgrades, applied in order; migration i brings the database to version i + 2
+# (version 1 is _SCHEMA). The current version is kept in PRAGMA user_version.
+_MIGRATIONS = [
+    _add_tile_columns, _add_stage_caches, _add_jobs, _add_tile_stats, _add_stage_timings, _add_prompts_and_texts,
+    _add_location_index, _add_assessment_countries, _add_pixel_hash, _add_job_runs,
+]
+
+# Columns of tile_stats besides image_sha256 and created_at
+STAT_COLUMNS = ["content_hash", "water", "vegetation", "bare", "cloud", "entropy", "brightness", "pixel_sha256"]
+
+# Columns of stage_timings besides assessment_id (the fields of timing.Span)
+TIMING_COLUMNS = [
+    "stage", "seconds", "model", "load_seconds", "inference_seconds",
+    "first_token_seconds", "prompt_tokens", "output_tokens",
+]
+
+# Page 1 datasets (OkavangoData attributes) stored with the country of a run
+INDICATORS = ["forest_cover", "deforestation", "land_protected"]
+
+# Columns of assessment_countries besides assessment_id and resolved_at
+COUNTRY_COLUMNS = ["iso3"] + [column for name in INDICATORS for column in (name, f"{name}_year")]
+
+# Text columns of assessments -> column referencing the same text in `texts`
+TEXT_ID_COLUMNS = {"image_description": "image_description_id", "text_description": "text_description_id"}
+
+# Prompt columns of assessments -> column referencing the prompt (text prompts: the template) in `prompts`
+PROMPT_ID_COLUMNS = {"image_prompt": "image_prompt_id", "text_prompt": "text_prompt_id"}
+
+# Columns written for a new run (besides tile_x, tile_y, image_sha256 and prescreen)
+_STORED_COLUMNS = COLUMNS + list(PROMPT_ID_COLUMNS.values()) + list(TEXT_ID_COLUMNS.values())
+
+COMPRESS_MIN_LENGTH = 200  # shorter texts are stored as they are; zlib gains little on them
+
+# Runs with their prompts and texts filled back in, whether stored inline or by id
+_RUNS = """
+    SELECT a.id, a.timestamp, a.latitude, a.longitude, a.zoom, a.image_path,
+           COALESCE(a.image_prompt, ip.prompt) AS image_prompt,
+           a.image_model,
+           COALESCE(a.image_description, inflate(d.body, d.compressed)) AS image_description,
+           COALESCE(
+               a.text_prompt,
+               replace(tp.prompt, '{description}', COALESCE(a.image_description, inflate(d.body, d.compressed)))
+           ) AS text_prompt,
+           a.text_model,
+           COALESCE(a.text_description, inflate(r.body, r.compressed)) AS text_description,
+           a.danger, a.tile_x, a.tile_y, a.image_sha256, a.prescreen
+    FROM assessments AS a
+    LEFT JOIN prompts AS ip ON ip.id = a.image_prompt_id
+    LEFT JOIN prompts AS tp ON tp.id = a.text_prompt_id
+    LEFT JOIN texts AS d ON d.id = a.image_description_id
+    LEFT JOIN texts AS r ON r.id = a.text_description_id
+"""
+
+# R*Tree condition for entries intersecting a box; parameters south, north, west, east
+_IN_BOX = "max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?"
+
+# Life cycle of a job: queued -> running -> done | failed (failed jobs are queued again on resubmit)
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED = "queued", "running", "done", "failed"
+
+
+def sha256_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a string (UTF-8)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    """Return the SHA-256 hex digest of raw bytes, e.g. an image."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _backfill_tiles(conn: sqlite3.Connection) -> int:
+    """Compute tile_x/tile_y for rows stored without them; return the number of rows updated."""
+    rows = conn.execute(
+        "SELECT id, latitude, longitude, zoom FROM assessments WHERE tile_x IS NULL"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE assessments SET tile_x = ?, tile_y = ? WHERE id = ?",
+        [(*tile_for(row["latitude"], row["longitude"], row["zoom"]), row["id"]) for row in rows],
+    )
+    return len(rows)
+
+
+def _inflate(body, compressed) -> "str | None":
+    """Decode the body of a `texts` row (registered as the SQL function inflate)."""
+    if body is None:
+        return None
+    return zlib.decompress(body).decode("utf-8") if compressed else body
+
+
+def _deflate(text: str, compress: bool) -> "tuple[int, str | bytes]":
+    """Return (compressed flag, body) to store a text, compressing it only if that makes it smaller."""
+    if compress and len(text) >= COMPRESS_MIN_LENGTH:
+        packed = zlib.compress(text.encode("utf-8"), 9)
+        if len(packed) < len(text.encode("utf-8")):
+            return 1, packed
+    return 0, text
+
+
+def _text_id(conn: sqlite3.Connection, text: str, compress: bool) -> int:
+    """Return the id of a text in `texts`, storing it first if it is new."""
+    digest = sha256_text(text)
+    row = conn.execute("SELECT id FROM texts WHERE sha256 = ?", (digest,)).fetchone()
+    if row is not None:
+        return row[0]
+    return conn.execute(
+        "INSERT INTO texts (sha256, compressed, body) VALUES (?, ?, ?)", (digest, *_deflate(text, compress))
+    ).lastrowid
+
+
+def _prompt_id(conn: sqlite3.Connection, kind: str, prompt: str) -> int:
+    """Return the id of a prompt of a kind ("image" or "text"), storing it as the next version if it is new."""
+    digest = sha256_text(prompt)
+    row = conn.execute("SELECT id FROM prompts WHERE kind = ? AND prompt_sha256 = ?", (kind, digest)).fetchone()
+    if row is not None:
+        return row[0]
+    version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM prompts WHERE kind = ?", (kind,)).fetchone()[0]
+    return conn.execute(
+        "INSERT INTO prompts (kind, version, prompt, prompt_sha256, created_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, version, prompt, digest, datetime.now().isoformat(timespec="seconds")),
+    ).lastrowid
+
+
+def _normalised(conn: sqlite3.Connection, record: dict, compress: bool, templates=()) -> dict:
+    """Return a run with its prompts and texts replaced by ids (storing them as needed).
+
+    The text prompt is stored as its template: the record's own
+    `text_template` if it has one, else the one found by _text_template
+    among `templates`. If the template cannot be told, the prompt stays
+    inline, as do empty values.
+    """
+    run = dict(record)
+    description = run.get("image_description")
+    if run.get("image_prompt"):
+        run["image_prompt_id"], run["image_prompt"] = _prompt_id(conn, "image", run["image_prompt"]), None
+    text_prompt = run.get("text_prompt")
+    if text_prompt and description:
+        known = [run["text_template"]] if run.get("text_template") else templates
+        template = _text_template(text_prompt, description, known)
+        if template is not None:
+            run["text_prompt_id"], run["text_prompt"] = _prompt_id(conn, "text", template), None
+    for column, id_column in TEXT_ID_COLUMNS.items():
+        if run.get(column):
+            run[id_column], run[column] = _text_id(conn, run[column], compress), None
+    return run
+
+
+def _put_risks(conn: sqlite3.Connection, entries: list[tuple], compress: bool) -> None:
+    """Store risk-cache entries (as returned by _risk_entries) that are not cached yet."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO risks VALUES (?, ?, ?, ?, ?)",
+        [(digest, model, prompt, _text_id(conn, text, compress), at) for digest, model, prompt, text, at in entries],
+    )
+
+
+def _index_location(conn: sqlite3.Connection, run_id: int, run) -> None:
+    """Put a run in the location index, replacing the earlier runs of its tile."""
+    conn.execute(
+        "DELETE FROM assessment_locations WHERE id IN "
+        "(SELECT id FROM assessments WHERE zoom = ? AND tile_x = ? AND tile_y = ? AND id != ?)",
+        (run["zoom"], run["tile_x"], run["tile_y"], run_id),
+    )
+    latitude, longitude = float(run["latitude"]), float(run["longitude"])
+    conn.execute(
+        "INSERT OR REPLACE INTO assessment_locations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (run_id, latitude, latitude, longitude, longitude, latitude, longitude,
+         *mercator(latitude, longitude), run["zoom"], run["danger"], run["timestamp"], run["prescreen"]),
+    )
+
+
+def _index_locations(conn: sqlite3.Connection) -> int:
+    """Bring the location index up to date with rows written without it (e.g. imported); return the rows added."""
+    newest = "SELECT MAX(id) FROM {}"
+    if conn.execute(newest.format("assessments")).fetchone()[0] == conn.execute(
+        newest.format("assessment_locations")
+    ).fetchone()[0]:
+        return 0  # append indexes every run, so the newest run being indexed means all are
+    latest = "SELECT MAX(id) FROM assessments GROUP BY zoom, tile_x, tile_y"
+    conn.execute(f"DELETE FROM assessment_locations WHERE id NOT IN ({latest})")
+    rows = conn.execute(
+        f"SELECT * FROM assessments AS a WHERE a.id IN ({latest}) "
+        "AND NOT EXISTS (SELECT 1 FROM assessment_locations AS l WHERE l.id = a.id)"
+    ).fetchall()
+    for row in rows:
+        _index_location(conn, row["id"], row)
+    return len(rows)
+
+
+# serialises appends to the CSV export within this process
+_csv_lock = threading.Lock()
+
+
+class AssessmentStore:
+    """Embedded SQLite store of pipeline runs.
+
+    Parameters
+    ----------
+    path : Path
+        SQLite database file (created if missing).
+    legacy_csv : Path, optional
+        CSV log to import once into an empty store.
+    compress : bool
+        Store new descriptions and risk texts zlib-compressed (when that
+        makes them smaller).
+    """
+
+    def __init__(self, path: Path, legacy_csv: "Path | None" = None, compress: bool = True) -> None:
+        self.path = Path(path)
+        self.compress = compress
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        self._upgrade()
+        if legacy_csv is not None:
+            self.migrate_from_csv(legacy_csv)
+
+    # -----------------------------------------------------------------------
+    # Connections
+    # -----------------------------------------------------------------------
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a short-lived autocommit connection."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("inflate", 2, _inflate, deterministic=True)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Yield a connection holding the database write lock for one transaction."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # -----------------------------------------------------------------------
+    # Migration and export
+    # -----------------------------------------------------------------------
+
+    def _upgrade(self) -> None:
+        """Apply pending schema migrations and backfill derived columns."""
+        with self._write() as conn:
+            version = max(conn.execute("PRAGMA user_version").fetchone()[0], 1)
+            for target, migration in enumerate(_MIGRATIONS, start=2):
+                if version < target:
+                    migration(conn)
+                    logger.info("Upgraded %s to schema version %d", self.path, target)
+            conn.execute(f"PRAGMA user_version = {len(_MIGRATIONS) + 1}")
+            backfilled = _backfill_tiles(conn)
+            indexed = _index_locations(conn)
+        if backfilled:
+            logger.info("Backfilled tile keys for %d rows", backfilled)
+        if indexed:
+            logger.info("Indexed the locations of %d rows", indexed)
+
+    def migrate_from_csv(self, csv_path: Path) -> int:
+        """Import the rows of a legacy CSV log, once.
+
+        Parameters
+        ----------
+        csv_path : Path
+            CSV file with the columns in COLUMNS.
+
+        Returns
+        -------
+        int
+            Number of imported rows (0 if already migrated or no CSV exists).
+        """
+        csv_path = Path(csv_path)
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+                return 0
+            rows = []
+            if csv_path.exists():
+                df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+                rows = [
+                    {column: record.get(column) or None for column in COLUMNS}
+                    for record in df.to_dict("records")
+                ]
+                templates = _text_templates(conn)
+                conn.executemany(
+                    f"INSERT INTO assessments ({', '.join(_STORED_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in _STORED_COLUMNS)})",
+                    [
+                        [run.get(column) for column in _STORED_COLUMNS]
+                        for run in (_normalised(conn, row, self.compress, templates) for row in rows)
+                    ],
+                )
+                _backfill_tiles(conn)
+                _index_locations(conn)
+                # the CSV rows arrive after the schema upgrade, so seed the risk cache from them now
+                _put_risks(conn, _risk_entries(rows, templates), self.compress)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', ?)", (str(csv_path),))
+        if rows:
+            logger.info("Migrated %d rows from %s into %s", len(rows), csv_path, self.path)
+        return len(rows)
+
+    def seed_description_cache(self, image_root: Path) -> int:
+        """Fill the description cache from earlier runs whose tile image is still on disk.
+
+        Parameters
+        ----------
+        image_root : Path
+            Directory that the stored image paths are relative to.
+
+        Returns
+        -------
+        int
+            Number of runs whose image hash was recorded.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, timestamp, image_path, image_model, image_prompt, image_description FROM ({_RUNS}) "
+                "WHERE image_sha256 IS NULL AND image_path IS NOT NULL AND image_description IS NOT NULL"
+            ).fetchall()
+        seeded = []
+        for row in rows:
+            image_path = Path(image_root) / row["image_path"]
+            if image_path.exists():
+                seeded.append((row, sha256_bytes(image_path.read_bytes())))
+        if not seeded:
+            return 0
+        with self._write() as conn:
+            conn.executemany(
+                "UPDATE assessments SET image_sha256 = ? WHERE id = ?",
+                [(image_sha, row["id"]) for row, image_sha in seeded],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO descriptions VALUES (?, ?, ?, ?, ?)",
+                [
+                    (image_sha, row["image_model"], sha256_text(row["image_prompt"] or ""),
+                     _text_id(conn, row["image_description"], self.compress), row["timestamp"])
+                    for row, image_sha in seeded
+                ],
+            )
+        return len(seeded)
+
+    def export_csv(self, csv_path: Path) -> int:
+        """Write all stored runs to a CSV file (overwriting it).
+
+        Parameters
+        ----------
+        csv_path : Path
+            Destination file.
+
+        Returns
+        -------
+        int
+            Number of exported rows.
+        """
+        df = self.records()
+        df.to_csv(csv_path, index=False)
+        return len(df)
+
+    @staticmethod
+    def append_csv(csv_path: Path, record: dict) -> None:
+        """Append one record to a CSV export, writing the header for a new file.
+
+        Parameters
+        ----------
+        csv_path : Path
+            CSV export file.
+        record : dict
+            Keys must match COLUMNS.
+        """
+        csv_path = Path(csv_path)
+        with _csv_lock:
+            new_file = not csv_path.exists()
+            with open(csv_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(record)
+
+    # -----------------------------------------------------------------------
+    # Reads and writes
+    # -----------------------------------------------------------------------
+
+    def lookup(self, latitude: float, longitude: float, zoom: int) -> "dict | None":
+        """Return the most recent run for the tile containing (latitude, longitude).
+
+        Parameters
+        ----------
+        latitude : float
+            Latitude of the requested location.
+        longitude : float
+            Longitude of the requested location.
+        zoom : int
+            Zoom level of the requested tile.
+
+        Returns
+        -------
+        dict or None
+            Most recent record of that tile, or None if no cache entry exists.
+        """
+        return self.lookup_tile(zoom, *tile_for(latitude, longitude, zoom))
+
+    def lookup_tile(self, zoom: int, tile_x: int, tile_y: int) -> "dict | None":
+        """Return the most recent run for the XYZ tile (zoom, tile_x, tile_y), or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"{_RUNS} WHERE a.zoom = ? AND a.tile_x = ? AND a.tile_y = ? ORDER BY a.id DESC LIMIT 1",
+                (zoom, tile_x, tile_y),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def append(self, record: dict) -> int:
+        """Store one pipeline-run record, keyed by the tile of its location.
+
+        Parameters
+        ----------
+        record : dict
+            Keys must match COLUMNS, optionally plus image_sha256, prescreen,
+            text_template (the template text_prompt was filled from) and
+            timings (a list of dicts with the keys in TIMING_COLUMNS).
+            Prompts and texts are stored once, in `prompts` and `texts`.
+
+        Returns
+        -------
+        int
+            Id of the new row.
+        """
+        tile_x, tile_y = tile_for(record["latitude"], record["longitude"], record["zoom"])
+        with self._write() as conn:
+            run = _normalised(conn, record, self.compress)
+            cursor = conn.execute(
+                f"INSERT INTO assessments ({', '.join(_STORED_COLUMNS)}, tile_x, tile_y, image_sha256, prescreen) "
+                f"VALUES ({', '.join('?' for _ in _STORED_COLUMNS)}, ?, ?, ?, ?)",
+                [run.get(column) for column in _STORED_COLUMNS]
+                + [tile_x, tile_y, run.get("image_sha256"), run.get("prescreen")],
+            )
+            _index_location(
+                conn, cursor.lastrowid, {**run, "tile_x": tile_x, "tile_y": tile_y, "prescreen": run.get("prescreen")},
+            )
+            conn.executemany(
+                f"INSERT INTO stage_timings (assessment_id, {', '.join(TIMING_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in TIMING_COLUMNS)})",
+                [
+                    [cursor.lastrowid] + [span.get(column) for column in TIMING_COLUMNS]
+                    for span in record.get("timings") or []
+                ],
+            )
+        return cursor.lastrowid
+
+    # -----------------------------------------------------------------------
+    # Stage caches
+    # -----------------------------------------------------------------------
+
+    def get_description(self, image_sha256: str, image_model: str, image_prompt: str) -> "str | None":
+        """Return the cached description of an image by a model and prompt, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT inflate(t.body, t.compressed) AS description FROM descriptions AS c "
+                "JOIN texts AS t ON t.id = c.text_id "
+                "WHERE c.image_sha256 = ? AND c.image_model = ? AND c.prompt_sha256 = ?",
+                (image_sha256, image_model, sha256_text(image_prompt)),
+            ).fetchone()
+        return row["description"] if row is not None else None
+
+    def put_description(self, image_sha256: str, image_model: str, image_prompt: str, description: str) -> None:
+        """Cache the description produced for an image by a model and prompt."""
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?, ?, ?)",
+                (image_sha256, image_model, sha256_text(image_prompt), _text_id(conn, description, self.compress),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def get_risk(self, description: str, text_model: str, text_prompt: str) -> "str | None":
+        """Return the cached risk text for a description, text model and prompt template, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT inflate(t.body, t.compressed) AS risk_text FROM risks AS c "
+                "JOIN texts AS t ON t.id = c.text_id "
+                "WHERE c.description_sha256 = ? AND c.text_model = ? AND c.prompt_sha256 = ?",
+                (sha256_text(description), text_model, sha256_text(text_prompt)),
+            ).fetchone()
+        return row["risk_text"] if row is not None else None
+
+    def put_risk(self, description: str, text_model: str, text_prompt: str, risk_text: str) -> None:
+        """Cache the risk text produced for a description by a text model and prompt template."""
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO risks VALUES (?, ?, ?, ?, ?)",
+                (sha256_text(description), text_model, sha256_text(text_prompt),
+                 _text_id(conn, risk_text, self.compress), datetime.now().isoformat(timespec="seconds")),
+            )
+
+    # -----------------------------------------------------------------------
+    # Tile statistics
+    # -----------------------------------------------------------------------
+
+    def put_tile_stats(self, image_sha256: str, stats: dict) -> None:
+        """Store the pixel statistics of an image (keys: STAT_COLUMNS, as in prescreen.TileStats)."""
+        with self._write() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO tile_stats (image_sha256, {', '.join(STAT_COLUMNS)}, created_at) "
+                f"VALUES (?, {', '.join('?' for _ in STAT_COLUMNS)}, ?)",
+                [image_sha256] + [stats[column] for column in STAT_COLUMNS]
+                + [datetime.now().isoformat(timespec="seconds")],
+            )
+
+    def get_tile_stats(self, image_sha256: str) -> "dict | None":
+        """Return the stored pixel statistics of an image, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(STAT_COLUMNS)} FROM tile_stats WHERE image_sha256 = ?", (image_sha256,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def duplicate_images(self, image_sha256: str) -> list[str]:
+        """Return the other images with exactly the same pixels as an image, most recent first.
+
+        Images stored before pixel hashes were recorded have none and match nothing.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT other.image_sha256 FROM tile_stats AS this "
+                "JOIN tile_stats AS other ON other.pixel_sha256 = this.pixel_sha256 "
+                "WHERE this.image_sha256 = ? AND other.image_sha256 != this.image_sha256 "
+                "ORDER BY other.created_at DESC",
+                (image_sha256,),
+            ).fetchall()
+        return [row["image_sha256"] for row in rows]
+
+    # -----------------------------------------------------------------------
+    # Job queue
+    # -----------------------------------------------------------------------
+
+    def submit_job(self, job_key: str, latitude: float, longitude: float, zoom: int) -> int:
+        """Queue an analysis, unless an identical one is already queued, running or done.
+
+        Parameters
+        ----------
+        job_key : str
+            Identifies the work (tile, models and prompts); jobs with the same
+            key are deduplicated.
+        latitude, longitude : float
+            Location to analyse.
+        zoom : int
+            Zoom level of the tile.
+
+        Returns
+        -------
+        int
+            Id of the new job, or of the existing job with the same key.
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._write() as conn:
+            row = conn.execute("SELECT id, status FROM jobs WHERE job_key = ?", (job_key,)).fetchone()
+            if row is None:
+                return conn.execute(
+                    "INSERT INTO jobs (job_key, latitude, longitude, zoom, status, submitted) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_key, latitude, longitude, zoom, JOB_QUEUED, now),
+                ).lastrowid
+            if row["status"] == JOB_FAILED:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, submitted = ?, started = NULL, finished = NULL, run_id = NULL, "
+                    "error = NULL WHERE id = ?",
+                    (JOB_QUEUED, now, row["id"]),
+                )
+            return row["id"]
+
+    def claim_job(self) -> "dict | None":
+        """Mark the oldest queued job as running and return it, or None if the queue is empty."""
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            started = datetime.now().isoformat(timespec="seconds")
+            conn.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (JOB_RUNNING, started, row["id"]))
+        return {**dict(row), "status": JOB_RUNNING, "started": started}
+
+    def finish_job(self, job_id: int, run_id: "int | None" = None, error: "str | None" = None) -> None:
+        """Mark a running job as done with the id of its run, or as failed with an error message."""
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, run_id = ?, error = ? WHERE id = ?",
+                (JOB_FAILED if error is not None else JOB_DONE,
+                 datetime.now().isoformat(timespec="seconds"), run_id, error, job_id),
+            )
+
+    def requeue_running_jobs(self) -> int:
+        """Queue again the jobs left running by a process that stopped; return how many."""
+        with self._write() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, started = NULL WHERE status = ?", (JOB_QUEUED, JOB_RUNNING)
+            ).rowcount
+
+    def jobs(self, limit: int = 20) -> list[dict]:
+        """Return the most recently submitted jobs, newest first.
+
+        Each job carries the `danger` flag of its run, None until it is done
+        (and for jobs finished before runs were recorded with them).
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT j.*, a.danger FROM jobs AS j LEFT JOIN assessments AS a ON a.id = j.run_id "
+                "ORDER BY j.submitted DESC, j.id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stage_timings(self, since: "str | None" = None) -> pd.DataFrame:
+        """Return the stage timings of all runs, with the timestamp of their run.
+
+        Parameters
+        ----------
+        since : str, optional
+            Only runs logged at or after this ISO timestamp (e.g. "2026-10-01").
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns assessment_id, timestamp and TIMING_COLUMNS, one row per stage of a run.
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                f"SELECT t.assessment_id, a.timestamp, {', '.join('t.' + c for c in TIMING_COLUMNS)} "
+                "FROM stage_timings AS t JOIN assessments AS a ON a.id = t.assessment_id "
+                "WHERE a.timestamp >= ? ORDER BY t.assessment_id, t.rowid",
+                conn,
+                params=(since or "",),
+            )
+
+    def records(self) -> pd.DataFrame:
+        """Return all stored runs, oldest first, with the columns in COLUMNS."""
+        with self._connect() as conn:
+            return pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM ({_RUNS}) ORDER BY id", conn)
+
+    # -----------------------------------------------------------------------
+    # Map viewport
+    # -----------------------------------------------------------------------
+
+    def count_in_box(self, south: float, west: float, north: float, east: float) -> int:
+        """Return the number of analysed tiles whose latest run lies inside a bounding box.
+
+        Parameters
+        ----------
+        south, west, north, east : float
+            Bounds in degrees (west <= east: split boxes crossing the antimeridian).
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM assessment_locations WHERE {_IN_BOX}", (south, north, west, east)
+            ).fetchone()[0]
+
+    def runs_in_box(self, south: float, west: float, north: float, east: float) -> pd.DataFrame:
+        """Return the latest run of every analysed tile inside a bounding box.
+
+        Only the R*Tree location index is read, so the cost depends on the
+        runs inside the box, not on the size of the log.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns id, timestamp, latitude, longitude, zoom, danger and
+            prescreen, oldest first.
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT id, timestamp, latitude, longitude, zoom, danger, prescreen FROM assessment_locations "
+                f"WHERE {_IN_BOX} ORDER BY id",
+                conn,
+                params=(south, north, west, east),
+            )
+
+    def clusters_in_box(self, south: float, west: float, north: float, east: float, zoom: int) -> pd.DataFrame:
+        """Group the runs of runs_in_box by the Web Mercator tile containing them at `zoom`.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per tile with runs: latitude and longitude (mean of its
+            runs), runs and dangers (runs with a DANGER verdict).
+        """
+        n = 2 ** int(zoom)
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT AVG(latitude) AS latitude, AVG(longitude) AS longitude, COUNT(*) AS runs, "
+                f"SUM(danger = 'Y') AS dangers FROM assessment_locations WHERE {_IN_BOX} "
+                f"GROUP BY CAST(mercator_x * {n} AS INTEGER), CAST(mercator_y * {n} AS INTEGER)",
+                conn,
+                params=(south, north, west, east),
+            )
+
+    # -----------------------------------------------------------------------
+    # Countries
+    # -----------------------------------------------------------------------
+
+    def unresolved_locations(self, refresh: bool = False) -> pd.DataFrame:
+        """Return the location of every run without a country yet (of every run, with refresh).
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns id, latitude and longitude, oldest first.
+        """
+        unresolved = "" if refresh else "WHERE id NOT IN (SELECT assessment_id FROM assessment_countries) "
+        with self._connect() as conn:
+            return pd.read_sql_query(f"SELECT id, latitude, longitude FROM assessments {unresolved}ORDER BY id", conn)
+
+    def put_countries(self, rows: pd.DataFrame) -> None:
+        """Store (or replace) the country of runs.
+
+        Parameters
+        ----------
+        rows : pd.DataFrame
+            Columns assessment_id and COUNTRY_COLUMNS (see countries.CountryIndex.enrich);
+            missing values are stored as NULL.
+        """
+        resolved_at = datetime.now().isoformat(timespec="seconds")
+        columns = ["assessment_id", *COUNTRY_COLUMNS]
+        values = rows[columns].astype(object).where(rows[columns].notna(), None)
+        params = [
+            [int(row["assessment_id"])]
+            + [int(row[c]) if c.endswith("_year") and row[c] is not None else row[c] for c in COUNTRY_COLUMNS]
+            + [resolved_at]
+            for row in values.to_dict("records")
+        ]
+        with self._write() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO assessment_countries ({', '.join(columns)}, resolved_at) "
+                f"VALUES ({', '.join('?' for _ in columns)}, ?)",
+                params,
+            )
+
+    def country_of(self, assessment_id: int) -> "dict | None":
+        """Return the stored country of a run (keys: COUNTRY_COLUMNS), or None if not resolved yet."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(COUNTRY_COLUMNS)} FROM assessment_countries WHERE assessment_id = ?",
+                (assessment_id,),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def danger_by_country(self, latest_only: bool = True) -> pd.DataFrame:
+        """Aggregate the DANGER verdicts of runs by the country of their location.
+
+        Parameters
+        ----------
+        latest_only : bool
+            Count only the latest run of every tile (as the map shows it), so
+            tiles analysed again with other models or prompts count once.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns iso3, runs, dangers, danger_rate and the indicators of
+            COUNTRY_COLUMNS as stored with the country's latest run, highest
+            DANGER rate first. Runs outside every country are left out.
+        """
+        runs = "assessment_locations" if latest_only else "assessments"
+        indicators = ", ".join(f"c.{column}" for column in COUNTRY_COLUMNS[1:])
+        with self._connect() as conn:
+            # with MAX(), SQLite takes the other bare columns from the row holding the maximum
+            return pd.read_sql_query(
+                f"SELECT c.iso3, COUNT(*) AS runs, SUM(r.danger = 'Y') AS dangers, "
+                f"AVG(r.danger = 'Y') AS danger_rate, {indicators}, MAX(c.assessment_id) AS latest_id "
+                f"FROM assessment_countries AS c JOIN {runs} AS r ON r.id = c.assessment_id "
+                "WHERE c.iso3 IS NOT NULL GROUP BY c.iso3 ORDER BY danger_rate DESC, runs DESC, c.iso3",
+                conn,
+            ).drop(columns="latest_id")
+
+    def prompts(self) -> pd.DataFrame:
+        """Return every stored prompt version (text prompts as templates), oldest first.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns id, kind ("image" or "text"), version, created_at and prompt.
+        """
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT id, kind, version, created_at, prompt FROM prompts ORDER BY kind, version", conn
+            )
+
+    # -----------------------------------------------------------------------
+    # Compaction
+    # -----------------------------------------------------------------------
+
+    def size(self) -> int:
+        """Return the size of the database on disk, in bytes (including its write-ahead log)."""
+        return sum(
+            path.stat().st_size
+            for path in (self.path, self.path.with_name(self.path.name + "-wal"))
+            if path.exists()
+        )
+
+    def compact(self) -> dict:
+        """Store the text of every run once, re-encode stored texts and shrink the file.
+
+        Runs logged before schema version 7 keep their prompts and texts
+        inline; they are moved to `prompts` and `texts`. Stored texts are
+        re-encoded with the store's compression setting, texts no longer
+        referenced are removed, and the database is vacuumed.
+
+        Returns
+        -------
+        dict
+            runs (runs moved), texts (texts re-encoded), removed (texts
+            deleted), bytes_before and bytes_after.
+        """
+        bytes_before = self.size()
+        inline = " OR ".join(f"{column} IS NOT NULL" for column in [*TEXT_ID_COLUMNS, *PROMPT_ID_COLUMNS])
+        with self._write() as conn:
+            rows = conn.execute(f"SELECT * FROM assessments WHERE {inline}").fetchall()
+            templates = _text_templates(conn)
+            runs = [_normalised(conn, dict(row), self.compress, templates) for row in rows]
+            moved = [*PROMPT_ID_COLUMNS, *PROMPT_ID_COLUMNS.values(), *TEXT_ID_COLUMNS, *TEXT_ID_COLUMNS.values()]
+            conn.executemany(
+                f"UPDATE assessments SET {', '.join(f'{column} = ?' for column in moved)} WHERE id = ?",
+                [[run.get(column) for column in moved] + [run["id"]] for run in runs],
+            )
+
+            removed = conn.execute(
+                "DELETE FROM texts WHERE id NOT IN ("
+                "SELECT image_description_id FROM assessments WHERE image_description_id IS NOT NULL "
+                "UNION SELECT text_description_id FROM assessments WHERE text_description_id IS NOT NULL "
+                "UNION SELECT text_id FROM descriptions UNION SELECT text_id FROM risks)"
+            ).rowcount
+
+            reencoded = []
+            for row in conn.execute("SELECT id, compressed, body FROM texts").fetchall():
+                compressed, body = _deflate(_inflate(row["body"], row["compressed"]), self.compress)
+                if compressed != row["compressed"]:
+                    reencoded.append((compressed, body, row["id"]))
+            conn.executemany("UPDATE texts SET compressed = ?, body = ? WHERE id = ?", reencoded)
+
+        with self._connect() as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        stats = {
+            "runs": len(runs), "texts": len(reencoded), "removed": removed,
+            "bytes_before": bytes_before, "bytes_after": self.size(),
+        }
+        logger.info("Compacted %s: %s", self.path, stats)
+        return stats
@@ -0,0 +1,167 @@
+"""
+countries.py — the country of a Page 2 location, with its Page 1 indicators.
+
+A CountryIndex puts the Natural Earth polygons that OkavangoData already
+reads (its `world` table) in a shapely STRtree, so finding the country of a
+point only tests the few polygons whose bounding boxes contain it, and a
+whole batch of points is resolved in one vectorised query
+(CountryIndex.resolve_many). Points just off the coarse 1:110m coastlines
+fall back to the nearest country within NEAREST_WITHIN degrees.
+
+Each assessment is enriched with the ISO3 code of its country and that
+country's latest forest cover, deforestation and protected-area values;
+the results are stored next to the run in the assessment store
+(AssessmentStore.put_countries), which aggregates DANGER rates by country
+(AssessmentStore.danger_by_country).
+"""
+
+import logging
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+if __package__:
+    from .assessment_store import COUNTRY_COLUMNS, INDICATORS, AssessmentStore
+    from .okavango import SCHEMAS, OkavangoData
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from assessment_store import COUNTRY_COLUMNS, INDICATORS, AssessmentStore
+    from okavango import SCHEMAS, OkavangoData
+
+logger = logging.getLogger(__name__)
+
+NEAREST_WITHIN = 0.5  # degrees; points farther than this from every country are at sea
+ENRICH_CHUNK = 50_000  # runs resolved per query when enriching the store
+
+
+def latest_indicators(panel: pd.DataFrame) -> pd.DataFrame:
+    """Return the latest value of every indicator in INDICATORS, per country.
+
+    Parameters
+    ----------
+    panel : pd.DataFrame
+        OkavangoData.panel: indexed by (Code, Year), columns (dataset, column).
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by ISO3 code, with every indicator and `<indicator>_year`
+        (the year of its latest non-missing value).
+    """
+    columns = {}
+    for name in INDICATORS:
+        values = panel[(name, SCHEMAS[name][0])].dropna().reset_index()
+        # the panel is sorted by (Code, Year), so the last row of a code is its latest year
+        latest = values.groupby("Code", observed=True).tail(1)
+        latest = latest.set_index(latest["Code"].astype(str))
+        columns[name] = latest[(name, SCHEMAS[name][0])].astype(float)
+        columns[f"{name}_year"] = latest["Year"].astype(int)
+    frame = pd.DataFrame(columns)
+    frame.columns = list(columns)  # drop the MultiIndex names the panel columns carried
+    frame.index.name = "iso3"
+    return frame
+
+
+class CountryIndex:
+    """Point-in-country lookups on the world map, with the latest indicators of each country.
+
+    Parameters
+    ----------
+    world : gpd.GeoDataFrame
+        Country polygons in longitude / latitude (OkavangoData.world), with
+        their ISO3 code in ADM0_A3 (missing for disputed areas).
+    indicators : pd.DataFrame
+        Output of latest_indicators.
+    nearest_within : float
+        Largest distance, in degrees, at which a point outside every polygon
+        still takes the nearest country.
+    """
+
+    def __init__(
+        self, world: gpd.GeoDataFrame, indicators: pd.DataFrame, nearest_within: float = NEAREST_WITHIN,
+    ) -> None:
+        self.codes = np.array([None if pd.isna(code) else str(code) for code in world["ADM0_A3"]], dtype=object)
+        self.tree = shapely.STRtree(np.asarray(world.geometry.values))
+        self.indicators = indicators
+        self.nearest_within = nearest_within
+
+    @classmethod
+    def from_data(cls, data: OkavangoData) -> "CountryIndex":
+        """Build the index from the world map and panel of OkavangoData (read on first use)."""
+        return cls(data.world, latest_indicators(data.panel))
+
+    def resolve_many(self, latitudes, longitudes) -> np.ndarray:
+        """Return the ISO3 code of the country containing every point (None at sea or in disputed areas).
+
+        All points are tested in one STRtree query; the few outside every
+        polygon are then matched to the nearest one within nearest_within.
+        """
+        points = shapely.points(np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float))
+        codes = np.full(len(points), None, dtype=object)
+        found = np.zeros(len(points), dtype=bool)
+
+        point_idx, polygon_idx = self.tree.query(points, predicate="intersects")
+        # a point on a shared border intersects both countries: keep the first
+        point_idx, first = np.unique(point_idx, return_index=True)
+        codes[point_idx] = self.codes[polygon_idx[first]]
+        found[point_idx] = True
+
+        outside = np.flatnonzero(~found)
+        if len(outside) and self.nearest_within > 0:
+            near_idx, polygon_idx = self.tree.query_nearest(points[outside], max_distance=self.nearest_within)
+            near_idx, first = np.unique(near_idx, return_index=True)
+            codes[outside[near_idx]] = self.codes[polygon_idx[first]]
+        return codes
+
+    def resolve(self, latitude: float, longitude: float) -> "str | None":
+        """Return the ISO3 code of the country containing one point (see resolve_many)."""
+        return self.resolve_many([latitude], [longitude])[0]
+
+    def enrich(self, locations: pd.DataFrame) -> pd.DataFrame:
+        """Resolve the country of stored runs and attach its latest indicators.
+
+        Parameters
+        ----------
+        locations : pd.DataFrame
+            Columns id, latitude and longitude (AssessmentStore.unresolved_locations).
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns assessment_id and COUNTRY_COLUMNS, ready for
+            AssessmentStore.put_countries; indicators are missing for runs
+            outside every country and countries without data.
+        """
+        iso3 = self.resolve_many(locations["latitude"], locations["longitude"])
+        values = self.indicators.reindex(pd.Index(iso3, dtype=object))
+        enriched = pd.DataFrame({"assessment_id": locations["id"].to_numpy(), "iso3": iso3})
+        for column in COUNTRY_COLUMNS[1:]:
+            enriched[column] = values[column].to_numpy()
+        return enriched
+
+    def describe(self, latitude: float, longitude: float) -> "dict | None":
+        """Return the ISO3 code and latest indicators of the country of a point, or None at sea."""
+        iso3 = self.resolve(latitude, longitude)
+        if iso3 is None:
+            return None
+        values = self.indicators.loc[iso3].to_dict() if iso3 in self.indicators.index else {}
+        return {"iso3": iso3, **values}
+
+
+def enrich_store(store: AssessmentStore, countries: CountryIndex, refresh: bool = False) -> int:
+    """Store the country of every run that has none yet (or of every run, with refresh).
+
+    Runs are resolved in bulk, ENRICH_CHUNK at a time.
+
+    Returns
+    -------
+    int
+        Number of runs enriched.
+    """
+    locations = store.unresolved_locations(refresh=refresh)
+    for start in range(0, len(locations), ENRICH_CHUNK):
+        store.put_countries(countries.enrich(locations.iloc[start:start + ENRICH_CHUNK]))
+    if len(locations):
+        logger.info("Resolved the country of %d runs", len(locations))
+    return len(locations)
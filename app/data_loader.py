@@ -0,0 +1,21 @@
+"""
+data_loader.py — the process-wide OkavangoData of the Streamlit app.
+
+Page 1 draws its charts from it and Page 2 builds its country lookup from
+it, so the datasets are downloaded, read and merged once per process. This
+module only imports streamlit and okavango.py, so either page can use it
+without importing the other.
+"""
+
+import streamlit as st
+
+if __package__:
+    from .okavango import OkavangoData
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from okavango import OkavangoData
+
+
+@st.cache_resource
+def load_data() -> OkavangoData:
+    """Return the OkavangoData shared by all sessions and both pages (datasets read on first use)."""
+    return OkavangoData()
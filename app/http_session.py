@@ -0,0 +1,34 @@
+"""
+http_session.py — pooled, retrying HTTP sessions.
+
+Shared by the dataset downloads (okavango.py) and the satellite tile
+downloads of Page 2 and the batch CLI, so every request to a host reuses
+an open connection and transient failures (429 / 5xx) are retried with
+exponential backoff.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def make_session(pool_size: int = 4) -> requests.Session:
+    """Creates a requests session with a pooled, retrying HTTP adapter.
+
+    Parameters
+    ----------
+    pool_size : int
+        Maximum number of connections kept open per host.
+
+    Returns
+    -------
+    requests.Session
+        Session to share between all requests (and threads) of one job.
+    """
+    session = requests.Session()
+    session.headers.update({"User-Agent": "Mozilla/5.0"})
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,115 @@
+"""
+jobs.py — background workers for the Page 2 job queue.
+
+Analyses submitted with "Add to queue" are stored in the `jobs` table of
+the assessment store, so they survive restarts, and identical requests
+(same tile, models and prompts) share one job. A fixed pool of worker
+threads, sized to what the Ollama server can run in parallel
+(ollama.parallel in models.yaml), takes the oldest queued job, runs the
+pipeline and marks it done or failed; the page only polls job status.
+
+Interactive analyses ("Analyse Area") take the same model slots, so the
+server never gets more concurrent requests than the pool allows.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+
+if __package__:
+    from .pipeline import Pipeline
+    from .timing import StageTimer
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from pipeline import Pipeline
+    from timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2.0  # seconds an idle worker waits before looking for jobs submitted by other processes
+
+
+class JobWorkers:
+    """Pool of threads running queued analyses.
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        Pipeline (and store holding the queue) used for every job.
+    workers : int
+        Number of worker threads, and of concurrent model stages.
+    """
+
+    def __init__(self, pipeline: Pipeline, workers: int = 1):
+        self.pipeline = pipeline
+        self.store = pipeline.store
+        self._model_slots = threading.BoundedSemaphore(workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self) -> "JobWorkers":
+        """Queue again jobs interrupted by a previous shutdown, then start the workers."""
+        requeued = self.store.requeue_running_jobs()
+        if requeued:
+            logger.info("Re-queued %d interrupted jobs", requeued)
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout: "float | None" = None) -> None:
+        """Stop the workers once their current job is finished."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    @contextmanager
+    def model_slot(self, on_wait=None):
+        """Hold one of the model slots while running model stages outside the queue.
+
+        Parameters
+        ----------
+        on_wait : callable, optional
+            Called before blocking if every slot is taken.
+        """
+        if not self._model_slots.acquire(blocking=False):
+            if on_wait is not None:
+                on_wait()
+            self._model_slots.acquire()
+        try:
+            yield
+        finally:
+            self._model_slots.release()
+
+    def submit(self, latitude: float, longitude: float, zoom: int) -> int:
+        """Queue the analysis of a location and return its job id (shared by identical jobs)."""
+        job_id = self.store.submit_job(self.pipeline.job_key(latitude, longitude, zoom), latitude, longitude, zoom)
+        self._wake.set()
+        return job_id
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self.store.claim_job()
+            if job is None:
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: dict) -> None:
+        location = (job["latitude"], job["longitude"], job["zoom"])
+        try:
+            run = self.pipeline.cached_run(*location)
+            if run is None:
+                timer = StageTimer()
+                image_bytes = self.pipeline.download_tile(*location, timer=timer)
+                with self.model_slot():
+                    run = self.pipeline.analyse_image(image_bytes, *location, timer=timer)
+        except Exception as e:
+            logger.error("Job %d failed: %s", job["id"], e)
+            self.store.finish_job(job["id"], error=str(e) or type(e).__name__)
+        else:
+            self.store.finish_job(job["id"], run_id=run["id"])
@@ -0,0 +1,130 @@
+"""
+map_overlay.py — past assessments drawn on the Page 2 map.
+
+The map only shows what is in its viewport. The assessment store keeps
+an R*Tree index on the latest run of every analysed tile, so the tiles
+inside the current bounds are found without reading the whole log (see
+AssessmentStore.runs_in_box). Once more than MAX_MARKERS tiles are in
+view, typically when zoomed out, they are grouped in SQL by the Web
+Mercator tile containing them a few zoom levels below the map's, so a
+view of the whole world draws a few hundred clusters rather than tens of
+thousands of markers. Markers and clusters are coloured by the DANGER /
+SAFE verdicts of their runs.
+"""
+
+from dataclasses import dataclass
+
+import folium
+import numpy as np
+import pandas as pd
+
+if __package__:
+    from .assessment_store import AssessmentStore
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from assessment_store import AssessmentStore
+
+MAX_MARKERS = 400  # tiles in view drawn one by one; more are clustered
+CELL_ZOOM_OFFSET = 2  # clusters are tiles this many zoom levels finer than the map
+
+DANGER_COLOUR, SAFE_COLOUR, MIXED_COLOUR = "#d62728", "#2ca02c", "#ff7f0e"
+
+
+@dataclass(frozen=True)
+class Viewport:
+    """Bounds of the visible map, in degrees, and its zoom level."""
+
+    south: float
+    west: float
+    north: float
+    east: float
+    zoom: int
+
+    @classmethod
+    def from_map(cls, map_state: "dict | None", default_zoom: int = 2) -> "Viewport":
+        """Build the viewport from the value returned by st_folium (the whole world before the first one)."""
+        bounds = (map_state or {}).get("bounds") or {}
+        south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+        if south_west.get("lat") is None or north_east.get("lat") is None:
+            return cls(-90.0, -180.0, 90.0, 180.0, default_zoom)
+        return cls(
+            south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"],
+            int(map_state.get("zoom") or default_zoom),
+        )
+
+    def boxes(self) -> list[tuple[float, float, float, float]]:
+        """Return the viewport as (south, west, north, east) boxes within ±180° longitude.
+
+        Leaflet reports longitudes beyond ±180° once the map is panned across
+        the antimeridian; such a view becomes two boxes, one on each side.
+        """
+        south, north = max(self.south, -90.0), min(self.north, 90.0)
+        if self.east - self.west >= 360:
+            return [(south, -180.0, north, 180.0)]
+        west = (self.west + 180.0) % 360.0 - 180.0
+        east = west + (self.east - self.west)
+        if east <= 180.0:
+            return [(south, west, north, east)]
+        return [(south, west, north, 180.0), (south, -180.0, north, east - 360.0)]
+
+
+def _concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def runs_in_view(store: AssessmentStore, viewport: Viewport) -> "tuple[pd.DataFrame, bool]":
+    """Return what to draw for a viewport, and whether it is clustered.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, bool]
+        The latest run of every tile in view (AssessmentStore.runs_in_box),
+        or, with more than MAX_MARKERS of them, their clusters
+        (AssessmentStore.clusters_in_box) and True.
+    """
+    boxes = viewport.boxes()
+    if sum(store.count_in_box(*box) for box in boxes) <= MAX_MARKERS:
+        return _concat([store.runs_in_box(*box) for box in boxes]), False
+    cell_zoom = viewport.zoom + CELL_ZOOM_OFFSET
+    return _concat([store.clusters_in_box(*box, cell_zoom) for box in boxes]), True
+
+
+def _colour(runs: int, dangers: int) -> str:
+    if dangers == 0:
+        return SAFE_COLOUR
+    return DANGER_COLOUR if dangers == runs else MIXED_COLOUR
+
+
+def overlay(rows: pd.DataFrame, clustered: bool) -> folium.FeatureGroup:
+    """Draw the result of runs_in_view on a folium layer: a dot per run, or a numbered circle per cluster."""
+    layer = folium.FeatureGroup(name="Past assessments")
+    if not clustered:
+        for run in rows.itertuples(index=False):
+            verdict = "DANGER" if run.danger == "Y" else "SAFE"
+            note = f" ({run.prescreen})" if isinstance(run.prescreen, str) else ""
+            folium.CircleMarker(
+                location=[run.latitude, run.longitude], radius=6, weight=1,
+                color="white", fill=True, fill_color=_colour(1, int(run.danger == "Y")), fill_opacity=0.9,
+                tooltip=f"{verdict}{note} — {run.timestamp}, zoom {run.zoom}",
+            ).add_to(layer)
+        return layer
+
+    for cluster in rows.itertuples(index=False):
+        size = int(24 + 6 * np.log10(cluster.runs))
+        folium.Marker(
+            location=[cluster.latitude, cluster.longitude],
+            tooltip=f"{cluster.runs} assessments, {cluster.dangers} DANGER",
+            icon=folium.DivIcon(
+                icon_size=(size, size), icon_anchor=(size // 2, size // 2),
+                html=(
+                    f'<div style="width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;'
+                    f'background:{_colour(cluster.runs, cluster.dangers)};opacity:0.85;color:white;'
+                    f'text-align:center;font-size:11px;font-weight:bold">{cluster.runs}</div>'
+                ),
+            ),
+        ).add_to(layer)
+    return layer
+
+
+def history_layer(store: AssessmentStore, viewport: Viewport) -> folium.FeatureGroup:
+    """Layer of the past assessments inside a viewport, clustered when there are many."""
+    return overlay(*runs_in_view(store, viewport))
@@ -0,0 +1,423 @@
+"""
+model_manager.py — keeps the Ollama models of Page 2 available and resident.
+
+Page 2 used to call ollama.pull before every inference, paying a registry
+round trip on each cache miss, and the first request after a restart also
+paid the model load. ModelManager checks local availability once per
+process (pulling only models that are missing), preloads the configured
+models at app start, and passes keep_alive on every call so the weights
+stay in memory between requests. Each answer reports the model load time
+separately from the inference time. Answers can also be streamed chunk
+by chunk (ChatStream), so the page shows text as it is generated; streams
+enforce the timeout and latency budget of models.yaml and fall back to
+lighter models when the primary one is too slow.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import httpx
+import ollama
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_ALIVE = "30m"
+
+
+def _tagged(name: str) -> str:
+    """Return a model name with an explicit tag ("llava" -> "llava:latest")."""
+    return name if ":" in name else f"{name}:latest"
+
+
+@dataclass(frozen=True)
+class ChatResult:
+    """Answer of one model call, with timings in seconds.
+
+    load_seconds is the time Ollama spent loading the model into memory
+    (0 when it was already resident); inference_seconds covers prompt
+    evaluation and generation. Ollama only reports these and the token
+    counts at the end of an answer, so they are None for a stream closed
+    before its end.
+    """
+
+    content: str
+    model: str
+    load_seconds: "float | None"
+    inference_seconds: "float | None"
+    total_seconds: float
+    prompt_tokens: "int | None" = 0
+    output_tokens: "int | None" = 0
+    first_token_seconds: "float | None" = None
+
+
+def _seconds(nanoseconds) -> float:
+    return (nanoseconds or 0) / 1e9
+
+
+def _chat_result(model: str, content: str, response, elapsed: float, first_token=None) -> ChatResult:
+    """Build a ChatResult from the final ollama response (None if the call was cut short)."""
+    if response is None:
+        # no final chunk: the model times are unknown, not zero
+        return ChatResult(content, model, None, None, elapsed, None, None, first_token)
+    return ChatResult(
+        content=content,
+        model=model,
+        load_seconds=_seconds(response.load_duration),
+        inference_seconds=_seconds(response.prompt_eval_duration) + _seconds(response.eval_duration),
+        total_seconds=_seconds(response.total_duration) or elapsed,
+        prompt_tokens=response.prompt_eval_count or 0,
+        output_tokens=response.eval_count or 0,
+        first_token_seconds=first_token,
+    )
+
+
+class ModelTimeout(TimeoutError):
+    """A model gave no first token within its latency budget, or no full answer within its timeout."""
+
+
+def _bounded(chunks, started: float, latency_budget: "float | None", timeout: "float | None"):
+    """Yield the chunks of a streamed answer, enforcing a latency budget and a timeout.
+
+    The limits are checked as each chunk arrives. A read blocked on a
+    silent server is ended by the read timeout of the stream's client (see
+    ModelManager.stream_client), reported as an httpx.TimeoutException.
+    Either way the generator is closed, which closes the response, so the
+    server stops generating the abandoned answer.
+
+    Parameters
+    ----------
+    chunks : iterator
+        Streamed ollama responses.
+    started : float
+        time.perf_counter() when the request was made.
+    latency_budget : float or None
+        Seconds allowed until the first chunk arrives.
+    timeout : float or None
+        Seconds allowed until the answer is complete.
+
+    Raises
+    ------
+    ModelTimeout
+        If a limit is exceeded.
+    """
+    budget_reason = f"no answer within its {latency_budget}s latency budget"
+    timeout_reason = f"no complete answer within its {timeout}s timeout"
+    waiting_for_first = True
+    try:
+        for chunk in chunks:
+            elapsed = time.perf_counter() - started
+            if waiting_for_first and latency_budget is not None and elapsed > latency_budget:
+                raise ModelTimeout(budget_reason)
+            if timeout is not None and elapsed > timeout:
+                raise ModelTimeout(timeout_reason)
+            waiting_for_first = False
+            yield chunk
+    except httpx.TimeoutException:
+        if waiting_for_first and latency_budget is not None:
+            raise ModelTimeout(budget_reason) from None
+        raise ModelTimeout(timeout_reason if timeout is not None else "the server stopped answering") from None
+    finally:
+        chunks.close()
+
+
+class ChatStream:
+    """Streamed chat answer: iterate to receive the text chunks as they arrive.
+
+    The models are tried in order: if one fails or exceeds its latency
+    budget before its first token, the next one (a lighter fallback) is
+    asked instead; `skipped` lists the models that gave up and why. Once
+    iteration finishes (or stops early, e.g. with break), `result` holds
+    the text received so far, the model that answered and the timings;
+    stopping early or a timeout closes the connection, so the server stops
+    generating.
+    """
+
+    def __init__(
+        self,
+        manager: "ModelManager",
+        models: list[str],
+        messages: list[dict],
+        timeout: "float | None" = None,
+        latency_budget: "float | None" = None,
+    ):
+        self._manager = manager
+        self.models = list(models)
+        self.messages = messages
+        self.timeout = timeout
+        self.latency_budget = latency_budget
+        self.skipped: list[tuple[str, str]] = []
+        self.result: "ChatResult | None" = None
+
+    def __iter__(self):
+        for i, model in enumerate(self.models):
+            parts = []
+            final = None
+            first_token = None
+            chunks = None
+            close = None
+            started = time.perf_counter()
+            try:
+                self._manager.ensure(model)
+                # a read may block until the first token is due (or the whole answer, without a budget)
+                client, close = self._manager.stream_client(self.latency_budget or self.timeout)
+                started = time.perf_counter()
+                chunks = client.chat(
+                    model=model, messages=self.messages, stream=True, keep_alive=self._manager.keep_alive,
+                )
+                if self.timeout is not None or self.latency_budget is not None:
+                    chunks = _bounded(chunks, started, self.latency_budget, self.timeout)
+                for chunk in chunks:
+                    if chunk.done:
+                        final = chunk
+                    text = chunk.message.content or ""
+                    if text:
+                        if first_token is None:
+                            first_token = time.perf_counter() - started
+                        parts.append(text)
+                        yield text
+            except Exception as e:
+                # once text has been shown there is no switching models
+                if parts or i == len(self.models) - 1:
+                    raise
+                logger.warning("Model %s failed (%s), falling back to %s", model, e, self.models[i + 1])
+                self.skipped.append((model, str(e)))
+                continue
+            finally:
+                if chunks is not None:
+                    chunks.close()
+                if close is not None:
+                    close()
+                elapsed = time.perf_counter() - started
+                self.result = _chat_result(model, "".join(parts), final, elapsed, first_token)
+            return
+
+
+class ModelManager:
+    """Process-wide access to the Ollama server for Page 2.
+
+    Parameters
+    ----------
+    host : str, optional
+        Ollama server URL (default: OLLAMA_HOST or http://localhost:11434).
+    keep_alive : str or float
+        How long the server keeps a model loaded after each call
+        (e.g. "30m"; -1 keeps it until the server stops).
+    client : ollama.Client, optional
+        Client to use instead of creating one for `host`; streamed answers
+        then share it and its timeouts, so their limits are only checked as
+        chunks arrive.
+    request_timeout : float, optional
+        Longest wait for any single read from the server, in seconds.
+    """
+
+    def __init__(
+        self,
+        host: "str | None" = None,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+        client=None,
+        request_timeout: "float | None" = None,
+    ):
+        self.client = client if client is not None else ollama.Client(host=host, timeout=request_timeout)
+        self._own_client = client is None
+        self.host = host
+        self.request_timeout = request_timeout
+        self.keep_alive = keep_alive
+        self._available: set[str] = set()
+        self._lock = threading.Lock()
+        self.load_seconds: dict[str, float] = {}
+
+    def ensure(self, name: str) -> None:
+        """Make sure a model is available locally, pulling it only if missing.
+
+        The server is asked once per process; later calls for the same model
+        return immediately.
+        """
+        tagged = _tagged(name)
+        if tagged in self._available:
+            return
+        with self._lock:
+            if tagged in self._available:
+                return
+            local = {_tagged(m.model) for m in self.client.list().models if m.model}
+            if tagged not in local:
+                logger.info("Model %s not found locally, pulling it", name)
+                self.client.pull(name)
+            self._available.add(tagged)
+
+    def missing(self, names) -> list[str]:
+        """Return the models of `names` that are not available locally, without pulling them."""
+        local = {_tagged(m.model) for m in self.client.list().models if m.model}
+        return [name for name in names if _tagged(name) not in local]
+
+    def warm_up(self, names) -> dict[str, float]:
+        """Ensure and load each model into memory ahead of the first request.
+
+        Parameters
+        ----------
+        names : iterable of str
+            Models to preload.
+
+        Returns
+        -------
+        dict[str, float]
+            Load time in seconds reported by the server for each model.
+        """
+        for name in names:
+            self.ensure(name)
+            # an empty prompt only loads the model
+            response = self.client.generate(model=name, prompt="", keep_alive=self.keep_alive)
+            self.load_seconds[name] = _seconds(response.load_duration)
+            logger.info("Warmed up %s (load %.2fs)", name, self.load_seconds[name])
+        return dict(self.load_seconds)
+
+    def chat(self, model: str, messages: list[dict]) -> ChatResult:
+        """Run one chat completion, keeping the model resident afterwards.
+
+        Parameters
+        ----------
+        model : str
+            Model name.
+        messages : list[dict]
+            Chat messages, as for ollama.chat.
+
+        Returns
+        -------
+        ChatResult
+            Answer text with load and inference times.
+        """
+        self.ensure(model)
+        started = time.perf_counter()
+        response = self.client.chat(model=model, messages=messages, keep_alive=self.keep_alive)
+        elapsed = time.perf_counter() - started
+        return _chat_result(model, response.message.content or "", response, elapsed)
+
+    def stream_client(self, read_timeout: "float | None" = None) -> "tuple[ollama.Client, Callable[[], None]]":
+        """Return a client for one streamed answer and a function that closes it.
+
+        Every stream gets its own connection, whose reads give up after
+        read_timeout seconds (default: request_timeout), so a silent
+        server cannot hold the caller past its limits. With a client passed
+        to the constructor, that client and its timeouts are shared and
+        closing does nothing.
+        """
+        if not self._own_client:
+            return self.client, lambda: None
+        timeout = httpx.Timeout(self.request_timeout, read=read_timeout or self.request_timeout)
+        client = ollama.Client(host=self.host, timeout=timeout)
+        return client, client.close
+
+    def stream_chat(
+        self,
+        model: str,
+        messages: list[dict],
+        fallbacks=(),
+        timeout: "float | None" = None,
+        latency_budget: "float | None" = None,
+    ) -> ChatStream:
+        """Start a streamed chat completion (see ChatStream).
+
+        Parameters
+        ----------
+        model : str
+            Model name.
+        messages : list[dict]
+            Chat messages, as for ollama.chat.
+        fallbacks : iterable of str
+            Models to try, in order, if `model` fails before answering.
+        timeout : float, optional
+            Seconds each model may take for its whole answer.
+        latency_budget : float, optional
+            Seconds each model may take for its first token before the next
+            fallback is tried.
+        """
+        return ChatStream(self, [model, *fallbacks], messages, timeout, latency_budget)
+
+    def stream_for(self, model_cfg: dict, messages: list[dict]) -> ChatStream:
+        """Stream an answer for an image_model / text_model section of models.yaml."""
+        return self.stream_chat(
+            model_cfg["name"],
+            messages,
+            fallbacks=model_cfg.get("fallbacks") or (),
+            timeout=model_cfg.get("timeout"),
+            latency_budget=model_cfg.get("latency_budget"),
+        )
+
+
+_managers: dict[tuple, ModelManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(
+    host: "str | None" = None,
+    keep_alive=DEFAULT_KEEP_ALIVE,
+    request_timeout: "float | None" = None,
+) -> ModelManager:
+    """Return the process-wide ModelManager for a host, creating it on first use."""
+    key = (host, keep_alive, request_timeout)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = ModelManager(host=host, keep_alive=keep_alive, request_timeout=request_timeout)
+        return _managers[key]
+
+
+def candidates(model_cfg: dict) -> list[str]:
+    """Return the model of an image_model / text_model section followed by its fallbacks."""
+    return [model_cfg["name"], *(model_cfg.get("fallbacks") or ())]
+
+
+def manager_from_config(config: dict) -> ModelManager:
+    """Return the process-wide ModelManager for the `ollama` section of models.yaml.
+
+    No single read from the server may take longer than the longest model
+    timeout, so a hung server cannot hold a connection forever.
+    """
+    ollama_cfg = config.get("ollama") or {}
+    timeouts = [
+        config[section]["timeout"]
+        for section in ("image_model", "text_model")
+        if config.get(section, {}).get("timeout") is not None
+    ]
+    return get_manager(
+        ollama_cfg.get("host"),
+        ollama_cfg.get("keep_alive", DEFAULT_KEEP_ALIVE),
+        max(timeouts) if timeouts else None,
+    )
+
+
+def preload(config: dict) -> dict[str, float]:
+    """Warm up the image and text models of models.yaml, unless `ollama.preload` is false.
+
+    Their fallbacks are not loaded, only checked: missing ones are logged,
+    and pulled (several GB) only if `ollama.pull_fallbacks` is true;
+    otherwise a fallback is pulled the first time it is needed. Errors
+    (e.g. Ollama not running) are logged rather than raised: Page 2
+    reports them when it is used.
+
+    Returns
+    -------
+    dict[str, float]
+        Load time in seconds per model (empty if nothing was preloaded).
+    """
+    if not (config.get("ollama") or {}).get("preload", True):
+        return {}
+    names = [config["image_model"]["name"], config["text_model"]["name"]]
+    try:
+        manager = manager_from_config(config)
+        load_times = manager.warm_up(names)
+        fallbacks = [name for section in ("image_model", "text_model") for name in candidates(config[section])[1:]]
+        if (config.get("ollama") or {}).get("pull_fallbacks", False):
+            for fallback in fallbacks:
+                manager.ensure(fallback)
+        else:
+            for fallback in manager.missing(fallbacks):
+                logger.warning(
+                    "Fallback model %s is not available locally; run `ollama pull %s` "
+                    "(or set ollama.pull_fallbacks) so it is ready when needed", fallback, fallback,
+                )
+        return load_times
+    except Exception as e:
+        logger.warning("Could not preload models %s: %s", names, e)
+        return {}
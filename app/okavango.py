@@ -1,9 +1,26 @@
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from functools import cached_property
+from pathlib import Path
+
 import requests
 import geopandas as gpd
 import pandas as pd
-from pathlib import Path
 from pydantic import validate_call
 
+if __package__:
+    from .http_session import make_session
+    from .timing import StageTimer
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from http_session import make_session
+    from timing import StageTimer
+
 DATASETS = [
     "https://ourworldindata.org/grapher/annual-change-forest-area.csv",  # Annual Change in forest area
     "https://ourworldindata.org/grapher/annual-deforestation.csv",  # Annual deforestation
@@ -13,34 +30,210 @@ DATASETS = [
     "https://naciscdn.org/naturalearth/110m/cultural/ne_110m_admin_0_countries.zip",  # Map dataset
 ]
 
+MAX_WORKERS = 4  # concurrent downloads (and size of the shared connection pool)
+REVALIDATE_AFTER = 24 * 60 * 60  # seconds before a local file is checked against the server again
+MANIFEST_NAME = "manifest.json"  # per-file download metadata kept in downloads/
+CHUNK_SIZE = 1024 * 1024  # bytes written per streamed chunk
+CACHE_DIR_NAME = "cache"  # columnar copies of the downloads, inside downloads/
+CACHE_VERSION = 2  # bump when the cached layout changes, invalidates all cached files
+
+# attribute name -> file in downloads/ for the five OWID datasets
+TABLES = {
+    "forest_change": "annual-change-forest-area.csv",
+    "deforestation": "annual-deforestation.csv",
+    "land_protected": "terrestrial-protected-areas.csv",
+    "land_degraded": "share-degraded-land.csv",
+    "forest_cover": "forest-area-as-share-of-land-area.csv",
+}
+WORLD_FILE = "ne_110m_admin_0_countries.zip"
+
+# Declared layout of every OWID dataset: the value column(s) next to Entity, Code and Year.
+# Files that do not match fail loudly instead of silently loading with other dtypes.
+KEY_DTYPES = {"Entity": "category", "Code": "category", "Year": "int16"}
+SCHEMAS = {
+    "forest_change": ["Annual change in forest area"],
+    "deforestation": ["Deforestation"],
+    "land_protected": ["Terrestrial protected areas (% of total land area)"],
+    "land_degraded": ["Proportion of land that is degraded over total land area (%)"],
+    "forest_cover": ["Share of land covered by forest"],
+}
+FLOAT32_VALUES = True  # store values as float32 (7 significant digits, half the memory of float64)
+
+# Parquet needs pyarrow; without it the datasets are simply parsed from the source files
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+class SchemaError(ValueError):
+    """Raised when a downloaded dataset does not match its declared schema."""
+
+
+def apply_schema(df: pd.DataFrame, name: str, float32_values: bool = FLOAT32_VALUES) -> pd.DataFrame:
+    """Validates a raw OWID dataset against SCHEMAS and converts it to compact dtypes.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataset as parsed from the CSV.
+    name : str
+        Dataset name (a key of TABLES).
+    float32_values : bool
+        If True, value columns are stored as float32 instead of float64.
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataset with categorical Entity/Code, int16 Year and float value columns.
+
+    Raises
+    ------
+    SchemaError
+        If columns are missing or unexpected, or a column cannot be converted.
+    """
+    expected = list(KEY_DTYPES) + SCHEMAS[name]
+    missing = [c for c in expected if c not in df.columns]
+    unexpected = [c for c in df.columns if c not in expected]
+    if missing or unexpected:
+        raise SchemaError(f"{TABLES[name]}: missing columns {missing}, unexpected columns {unexpected}")
+
+    year = df["Year"]
+    if year.isna().any() or not year.between(-32768, 32767).all():
+        raise SchemaError(f"{TABLES[name]}: Year must be an integer between -32768 and 32767")
+
+    value_dtype = "float32" if float32_values else "float64"
+    try:
+        return df.astype({**KEY_DTYPES, **{c: value_dtype for c in SCHEMAS[name]}})[expected]
+    except (TypeError, ValueError) as e:
+        raise SchemaError(f"{TABLES[name]}: {e}") from e
+
+
+def _sha256(path: Path) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _expected_size(response: requests.Response, offset: int) -> "int | None":
+    """Returns the full size of the file being downloaded, if the server announced it."""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    if response.headers.get("Content-Encoding") in (None, "identity") and "Content-Length" in response.headers:
+        return offset + int(response.headers["Content-Length"])
+    return None
+
+
+def _lazy_table(name: str) -> cached_property:
+    """Returns a memoized attribute that reads dataset `name` on first access."""
+    def load(self) -> pd.DataFrame:
+        with self.timer.span(f"read {name}"):
+            return self._read_table(TABLES[name])
+    load.__doc__ = f"Raw dataset read from downloads/{TABLES[name]} on first access."
+    return cached_property(load)
+
+
+def _geo_view(name: str) -> property:
+    """Returns an attribute that builds the map view of dataset `name` from that dataset alone.
+
+    Views are not kept: every access joins the single `world` geometry table with
+    the rows of this one dataset, so polygons are never stored once per dataset and
+    opening one map does not read the other datasets.
+    """
+    def merge(self) -> gpd.GeoDataFrame:
+        return self._merge_one(name)
+    merge.__doc__ = (
+        f"World map merged with the {name} dataset. Rebuilt (a new join) on every access: "
+        "keep the result rather than reading the attribute repeatedly."
+    )
+    return property(merge)
+
 
 class OkavangoData:
-    # Integrate Functions 1 and 2 in your class: During the __init__ method, both functions are executed.
-    def __init__(self) -> None:
-        """Initializes the class by downloading and merging all datasets."""
+    float32_values = FLOAT32_VALUES
+
+    # serialises updates to downloads/manifest.json across download threads
+    _manifest_lock = threading.Lock()
+
+    # Raw dataframes are only read when first used, so opening a page that needs
+    # one dataset does not pay for all five. The geo_* views are derived on demand
+    # from one geometry table (world) and the rows of their own dataset.
+    forest_change = _lazy_table("forest_change")
+    deforestation = _lazy_table("deforestation")
+    land_protected = _lazy_table("land_protected")
+    land_degraded = _lazy_table("land_degraded")
+    forest_cover = _lazy_table("forest_cover")
+
+    geo_forest_change = _geo_view("forest_change")
+    geo_deforestation = _geo_view("deforestation")
+    geo_land_protected = _geo_view("land_protected")
+    geo_land_degraded = _geo_view("land_degraded")
+    geo_forest_cover = _geo_view("forest_cover")
+
+    # Integrate Functions 1 and 2 in your class: During the __init__ method, the downloads run;
+    # reading and merging (Function 2) happen lazily on first access of an attribute.
+    def __init__(self, max_workers: int = MAX_WORKERS, float32_values: bool = FLOAT32_VALUES) -> None:
+        """Initializes the class by downloading all datasets.
+
+        Parameters
+        ----------
+        max_workers : int
+            Number of datasets downloaded concurrently.
+        float32_values : bool
+            Load dataset values as float32 instead of float64.
+        """
+        self.float32_values = float32_values
         self.download_dir = Path("downloads")
         self.download_dir.mkdir(exist_ok=True)
+        self.session = make_session(max_workers)
 
         # Function 1: download all datasets into downloads/
-        for url in DATASETS:
-            self.download_dataset(url)
+        with self.timer.span("download"):
+            self.download_all(max_workers)
+
+    def download_all(self, max_workers: int = MAX_WORKERS) -> None:
+        """Downloads (or revalidates) every dataset in DATASETS concurrently.
+
+        Files whose size or checksum no longer match downloads/manifest.json
+        (e.g. truncated by a crash) are deleted first, so they are fetched again.
 
-        # Read datasets into corresponding dataframes (attributes)
-        self.forest_change = pd.read_csv(self.download_dir / "annual-change-forest-area.csv")
-        self.deforestation = pd.read_csv(self.download_dir / "annual-deforestation.csv")
-        self.land_protected = pd.read_csv(self.download_dir / "terrestrial-protected-areas.csv")
-        self.land_degraded = pd.read_csv(self.download_dir / "share-degraded-land.csv")
-        self.forest_cover = pd.read_csv(self.download_dir / "forest-area-as-share-of-land-area.csv")
+        Parameters
+        ----------
+        max_workers : int
+            Maximum number of downloads running at the same time.
+        """
+        self.verify_downloads()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # list() re-raises the first failed download in the calling thread
+            list(pool.map(self.download_dataset, DATASETS))
+
+    def verify_downloads(self) -> None:
+        """Checks every file in downloads/ against the size and SHA-256 recorded in the manifest.
 
-        # Function 2: merge map with datasets
-        self.merge_with_map()
+        Corrupted files are removed together with their manifest entry.
+        """
+        for filename, entry in self._read_manifest().items():
+            filepath = self.download_dir / filename
+            if not filepath.exists() or "sha256" not in entry:
+                continue
+            if filepath.stat().st_size != entry.get("size") or _sha256(filepath) != entry["sha256"]:
+                print(f"Checksum mismatch, removing corrupted file: {filename}")
+                filepath.unlink()
+                self._update_manifest(filename, None)
 
     # Function 1: download a single dataset into downloads/
     @validate_call #validates that url is a proper string at runtime
     
     def download_dataset(self, url: str) -> None:
         """Downloads a single dataset from the given URL and stores it in the downloads/ directory.
-            If the file already exists, the download is skipped.
+            If the file already exists and was checked recently, the download is skipped. Older
+            files are revalidated with a conditional request (ETag / If-Modified-Since), so an
+            unchanged dataset costs a single 304 response instead of a full download.
+
+            The body is streamed in chunks to a ".part" file which is renamed into place only
+            once complete, so a crash never leaves a truncated dataset behind. A leftover
+            ".part" file is resumed with an HTTP Range request.
             
             Parameters
             ----------
@@ -49,33 +242,295 @@ class OkavangoData:
         
         filename = url.split("/")[-1]
         filepath = self.download_dir / filename
+        partpath = self.download_dir / f"{filename}.part"
+        entry = self._read_manifest().get(filename, {})
 
-        #before downloading, checks if the file is already in downloads/. If yes, skips it. So the app doesn't re-download everything from scratch on every restart.
-        if filepath.exists():
+        #before downloading, checks if the file is already in downloads/. If it was checked recently, skips it. So the app doesn't re-download everything from scratch on every restart.
+        if filepath.exists() and time.time() - entry.get("checked_at", 0) < REVALIDATE_AFTER:
             print(f"Already exists, skipping: {filename}")
             return
 
+        # conditional headers: the server answers 304 Not Modified if our copy is still current
+        headers = {}
+        if filepath.exists():
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            headers["If-Modified-Since"] = entry.get("last_modified") or formatdate(
+                filepath.stat().st_mtime, usegmt=True
+            )
+
+        # resume an interrupted download; If-Range makes the server send the whole
+        # file again if it changed since the partial copy was started. Byte ranges
+        # must refer to the file itself, not to a gzip-encoded body, hence identity.
+        offset = partpath.stat().st_size if partpath.exists() else 0
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["Accept-Encoding"] = "identity"
+            if entry.get("partial_etag"):
+                headers["If-Range"] = entry["partial_etag"]
+
         try:
             print(f"Downloading {filename}...")
-            response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=60)
-            response.raise_for_status()
-            filepath.write_bytes(response.content)
-            print(f"Saved {filename}")
+            with self.session.get(url, headers=headers, timeout=60, stream=True) as response:
+                if response.status_code == 304:
+                    print(f"Not modified, keeping: {filename}")
+                    if "sha256" not in entry:
+                        entry = {**entry, "size": filepath.stat().st_size, "sha256": _sha256(filepath)}
+                    self._update_manifest(filename, {**entry, "checked_at": time.time()})
+                    return
+                if response.status_code == 416:
+                    # our partial copy is not a prefix of the current file: start over
+                    partpath.unlink()
+                    self._update_manifest(filename, {**entry, "partial_etag": None})
+                    return self.download_dataset(url)
+                response.raise_for_status()
+
+                resuming = response.status_code == 206
+                if resuming and not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                    # a range other than the one we asked for cannot be appended: start over
+                    print(f"Unexpected range for {filename}, downloading it again")
+                    partpath.unlink()
+                    self._update_manifest(filename, {**entry, "partial_etag": None})
+                    return self.download_dataset(url)
+                if resuming:
+                    print(f"Resuming {filename} at byte {offset}")
+                self._update_manifest(filename, {**entry, "partial_etag": response.headers.get("ETag")})
+                digest, size = self._stream_to_file(response, partpath, append=resuming)
+                expected = _expected_size(response, offset if resuming else 0)
+                if expected is not None and size != expected:
+                    raise requests.exceptions.ContentDecodingError(
+                        f"incomplete download: got {size} of {expected} bytes"
+                    )
         except requests.exceptions.RequestException as e:
+            # a stale local copy is better than no data (e.g. when offline)
+            if filepath.exists():
+                print(f"Could not revalidate {filename}, using local copy: {e}")
+                return
             print(f"Failed to download {filename}: {e}")
             raise
 
+        # atomic rename: readers see either the old file or the complete new one
+        os.replace(partpath, filepath)
+        print(f"Saved {filename}")
+        self._update_manifest(filename, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "size": size,
+            "sha256": digest,
+            "checked_at": time.time(),
+        })
+
+    @staticmethod
+    def _stream_to_file(response: requests.Response, partpath: Path, append: bool) -> tuple[str, int]:
+        """Writes the response body to partpath in chunks and returns (sha256, total size).
+
+        Parameters
+        ----------
+        response : requests.Response
+            Streaming response whose body is written.
+        partpath : Path
+            Temporary file receiving the body.
+        append : bool
+            If True, the body continues the bytes already in partpath.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        if append:
+            with open(partpath, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+        with open(partpath, "ab" if append else "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        return digest.hexdigest(), size
+
+    def _read_manifest(self) -> dict:
+        """Returns the download metadata stored in downloads/manifest.json (empty if missing)."""
+        path = self.download_dir / MANIFEST_NAME
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            print(f"Ignoring unreadable {MANIFEST_NAME}")
+            return {}
+
+    def _update_manifest(self, filename: str, entry: "dict | None") -> None:
+        """Stores the metadata of one downloaded file in downloads/manifest.json.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the file inside downloads/.
+        entry : dict or None
+            Metadata to store (ETag, Last-Modified, size, SHA-256, time of the last
+            check); None removes the file from the manifest.
+        """
+        with self._manifest_lock:
+            manifest = self._read_manifest()
+            if entry is None:
+                manifest.pop(filename, None)
+            else:
+                manifest[filename] = entry
+            path = self.download_dir / MANIFEST_NAME
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+            os.replace(tmp, path)
+
+    def _read_table(self, filename: str) -> pd.DataFrame:
+        """Reads one downloaded CSV, going through the Parquet cache when possible.
+
+        The first read parses the CSV, validates it against its schema (see
+        apply_schema) and stores a Parquet copy in downloads/cache/; later reads
+        memory-map that copy instead of parsing the CSV again.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the CSV inside downloads/.
+
+        Raises
+        ------
+        SchemaError
+            If the CSV does not match the schema declared in SCHEMAS.
+        """
+        name = next(n for n, f in TABLES.items() if f == filename)
+        source = self.download_dir / filename
+        cache = self._cache_path(filename)
+        if cache is not None and cache.exists():
+            return pd.read_parquet(cache, memory_map=True)
+        try:
+            df = apply_schema(pd.read_csv(source), name, self.float32_values)
+        except SchemaError as e:
+            print(f"Schema check failed: {e}")
+            raise
+        if cache is not None:
+            self._write_cache(cache, df.to_parquet)
+        return df
+
+    def _read_world(self, filename: str) -> gpd.GeoDataFrame:
+        """Reads the Natural Earth shapefile zip, going through a GeoParquet cache when possible.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the zip inside downloads/.
+        """
+        source = self.download_dir / filename
+        cache = self._cache_path(filename)
+        if cache is None:
+            return gpd.read_file(source)
+        if cache.exists():
+            return gpd.read_parquet(cache, memory_map=True)
+        world = gpd.read_file(source)
+        self._write_cache(cache, world.to_parquet)
+        return world
+
+    def _cache_path(self, filename: str) -> "Path | None":
+        """Returns the cache file for a download, or None if caching is not possible.
+
+        The path embeds a fingerprint of the source file (its SHA-256 from the
+        manifest, or size and modification time), so a changed download never
+        matches an old cache file.
+        """
+        source = self.download_dir / filename
+        if not HAS_PYARROW or not source.exists():
+            return None
+        entry = self._read_manifest().get(filename, {})
+        if "sha256" in entry and entry.get("size") == source.stat().st_size:
+            fingerprint = entry["sha256"][:16]
+        else:
+            stat = source.stat()
+            fingerprint = f"{stat.st_size}-{stat.st_mtime_ns}"
+        if filename in TABLES.values() and self.float32_values:
+            fingerprint += "-f32"
+        stem = filename.split(".")[0]
+        return self.download_dir / CACHE_DIR_NAME / f"{stem}-v{CACHE_VERSION}-{fingerprint}.parquet"
+
+    @staticmethod
+    def _write_cache(cache: Path, write) -> None:
+        """Writes a cache file atomically and removes outdated versions of it.
+
+        Parameters
+        ----------
+        cache : Path
+            Target cache file.
+        write : callable
+            Writer taking a path, e.g. DataFrame.to_parquet.
+        """
+        cache.parent.mkdir(exist_ok=True)
+        stem = cache.name.rsplit(f"-v{CACHE_VERSION}-", 1)[0]
+        tmp = cache.with_suffix(".tmp")
+        try:
+            write(tmp)
+            os.replace(tmp, cache)
+        except Exception as e:
+            # the cache is only an optimisation, the data was already read
+            print(f"Could not write cache {cache.name}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        for old in cache.parent.glob(f"{stem}-v*.parquet"):
+            if old != cache:
+                old.unlink(missing_ok=True)
+
+    @cached_property
+    def timer(self) -> StageTimer:
+        """Timing spans of the download, read and merge steps (e.g. timer.seconds()["read deforestation"])."""
+        return StageTimer()
+
+    @cached_property
+    def world(self) -> gpd.GeoDataFrame:
+        """Natural Earth world map with cleaned ISO3 codes, read on first access."""
+        with self.timer.span("read world"):
+            world = self._read_world(WORLD_FILE)
+
+        # Natural Earth uses "-99" when ISO3 is missing
+        world["ADM0_A3"] = world["ADM0_A3"].replace("-99", pd.NA)
+        return world
+
+    @cached_property
+    def panel(self) -> pd.DataFrame:
+        """Wide attribute table of all datasets, indexed by (Code, Year).
+
+        Columns are a MultiIndex (dataset name, original column), so datasets
+        with identically named value columns do not collide. Only rows with
+        an ISO3 code are kept, since only those can be placed on the map.
+        """
+        frames = {name: getattr(self, name) for name in TABLES}
+        with self.timer.span("merge panel"):
+            for name, df in frames.items():
+                df = df[df["Code"].notna()].drop(columns="Entity", errors="ignore")
+                frames[name] = df.set_index(["Code", "Year"])
+            return pd.concat(frames, axis=1).sort_index()
+
+    @cached_property
+    def entities(self) -> pd.Series:
+        """Country name for every ISO3 code in the datasets."""
+        names = [getattr(self, name)[["Code", "Entity"]] for name in TABLES if "Entity" in getattr(self, name)]
+        if not names:
+            return pd.Series(dtype=object)
+        pairs = pd.concat(names).dropna().drop_duplicates("Code")
+        return pairs.set_index("Code")["Entity"]
+
     # Function 2: merge the world map with our datasets
     def merge_with_map(self) -> None:
         """
     Merges all downloaded datasets with the Natural Earth world map
     using ISO3 country codes.
 
+    Instead of one GeoDataFrame per dataset, this builds a single geometry
+    table (`world`) and a single wide attribute table (`panel`); the geo_*
+    attributes join `world` with their own dataset on demand.
+
     The method:
     - Loads the world shapefile (Natural Earth dataset)
     - Cleans missing ISO3 codes
-    - Performs left joins between the map and each dataset
-    - Creates GeoDataFrame attributes for visualization
+    - Combines all datasets into one table keyed by ISO3 code and year
 
     Raises
     ------
@@ -84,17 +539,36 @@ class OkavangoData:
     """
     
         try:
-            world = gpd.read_file(self.download_dir / "ne_110m_admin_0_countries.zip")
+            self.world
+            self.panel
+        except Exception as e:
+            print(f"Failed to merge datasets: {e}")
+            raise
 
-            # Natural Earth uses "-99" when ISO3 is missing
-            world["ADM0_A3"] = world["ADM0_A3"].replace("-99", pd.NA)
+    def _merge_one(self, name: str) -> gpd.GeoDataFrame:
+        """Left-joins the world map with the rows of one dataset that have an ISO3 code.
+
+        Only this dataset is read (not the whole panel). Its geometries are
+        references to the polygons in `world`, not copies.
+
+        Parameters
+        ----------
+        name : str
+            Attribute name of the dataset (a key of TABLES).
+
+        Raises
+        ------
+        Exception
+            If merging fails for any reason.
+        """
+        try:
+            # read the inputs first, so the span only covers the join itself
+            frame, world = getattr(self, name), self.world
+            with self.timer.span(f"merge {name}"):
+                values = frame[frame["Code"].notna()]
 
-            # Merge using ISO3 codes (more reliable than country names)
-            self.geo_forest_change = world.merge(self.forest_change, left_on="ADM0_A3", right_on="Code", how="left")
-            self.geo_deforestation = world.merge(self.deforestation, left_on="ADM0_A3", right_on="Code", how="left")
-            self.geo_land_protected = world.merge(self.land_protected, left_on="ADM0_A3", right_on="Code", how="left")
-            self.geo_land_degraded = world.merge(self.land_degraded, left_on="ADM0_A3", right_on="Code", how="left")
-            self.geo_forest_cover = world.merge(self.forest_cover, left_on="ADM0_A3", right_on="Code", how="left")
+                # Merge using ISO3 codes (more reliable than country names)
+                return world.merge(values, left_on="ADM0_A3", right_on="Code", how="left")
 
         except Exception as e:
             print(f"Failed to merge datasets: {e}")
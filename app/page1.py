@@ -0,0 +1,541 @@
+"""
+page1.py — precomputed data for the Page 1 dashboard.
+
+Every slider move on Page 1 used to filter, sort and aggregate the raw
+dataset again. build_slice_index() does that work once per dataset: each
+year maps to a YearSlice holding the pre-filtered, pre-sorted country rows
+together with the KPIs and the top/bottom countries, so a rerun only needs
+a dictionary lookup. The time series read from a dense Entity × Year matrix,
+so any set of countries is one vectorised row gather. The finished Plotly
+figures are kept, serialised, in a process-wide LRU cache (FIGURE_CACHE)
+shared by all sessions. show_page1() renders the page.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+if __package__:
+    from .data_loader import load_data
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from data_loader import load_data
+
+TOP_BOTTOM_N = 5  # countries shown at each end of the bar chart
+DEFAULT_COUNTRIES = 3  # countries preselected for the time series
+
+
+# ---------------------------------------------------------------------------
+# Per-year slices
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class YearSlice:
+    """Country rows and derived figures for one (dataset, year).
+
+    Attributes
+    ----------
+    countries : pd.DataFrame
+        Countries with a value in this year, sorted ascending by value.
+    top, bottom : pd.Series or None
+        Rows with the highest / lowest value (None if no country has data).
+    default_entities : list[str]
+        Countries with the highest values, preselected for the time series.
+    top_bottom : pd.DataFrame
+        Bottom n_each rows followed by the top n_each rows, for the bar chart.
+    n_each : int
+        Number of countries at each end of top_bottom.
+    """
+
+    countries: pd.DataFrame
+    top: "pd.Series | None" = None
+    bottom: "pd.Series | None" = None
+    default_entities: list[str] = field(default_factory=list)
+    top_bottom: pd.DataFrame = field(default_factory=pd.DataFrame)
+    n_each: int = 0
+
+    @property
+    def empty(self) -> bool:
+        """True if no country has a value in this year."""
+        return self.countries.empty
+
+
+# ---------------------------------------------------------------------------
+# Entity × Year matrix for the time series
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class EntityYearMatrix:
+    """Dense country × year matrix of one dataset's values (NaN where missing).
+
+    Attributes
+    ----------
+    years : np.ndarray
+        Sorted years, one per column.
+    values : np.ndarray
+        Array of shape (len(row_of), len(years)).
+    row_of : dict[str, int]
+        Country name → row in `values`.
+    """
+
+    years: np.ndarray
+    values: np.ndarray
+    row_of: dict[str, int]
+
+    def series(self, entities: list[str]) -> list[tuple[str, np.ndarray, np.ndarray]]:
+        """Return (country, years, values) for each known country, skipping missing years.
+
+        Parameters
+        ----------
+        entities : list[str]
+            Country names; unknown names are ignored.
+        """
+        known = [e for e in entities if e in self.row_of]
+        rows = self.values[[self.row_of[e] for e in known]]
+        result = []
+        for entity, row in zip(known, rows):
+            mask = ~np.isnan(row)
+            result.append((entity, self.years[mask], row[mask]))
+        return result
+
+
+def build_entity_year_matrix(countries: pd.DataFrame, column: str) -> EntityYearMatrix:
+    """Pivot the country rows of one dataset into an EntityYearMatrix.
+
+    Parameters
+    ----------
+    countries : pd.DataFrame
+        Country rows (Entity, Year, value column).
+    column : str
+        Value column to pivot.
+    """
+    wide = (
+        countries.dropna(subset=[column])
+        .drop_duplicates(["Entity", "Year"])
+        .pivot_table(index="Entity", columns="Year", values=column, aggfunc="first", observed=True)
+        .sort_index(axis=1)
+    )
+    return EntityYearMatrix(
+        years=wide.columns.to_numpy(dtype=int),
+        values=wide.to_numpy(dtype=float),
+        row_of={str(entity): i for i, entity in enumerate(wide.index)},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Dataset index
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class SliceIndex:
+    """Year → YearSlice lookup for one dataset, plus the data shared by all years.
+
+    Attributes
+    ----------
+    column : str
+        Value column of the dataset.
+    countries : pd.DataFrame
+        All rows of real countries (3-letter ISO code), every year.
+    country_list : list[str]
+        Sorted country names, the options of the time-series selector.
+    years : list[int]
+        Years offered by the year slider.
+    code_to_entity : dict[str, str]
+        ISO3 code → country name, to resolve clicks on the map.
+    slices : dict[int, YearSlice]
+        Precomputed slice per year.
+    matrix : EntityYearMatrix
+        Country × year values for the time series.
+    """
+
+    column: str
+    countries: pd.DataFrame
+    country_list: list[str]
+    years: list[int]
+    code_to_entity: dict[str, str]
+    slices: dict[int, YearSlice]
+    matrix: EntityYearMatrix
+
+    def get(self, year: int) -> YearSlice:
+        """Return the slice for `year` (an empty slice if the year has no data)."""
+        if year in self.slices:
+            return self.slices[year]
+        return YearSlice(countries=self.countries.iloc[:0])
+
+
+def _year_slice(group: pd.DataFrame, column: str) -> YearSlice:
+    """Build the YearSlice for the rows of one year (all with a value)."""
+    sorted_rows = group.sort_values(column, kind="stable")
+    n_each = min(TOP_BOTTOM_N, len(sorted_rows) // 2)
+    top_bottom = pd.concat([sorted_rows.head(n_each), sorted_rows.tail(n_each)]) if n_each else sorted_rows.iloc[:0]
+    return YearSlice(
+        countries=sorted_rows,
+        top=group.loc[group[column].idxmax()],
+        bottom=group.loc[group[column].idxmin()],
+        default_entities=group.nlargest(DEFAULT_COUNTRIES, column)["Entity"].tolist(),
+        top_bottom=top_bottom,
+        n_each=n_each,
+    )
+
+
+def build_slice_index(
+    raw_df: pd.DataFrame,
+    column: str,
+    years: "list[int] | None" = None,
+) -> SliceIndex:
+    """Precompute the per-year slices of one dataset for the Page 1 dashboard.
+
+    Parameters
+    ----------
+    raw_df : pd.DataFrame
+        Raw OWID dataset (Entity, Code, Year, value column).
+    column : str
+        Value column shown on the page.
+    years : list[int], optional
+        Years for the slider; defaults to every year with country data.
+
+    Returns
+    -------
+    SliceIndex
+        Lookup from year to precomputed YearSlice.
+    """
+    # Filter to real countries only (3-letter ISO code, excludes World/Africa/etc.)
+    if "Code" in raw_df.columns:
+        countries = raw_df[(raw_df["Code"].str.len() == 3).fillna(False).astype(bool)]
+    else:
+        countries = raw_df
+    countries = countries.reset_index(drop=True)
+
+    with_values = countries.dropna(subset=[column])
+    slices = {
+        int(year): _year_slice(group, column)
+        for year, group in with_values.groupby("Year", sort=True, observed=True)
+    }
+
+    code_to_entity: dict[str, str] = {}
+    if "Code" in countries.columns:
+        pairs = countries[["Code", "Entity"]].drop_duplicates("Code")
+        code_to_entity = dict(zip(pairs["Code"].astype(str), pairs["Entity"].astype(str)))
+
+    return SliceIndex(
+        column=column,
+        countries=countries,
+        country_list=sorted(countries["Entity"].unique().tolist()),
+        years=years if years is not None else sorted(slices),
+        code_to_entity=code_to_entity,
+        slices=slices,
+        matrix=build_entity_year_matrix(countries, column),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Figures
+# ---------------------------------------------------------------------------
+
+class FigureCache:
+    """Bounded LRU cache of Plotly figures, stored as JSON specs.
+
+    One instance (FIGURE_CACHE) lives at module level, so it is shared by
+    every Streamlit session in the process. Specs are immutable strings;
+    each hit returns a fresh Figure, so callers may modify it freely.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of figures kept; the least recently used is evicted.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._specs: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: Hashable, build: Callable[[], go.Figure]) -> go.Figure:
+        """Return the cached figure for `key`, building and storing it on a miss.
+
+        Parameters
+        ----------
+        key : Hashable
+            Identifies the figure, e.g. ("choropleth", dataset, year).
+        build : callable
+            Builds the figure when it is not cached.
+        """
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if spec is not None:
+            return pio.from_json(spec)
+
+        fig = build()
+        spec = fig.to_json()
+        with self._lock:
+            self._specs[key] = spec
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.maxsize:
+                self._specs.popitem(last=False)
+        return fig
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._specs), "maxsize": self.maxsize}
+
+    def clear(self) -> None:
+        """Drop all cached figures and reset the counters."""
+        with self._lock:
+            self._specs.clear()
+            self.hits = self.misses = 0
+
+
+FIGURE_CACHE = FigureCache()
+
+
+def choropleth_figure(year_slice: YearSlice, column: str) -> go.Figure:
+    """Build the world choropleth of one (dataset, year)."""
+    fig = px.choropleth(
+        year_slice.countries,
+        locations="Code",
+        locationmode="ISO-3",
+        color=column,
+        hover_name="Entity",
+        color_continuous_scale="YlGn",
+        labels={column: column},
+    )
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=0, b=0),
+        coloraxis_colorbar=dict(title=""),
+        geo=dict(showframe=False, showcoastlines=True),
+    )
+    return fig
+
+
+def top_bottom_figure(year_slice: YearSlice, column: str) -> go.Figure:
+    """Build the horizontal bar chart of the top and bottom countries of one (dataset, year)."""
+    n_each = year_slice.n_each
+    combined = year_slice.top_bottom
+    colors = ["#de2d26"] * n_each + ["#2ca25f"] * n_each
+
+    fig = go.Figure(go.Bar(
+        x=combined[column],
+        y=combined["Entity"],
+        orientation="h",
+        marker_color=colors,
+    ))
+    fig.add_vline(x=0, line_color="black", line_width=1, line_dash="dash")
+    fig.update_layout(
+        xaxis_title=column,
+        yaxis_title="",
+        margin=dict(l=0, r=0, t=20, b=0),
+        height=max(250, n_each * 50),
+    )
+    return fig
+
+
+def time_series_figure(matrix: EntityYearMatrix, countries: list[str], column: str) -> go.Figure:
+    """Build the multi-country time series of one dataset."""
+    fig = go.Figure()
+    for country, years, values in matrix.series(countries):
+        fig.add_trace(go.Scatter(
+            x=years, y=values,
+            mode="lines+markers", name=country,
+            marker=dict(size=4),
+        ))
+    fig.update_layout(
+        xaxis_title="Year",
+        yaxis_title=column,
+        legend_title="Country",
+        margin=dict(l=0, r=0, t=20, b=0),
+        height=400,
+    )
+    return fig
+
+
+# ---------------------------------------------------------------------------
+# Cached resources (shared by all sessions)
+# ---------------------------------------------------------------------------
+
+@st.cache_resource
+def load_map_years(name: str) -> list[int]:
+    # years with data for at least one country on the map; the geo view is built once per dataset
+    geo_df = getattr(load_data(), f"geo_{name}")
+    return sorted(geo_df["Year"].dropna().unique().astype(int).tolist())
+
+@st.cache_resource
+def load_slice_index(name: str, column: str) -> SliceIndex:
+    # per-year country slices, KPIs and top/bottom rows, computed once per dataset for all sessions
+    return build_slice_index(getattr(load_data(), name), column, load_map_years(name))
+
+
+# ---------------------------------------------------------------------------
+# Main Streamlit page
+# ---------------------------------------------------------------------------
+
+def show_page1() -> None:
+    """Render the Global Analysis page: choropleth, KPIs, top/bottom chart and time series."""
+    # dataset attribute name on OkavangoData (raw frame `name`, map view `geo_name`) and value column;
+    # only the selected dataset is loaded
+    datasets = {
+        "Annual Change in Forest Area": ("forest_change", "Annual change in forest area"),
+        "Annual Deforestation": ("deforestation", "Deforestation"),
+        "Forest Area as Share of Land": ("forest_cover", "Share of land covered by forest"),
+        "Share of Degraded Land": (
+            "land_degraded", "Proportion of land that is degraded over total land area (%)"
+        ),
+        "Terrestrial Protected Areas": (
+            "land_protected", "Terrestrial protected areas (% of total land area)"
+        ),
+    }
+
+    # Dataset descriptions: what the indicator shows and what high/low means
+    dataset_descriptions = {
+        "Annual Change in Forest Area": (
+            "Measures how much forest area (in hectares) a country gained or lost each year. "
+            "A **high value** means significant forest growth or reforestation. "
+            "A **low (negative) value** means large-scale forest loss."
+        ),
+        "Annual Deforestation": (
+            "Tracks the total area of forest cleared per year, in hectares. "
+            "A **high value** means heavy deforestation. "
+            "A **low value** means little to no forest is being cleared."
+        ),
+        "Forest Area as Share of Land": (
+            "Shows what percentage of a country's total land area is covered by forest. "
+            "A **high value** means the country is heavily forested. "
+            "A **low value** means most land is non-forested (urban, agricultural, or arid)."
+        ),
+        "Share of Degraded Land": (
+            "Estimates the proportion of land that has lost productivity due to degradation. "
+            "A **high value** means a large share of land is degraded — a serious environmental concern. "
+            "A **low value** means most land remains productive and healthy."
+        ),
+        "Terrestrial Protected Areas": (
+            "Shows what percentage of a country's land is under formal environmental protection. "
+            "A **high value** means strong conservation efforts. "
+            "A **low value** means little land is protected from development."
+        ),
+    }
+
+    st.title("Okavango Dashboard — Tracking Our Planet's Green Cover")
+    st.markdown(
+        "*This tool tracks how the world's forests, protected areas, and land conditions are changing over time. "
+        "Explore five global datasets by country and year, then use the AI Risk Assessment page to analyse "
+        "any location on Earth via satellite imagery.*"
+    )
+
+    # --- Dataset selector ---
+    selected = st.selectbox("Select a dataset", options=list(datasets.keys()))
+
+    name, column = datasets[selected]
+    index = load_slice_index(name, column)
+
+    # --- Dataset description ---
+    st.info(dataset_descriptions[selected])
+
+    # --- Year slider ---
+    available_years = index.years
+    selected_year = st.select_slider("Select year", options=available_years, value=max(available_years))
+
+    # Countries with data in the selected year (real countries only, sorted by value)
+    year_slice = index.get(selected_year)
+    df_year_countries = year_slice.countries
+
+    # --- KPIs (driven by selected dataset + year) ---
+    if not year_slice.empty:
+        top_row = year_slice.top
+        bottom_row = year_slice.bottom
+        n_countries = len(df_year_countries)
+        top_val = top_row[column]
+        bottom_val = bottom_row[column]
+
+        k1, k2, k3, k4 = st.columns(4)
+        k1.metric("Countries with data", n_countries)
+        k2.metric("Highest value", top_row["Entity"], f"{top_val:,.1f}")
+        k3.metric("Lowest value", bottom_row["Entity"], f"{bottom_val:,.1f}")
+        k4.metric("Selected year", selected_year)
+
+    # --- Interactive choropleth map (plotly) ---
+    st.subheader(f"{selected} — {selected_year}")
+
+    # Session state key scoped to selected dataset so switching datasets resets the selection
+    multiselect_key = f"countries_{selected}"
+
+    # Build country list for the time series (used later)
+    country_list = index.country_list
+
+    # Default selection: top 3 countries by value for the selected year
+    default_countries = year_slice.default_entities
+
+    # Initialise session state for this dataset (reset when dataset changes)
+    if multiselect_key not in st.session_state:
+        st.session_state[multiselect_key] = default_countries
+
+    # Build plotly choropleth from raw country data (shared across sessions via the figure cache)
+    fig = FIGURE_CACHE.get_or_build(
+        ("choropleth", name, selected_year),
+        lambda: choropleth_figure(year_slice, column),
+    )
+
+    st.caption("Click a country on the map to add it to the time series below.")
+    # on_select="rerun" triggers a rerun when user clicks a country
+    map_event = st.plotly_chart(fig, on_select="rerun", selection_mode="points", use_container_width=True)
+
+    # If a country was clicked, add it to the time series selection
+    if map_event and map_event.selection and map_event.selection.points:
+        clicked_code = map_event.selection.points[0].get("location")
+        if clicked_code:
+            clicked_entity = index.code_to_entity.get(clicked_code)
+            if clicked_entity is not None:
+                current = st.session_state[multiselect_key]
+                if clicked_entity in country_list and clicked_entity not in current:
+                    st.session_state[multiselect_key] = current + [clicked_entity]
+                    st.rerun()
+
+    # --- Bar chart: top 5 and bottom 5 countries ---
+    n_each = year_slice.n_each
+
+    if n_each >= 1:
+        st.subheader(f"Top {n_each} and Bottom {n_each} Countries — {selected_year}")
+        fig2 = FIGURE_CACHE.get_or_build(
+            ("top_bottom", name, selected_year),
+            lambda: top_bottom_figure(year_slice, column),
+        )
+        st.plotly_chart(fig2, use_container_width=True)
+    else:
+        st.info("Not enough country data to display the bar chart.")
+
+    # --- Time series ---
+    st.subheader(f"{selected} over time")
+    st.caption("Click a country on the map above to add it here, or select manually.")
+
+    # Filter session state to valid countries in current list
+    valid_defaults = [c for c in st.session_state[multiselect_key] if c in country_list]
+    if valid_defaults != st.session_state[multiselect_key]:
+        st.session_state[multiselect_key] = valid_defaults
+
+    selected_countries: list[str] = st.multiselect(
+        "Select countries",
+        options=country_list,
+        key=multiselect_key,
+    )
+
+    if selected_countries:
+        fig3 = FIGURE_CACHE.get_or_build(
+            ("time_series", name, tuple(selected_countries)),
+            lambda: time_series_figure(index.matrix, selected_countries, column),
+        )
+        st.plotly_chart(fig3, use_container_width=True)
+    else:
+        st.info("Select at least one country to display the time series.")
@@ -1,210 +1,182 @@
 """
-page2.py — AI Environmental Risk Assessment (Day 2, Phase 1 + Phase 2)
-
-Phase 1 (teammate): satellite image download, LLaVA image description,
-                    Mistral risk assessment.
-Phase 2 (data governance): configuration loaded from models.yaml,
-                            every pipeline run logged to database/images.csv,
-                            caching — cached results returned without
-                            re-running the models.
+page2.py — AI Environmental Risk Assessment page.
+
+Renders the location map (with past assessments, see map_overlay.py),
+runs the pipeline of pipeline.py for one location while streaming the
+model answers onto the page, submits locations to the background job
+queue (jobs.py) and summarises DANGER rates by country. The stores,
+models and settings are described in models.yaml and the README.
 """
 
 import logging
-import math
-from datetime import datetime
-from pathlib import Path
 
 import folium
-import ollama
 import pandas as pd
-import requests
 import streamlit as st
-import yaml
 from streamlit_folium import st_folium
 
+if __package__:
+    from .assessment_store import JOB_DONE, JOB_FAILED, AssessmentStore, sha256_bytes
+    from .countries import CountryIndex, enrich_store
+    from .data_loader import load_data
+    from .jobs import JobWorkers
+    from .map_overlay import Viewport, history_layer
+    from .model_manager import ChatResult
+    from .pipeline import (
+        DEFAULT_TILE_SERVICE, Pipeline, database_settings, load_config, open_store, open_tiles,
+        tile_settings, until_verdict,
+    )
+    from .prescreen import SKIP, describe_stats
+    from .timing import StageTimer
+    from .tile_store import TileStore
+    from .verdict import DANGER, verdict_of
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from assessment_store import JOB_DONE, JOB_FAILED, AssessmentStore, sha256_bytes
+    from countries import CountryIndex, enrich_store
+    from data_loader import load_data
+    from jobs import JobWorkers
+    from map_overlay import Viewport, history_layer
+    from model_manager import ChatResult
+    from pipeline import (
+        DEFAULT_TILE_SERVICE, Pipeline, database_settings, load_config, open_store, open_tiles,
+        tile_settings, until_verdict,
+    )
+    from prescreen import SKIP, describe_stats
+    from timing import StageTimer
+    from tile_store import TileStore
+    from verdict import DANGER, verdict_of
+
 logger = logging.getLogger(__name__)
 
+
 # ---------------------------------------------------------------------------
-# Paths  (relative to project root, where `streamlit run app/streamlit_app.py`
-#         is executed)
+# Shared resources (one per process, used by all sessions)
 # ---------------------------------------------------------------------------
-_ROOT = Path(__file__).resolve().parents[1]
-_CONFIG_PATH = _ROOT / "models.yaml"
-_DATABASE_DIR = _ROOT / "database"
-_DATABASE_PATH = _DATABASE_DIR / "images.csv"
-_IMAGE_DIR = _ROOT / "images"
-
-# CSV column order — must match database/images.csv header
-_CSV_COLUMNS = [
-    "timestamp",
-    "latitude",
-    "longitude",
-    "zoom",
-    "image_path",
-    "image_prompt",
-    "image_model",
-    "image_description",
-    "text_prompt",
-    "text_model",
-    "text_description",
-    "danger",
-]
 
+@st.cache_resource
+def _get_store(db_dir: str, db_file: str, csv_export: "str | None", compress: bool) -> AssessmentStore:
+    """Open the assessment store once per process (see pipeline.open_store)."""
+    return open_store(db_dir, db_file, csv_export, compress)
 
-# ---------------------------------------------------------------------------
-# Configuration
-# ---------------------------------------------------------------------------
 
-def load_config() -> dict:
-    """Load AI workflow configuration from models.yaml.
+@st.cache_resource
+def _get_tiles(tile_store: str, tile_service: str, prefetch: int, image_dir: str) -> TileStore:
+    """Open the tile store once per process (see pipeline.open_tiles)."""
+    return open_tiles(tile_store, tile_service, prefetch, image_dir)
 
-    Returns
-    -------
-    dict
-        Parsed YAML configuration.
 
-    Raises
-    ------
-    FileNotFoundError
-        If models.yaml is not found at the project root.
+@st.cache_resource
+def _load_countries() -> CountryIndex:
+    """Build the point-in-country index once per process, from the OkavangoData Page 1 also uses."""
+    return CountryIndex.from_data(load_data())
+
+
+def _get_countries() -> "CountryIndex | None":
+    """Return the country index, or None while the datasets cannot be loaded.
+
+    A failure is not cached, so the next run tries again.
     """
-    if not _CONFIG_PATH.exists():
-        raise FileNotFoundError(
-            f"Configuration file not found: {_CONFIG_PATH}\n"
-            "Ensure models.yaml is present in the project root."
-        )
-    with open(_CONFIG_PATH, "r", encoding="utf-8") as f:
-        config = yaml.safe_load(f)
-    logger.info("Loaded configuration from %s", _CONFIG_PATH)
-    return config
+    try:
+        return _load_countries()
+    except Exception as e:
+        logger.error("Country lookup unavailable, the datasets could not be loaded: %s", e)
+        return None
 
 
-# ---------------------------------------------------------------------------
-# Database helpers
-# ---------------------------------------------------------------------------
+def _make_pipeline(config: dict) -> Pipeline:
+    """Pipeline for models.yaml on the process-wide assessment and tile stores and country index."""
+    return Pipeline(
+        config, _get_store(*database_settings(config)), tiles=_get_tiles(*tile_settings(config)),
+        countries=_get_countries(),
+    )
 
-def _ensure_database() -> pd.DataFrame:
-    """Ensure the database directory and CSV exist; return all existing records.
 
-    Returns
-    -------
-    pd.DataFrame
-        All previously logged pipeline runs (empty if none yet).
-    """
-    _DATABASE_DIR.mkdir(exist_ok=True)
-    if not _DATABASE_PATH.exists():
-        empty = pd.DataFrame(columns=_CSV_COLUMNS)
-        empty.to_csv(_DATABASE_PATH, index=False)
-        logger.info("Created new database at %s", _DATABASE_PATH)
-        return empty
-    return pd.read_csv(_DATABASE_PATH)
-
-
-def _lookup_cache(
-    db: pd.DataFrame,
-    latitude: float,
-    longitude: float,
-    zoom: int,
-) -> "pd.Series | None":
-    """Return the most recent cached row for (latitude, longitude, zoom).
+@st.cache_resource
+def _get_workers() -> JobWorkers:
+    """Start the job queue workers once per process, with the models.yaml of that moment.
 
-    Parameters
-    ----------
-    db : pd.DataFrame
-        Full database loaded from images.csv.
-    latitude : float
-        Latitude of the requested location.
-    longitude : float
-        Longitude of the requested location.
-    zoom : int
-        Zoom level of the requested tile.
-
-    Returns
-    -------
-    pd.Series or None
-        Most recent matching row, or None if no cache entry exists.
+    The pool size is ollama.parallel: the number of requests the Ollama
+    server runs at the same time.
     """
-    matches = db[
-        (db["latitude"] == latitude)
-        & (db["longitude"] == longitude)
-        & (db["zoom"] == zoom)
-    ]
-    if not matches.empty:
-        return matches.iloc[-1]
-    return None
+    config = load_config()
+    return JobWorkers(_make_pipeline(config), workers=(config.get("ollama") or {}).get("parallel", 1)).start()
 
 
-def _append_to_database(record: dict) -> None:
-    """Append one pipeline-run record to database/images.csv.
+@st.fragment(run_every=3)
+def _show_jobs(workers: JobWorkers) -> None:
+    """List the most recent queued analyses with their status and verdict (re-run every 3 s)."""
+    jobs = workers.store.jobs(limit=20)
+    if not jobs:
+        st.caption("No queued analyses yet. Use “Add to queue” to analyse locations in the background.")
+        return
 
-    Parameters
-    ----------
-    record : dict
-        Keys must match _CSV_COLUMNS.
-    """
-    _DATABASE_DIR.mkdir(exist_ok=True)
-    row = pd.DataFrame([record], columns=_CSV_COLUMNS)
-    row.to_csv(
-        _DATABASE_PATH,
-        mode="a",
-        header=not _DATABASE_PATH.exists(),
-        index=False,
-    )
-    logger.info(
-        "Logged to database: lat=%s lon=%s zoom=%s danger=%s",
-        record["latitude"], record["longitude"], record["zoom"], record["danger"],
+    rows = []
+    for job in jobs:
+        result = ""
+        if job["status"] == JOB_FAILED:
+            result = f"failed: {job['error']}"
+        elif job["status"] == JOB_DONE:
+            # the verdict of the job's own run; unknown for jobs finished before runs were recorded
+            result = {"Y": "DANGER", "N": "SAFE"}.get(job["danger"], "—")
+        rows.append({
+            "Job": job["id"],
+            "Status": job["status"],
+            "Latitude": job["latitude"],
+            "Longitude": job["longitude"],
+            "Zoom": job["zoom"],
+            "Submitted": job["submitted"],
+            "Result": result,
+        })
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+    st.caption("Enter the coordinates of a finished job and press “Analyse Area” to see its full result.")
+
+
+def _timing_caption(result: ChatResult, configured: str) -> str:
+    """Describe where the time of one model call went (model load vs inference)."""
+    fallback = f" (fallback for {configured})" if result.model != configured else ""
+    first_token = f"first token {result.first_token_seconds or 0:.1f}s"
+    if result.load_seconds is None:  # stopped at the verdict: Ollama reported no timings
+        return f"{result.model}{fallback}: {result.total_seconds:.1f}s ({first_token}, stopped at the verdict)"
+    return (
+        f"{result.model}{fallback}: {result.total_seconds:.1f}s "
+        f"({first_token}, "
+        f"model load {result.load_seconds:.1f}s, inference {result.inference_seconds:.1f}s, "
+        f"{result.output_tokens} tokens)"
     )
 
 
-# ---------------------------------------------------------------------------
-# Satellite tile download
-# ---------------------------------------------------------------------------
+def _country_caption(countries: CountryIndex, latitude: float, longitude: float) -> str:
+    """Name the country of a location with its latest Page 1 indicators."""
+    country = countries.describe(latitude, longitude)
+    if country is None:
+        return "Country: none (at sea or in a disputed area)"
+    facts = []
+    if pd.notna(country.get("forest_cover")):
+        facts.append(f"forest cover {country['forest_cover']:.1f}% ({country['forest_cover_year']:.0f})")
+    if pd.notna(country.get("deforestation")):
+        facts.append(f"deforestation {country['deforestation']:,.0f} ha/year ({country['deforestation_year']:.0f})")
+    if pd.notna(country.get("land_protected")):
+        facts.append(f"protected {country['land_protected']:.1f}% of land ({country['land_protected_year']:.0f})")
+    return f"Country: {country['iso3']}" + (" — " + " · ".join(facts) if facts else "")
+
+
+def _show_country_risk(store: AssessmentStore, countries: "CountryIndex | None") -> None:
+    """Table of DANGER rates by country, resolving the country of runs stored without one first."""
+    if countries is None:
+        st.caption("The country datasets could not be loaded, see Page 1.")
+        return
+    enrich_store(store, countries)
+    summary = store.danger_by_country()
+    if summary.empty:
+        st.caption("No assessments on land yet.")
+        return
+    st.dataframe(summary, hide_index=True, use_container_width=True)
+    st.caption("Latest assessment of every tile; indicators are the latest values of each country.")
 
-def _download_tile(
-    latitude: float,
-    longitude: float,
-    zoom: int,
-    tile_service: str,
-) -> Path:
-    """Download a satellite tile from ESRI World Imagery and save it locally.
 
-    Parameters
-    ----------
-    latitude : float
-        Latitude of the centre point.
-    longitude : float
-        Longitude of the centre point.
-    zoom : int
-        Zoom level (1–19).
-    tile_service : str
-        Base URL of the tile service.
-
-    Returns
-    -------
-    Path
-        Local path to the saved PNG image.
-    """
-    _IMAGE_DIR.mkdir(exist_ok=True)
-    image_path = _IMAGE_DIR / f"{latitude}_{longitude}_{zoom}.png"
-
-    if image_path.exists():
-        logger.info("Tile already cached locally: %s", image_path)
-        return image_path
-
-    lat_rad = math.radians(latitude)
-    n = 2 ** zoom
-    x_tile = int((longitude + 180.0) / 360.0 * n)
-    y_tile = int(
-        (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi)
-        / 2.0
-        * n
-    )
-    url = f"{tile_service}/{zoom}/{y_tile}/{x_tile}"
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
-    image_path.write_bytes(response.content)
-    logger.info("Downloaded satellite tile to %s", image_path)
-    return image_path
+def _stages_caption(timer: StageTimer) -> str:
+    """Summarise the duration of every stage of a run, e.g. "tile 0.3s · image 12.1s"."""
+    return "Stage timings: " + " · ".join(f"{stage} {seconds:.1f}s" for stage, seconds in timer.seconds().items())
 
 
 # ---------------------------------------------------------------------------
@@ -212,23 +184,23 @@ def _download_tile(
 # ---------------------------------------------------------------------------
 
 def _display_results(
-    image_path: Path,
+    image_bytes: "bytes | None",
     image_description: str,
     risk_text: str,
 ) -> None:
-    """Render the satellite image, AI description, and risk indicator.
+    """Render the satellite image, AI description, and risk indicator of a stored run.
 
     Parameters
     ----------
-    image_path : Path
-        Local path to the tile image.
+    image_bytes : bytes or None
+        Tile image (None if it is no longer stored).
     image_description : str
         Text generated by the image model.
     risk_text : str
         Risk assessment text generated by the text model.
     """
-    if image_path.exists():
-        st.image(str(image_path))
+    if image_bytes is not None:
+        st.image(image_bytes)
     else:
         st.warning("Image file not found locally.")
 
@@ -236,12 +208,16 @@ def _display_results(
     st.write(image_description)
 
     st.subheader("Environmental Risk Assessment")
+    _show_verdict(st, verdict_of(risk_text))
     st.write(risk_text)
 
-    if "DANGER" in risk_text.upper():
-        st.error("⚠️ This area has been flagged as AT ENVIRONMENTAL RISK")
+
+def _show_verdict(container, verdict: str) -> None:
+    """Render the DANGER / SAFE indicator in `container` (st or a placeholder)."""
+    if verdict == DANGER:
+        container.error("⚠️ This area has been flagged as AT ENVIRONMENTAL RISK")
     else:
-        st.success("✅ This area appears to be SAFE")
+        container.success("✅ This area appears to be SAFE")
 
 
 # ---------------------------------------------------------------------------
@@ -255,10 +231,10 @@ def show_page2() -> None:
     --------
     1. Load configuration from models.yaml.
     2. Accept user inputs: latitude, longitude, zoom.
-    3. On "Analyse Area":
-       - Cache hit  → display stored result immediately (no model calls).
-       - Cache miss → download tile, run image model, run text model,
-                      log to database/images.csv, display results.
+    3. On "Analyse Area": run the pipeline now, in this session (_analyse_now).
+    4. On "Add to queue": submit the location to the background job queue.
+    5. List the recent queued analyses, refreshed every few seconds.
+    6. Summarise DANGER rates by country.
     """
     st.title("Okavango AI Risk Assessment")
     st.markdown(
@@ -274,13 +250,8 @@ def show_page2() -> None:
         st.error(str(e))
         return
 
-    img_cfg = config["image_model"]
-    txt_cfg = config["text_model"]
     img_settings = config.get("image_settings", {})
-    tile_service: str = img_settings.get(
-        "tile_service",
-        "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile",
-    )
+    tile_service: str = img_settings.get("tile_service", DEFAULT_TILE_SERVICE)
     default_zoom: int = img_settings.get("default_zoom", 12)
 
     # --- Location inputs ---
@@ -294,7 +265,18 @@ def show_page2() -> None:
         attr="Esri World Imagery",
         name="Satellite",
     ).add_to(m)
-    map_data = st_folium(m, height=400, use_container_width=True)
+    # past assessments in the view the map reported on the previous rerun (st_folium keeps it under its key)
+    history = None
+    if st.checkbox("Show past assessments", value=True):
+        viewport = Viewport.from_map(st.session_state.get("location_map"))
+        history = history_layer(_get_store(*database_settings(config)), viewport)
+        st.caption(
+            "Red: DANGER, green: SAFE, orange: both. Numbered circles group nearby assessments; zoom in to see them."
+        )
+    map_data = st_folium(
+        m, key="location_map", height=400, use_container_width=True, feature_group_to_add=history,
+        returned_objects=["last_clicked", "bounds", "zoom"],
+    )
 
     # Extract clicked coordinates (fall back to 0,0 if nothing clicked yet)
     clicked_lat = 0.0
@@ -315,90 +297,151 @@ def show_page2() -> None:
     with col3:
         zoom = st.slider("Zoom", min_value=1, max_value=19, value=default_zoom)
 
-    run = st.button("Analyse Area")
+    col_run, col_queue = st.columns(2)
+    run = col_run.button("Analyse Area")
+    queue = col_queue.button(
+        "Add to queue",
+        help="Analyse in the background: you can queue several locations and come back later for the results.",
+    )
 
-    if not run:
-        return
+    workers = _get_workers()
+    if queue:
+        job_id = workers.submit(latitude, longitude, zoom)
+        st.success(f"Queued as job {job_id}; its status is listed under Queued analyses below.")
+    if run:
+        pipeline = _make_pipeline(config)
+        if pipeline.countries is not None:
+            st.caption(_country_caption(pipeline.countries, latitude, longitude))
+        _analyse_now(pipeline, workers, latitude, longitude, zoom)
+
+    st.subheader("Queued analyses")
+    _show_jobs(workers)
+
+    st.subheader("Risk by country")
+    if st.checkbox("Show DANGER rates by country"):
+        _show_country_risk(workers.store, _get_countries())
+
+
+def _analyse_now(pipeline: Pipeline, workers: JobWorkers, latitude: float, longitude: float, zoom: int) -> None:
+    """Run the pipeline for one location in this session, streaming the model answers onto the page.
+
+    Cache hit  → display stored result immediately (no model calls).
+    Cache miss → download tile, pre-screen its pixels (a matching "skip"
+                 rule decides the tile without the models), stream the
+                 image model's answer, then the text model's (each
+                 skipped if its own stage cache has the answer; the
+                 verdict is shown as soon as its line arrives), log to
+                 the assessment store with the timing of every stage.
+    """
+    img_cfg, txt_cfg = pipeline.img_cfg, pipeline.txt_cfg
 
-    # --- Step 1: Check database cache ---
-    db = _ensure_database()
-    cached = _lookup_cache(db, latitude, longitude, zoom)
+    # --- Step 1: Check database cache (whole run, same models and prompts) ---
+    cached = pipeline.cached_run(latitude, longitude, zoom)
 
     if cached is not None:
-        st.info("✅ Loaded from cache — this location was already analysed.")
+        st.info("✅ Loaded from cache — this satellite tile was already analysed.")
         _display_results(
-            image_path=_ROOT / str(cached["image_path"]),
+            image_bytes=pipeline.stored_image(cached),
             image_description=str(cached["image_description"]),
             risk_text=str(cached["text_description"]),
         )
         return
 
+    # every stage that runs is timed and logged with the run (see timing.py)
+    timer = StageTimer()
+
     # --- Step 2: Download satellite tile ---
     with st.spinner("Fetching satellite image..."):
         try:
-            image_path = _download_tile(latitude, longitude, zoom, tile_service)
+            image_bytes = pipeline.download_tile(latitude, longitude, zoom, timer)
+            image_sha256 = sha256_bytes(image_bytes)
             st.success("Satellite image downloaded!")
         except Exception as e:
             st.error(f"Failed to download satellite image: {e}")
             logger.error("Tile download failed: %s", e)
             return
+    st.image(image_bytes)
+
+    # --- Step 2b: Pixel pre-screen (obvious tiles are decided without the models) ---
+    with timer.span("prescreen"):
+        stats, rule = pipeline.prescreen(image_sha256, image_bytes)
+    if stats is not None:
+        matched = f" — rule “{rule.name}”" if rule is not None else ""
+        st.caption(f"Pre-screen: {describe_stats(stats)}{matched}")
+    if rule is not None and rule.action == SKIP:
+        record = pipeline.prescreened_record(latitude, longitude, zoom, image_sha256, stats, rule, timer)
+        st.info(f"Pre-screen rule “{rule.name}” matched: the AI models were not needed for this tile.")
+        st.subheader("AI Image Description")
+        st.write(record["image_description"])
+        st.subheader("Environmental Risk Assessment")
+        _show_verdict(st, rule.verdict)
+        st.write(record["text_description"])
+        pipeline.log(record)
+        st.caption(_stages_caption(timer))
+        return
 
-    # --- Step 3: Image description with model from config ---
-    st.subheader("AI Image Description")
-    image_prompt: str = img_cfg["prompt"]
-
-    with st.spinner(f"Analysing image with {img_cfg['name']}… this may take a minute."):
-        try:
-            ollama.pull(img_cfg["name"])
-            with open(image_path, "rb") as f:
-                image_bytes = f.read()
-            img_response = ollama.chat(
-                model=img_cfg["name"],
-                messages=[{
-                    "role": "user",
-                    "content": image_prompt,
-                    "images": [image_bytes],
-                }],
-            )
-            image_description: str = img_response["message"]["content"]
-        except Exception as e:
-            st.error(f"Image model failed: {e}")
-            logger.error("Image model error: %s", e)
-            return
-
-    # --- Step 4: Risk assessment with model from config ---
-    st.subheader("Environmental Risk Assessment")
-    text_prompt: str = txt_cfg["prompt"].replace("{description}", image_description)
-
-    with st.spinner(f"Assessing environmental risk with {txt_cfg['name']}..."):
-        try:
-            ollama.pull(txt_cfg["name"])
-            txt_response = ollama.chat(
-                model=txt_cfg["name"],
-                messages=[{"role": "user", "content": text_prompt}],
-            )
-            risk_text: str = txt_response["message"]["content"]
-        except Exception as e:
-            st.error(f"Text model failed: {e}")
-            logger.error("Text model error: %s", e)
-            return
+    # --- Steps 3 and 4 hold a model slot, shared with the job queue workers ---
+    waiting = st.empty()
+    with workers.model_slot(
+        on_wait=lambda: waiting.info("The model server is busy with queued analyses, waiting for a free slot...")
+    ):
+        waiting.empty()
+        # --- Step 3: Image description with model from config (cached per image, model and prompt) ---
+        st.subheader("AI Image Description")
+        image_description, image_model = pipeline.cached_description(image_sha256)
+
+        if image_description is not None:
+            st.caption("Image description loaded from cache.")
+            st.write(image_description)
+        else:
+            status = st.empty()
+            status.caption(f"Analysing image with {img_cfg['name']}… this may take a minute.")
+            try:
+                with timer.span("image") as span:
+                    img_stream = pipeline.describe(image_bytes)
+                    image_description = st.write_stream(img_stream)
+                    span.record_model(img_stream.result)
+            except Exception as e:
+                st.error(f"Image model failed: {e}")
+                logger.error("Image model error: %s", e)
+                return
+            image_model = img_stream.result.model
+            status.caption(_timing_caption(img_stream.result, img_cfg["name"]))
+            pipeline.store.put_description(image_sha256, image_model, img_cfg["prompt"], image_description)
+
+        # --- Step 4: Risk assessment with model from config (cached per description, model and prompt) ---
+        st.subheader("Environmental Risk Assessment")
+        verdict_slot = st.empty()
+        risk_text, text_model = pipeline.cached_risk(image_description)
+
+        if risk_text is not None:
+            st.caption("Risk assessment loaded from cache.")
+            st.write(risk_text)
+        else:
+            status = st.empty()
+            status.caption(f"Assessing environmental risk with {txt_cfg['name']}...")
+            try:
+                with timer.span("text") as span:
+                    txt_stream = pipeline.assess(image_description)
+                    risk_text = st.write_stream(
+                        until_verdict(txt_stream, lambda verdict: _show_verdict(verdict_slot, verdict))
+                    )
+                    span.record_model(txt_stream.result)
+            except Exception as e:
+                st.error(f"Text model failed: {e}")
+                logger.error("Text model error: %s", e)
+                return
+            text_model = txt_stream.result.model
+            status.caption(_timing_caption(txt_stream.result, txt_cfg["name"]))
+            pipeline.store.put_risk(image_description, text_model, txt_cfg["prompt"], risk_text)
+
+    _show_verdict(verdict_slot, verdict_of(risk_text))
 
     # --- Step 5: Log to database ---
-    danger_flag = "Y" if "DANGER" in risk_text.upper() else "N"
-    _append_to_database({
-        "timestamp":         datetime.now().isoformat(timespec="seconds"),
-        "latitude":          latitude,
-        "longitude":         longitude,
-        "zoom":              zoom,
-        "image_path":        str(image_path.relative_to(_ROOT)),
-        "image_prompt":      image_prompt,
-        "image_model":       img_cfg["name"],
-        "image_description": image_description,
-        "text_prompt":       text_prompt,
-        "text_model":        txt_cfg["name"],
-        "text_description":  risk_text,
-        "danger":            danger_flag,
-    })
-
-    # --- Step 6: Display results ---
-    _display_results(image_path, image_description, risk_text)
+    pipeline.log(pipeline.make_record(
+        latitude, longitude, zoom, image_sha256,
+        image_description, image_model, risk_text, text_model,
+        prescreen=rule.name if rule is not None else None,
+        timer=timer,
+    ))
+    st.caption(_stages_caption(timer))
@@ -0,0 +1,534 @@
+"""
+pipeline.py — the Page 2 risk-assessment pipeline, without the UI.
+
+One location goes through: whole-run cache lookup → satellite tile
+(from the tile store, downloaded if missing) → pixel pre-screen, which
+may decide obvious tiles on its own → image model → text model → log to
+the assessment store, with the country of the location when a country
+index is given (countries.py). Page 2 drives these steps one by one to
+stream the answers onto the page; the batch CLI (batch.py) runs them for thousands of locations with
+Pipeline.analyse. Both share the configuration (models.yaml), the
+assessment store and its caches, so work done by one is reused by the
+other.
+"""
+
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import requests
+import yaml
+
+if __package__:
+    from .assessment_store import AssessmentStore, sha256_bytes, sha256_text
+    from .countries import CountryIndex
+    from .model_manager import ChatStream, ModelManager, candidates, manager_from_config
+    from .prescreen import (
+        PRESCREEN_MODEL, SKIP, PrescreenRule, TileStats,
+        describe_stats, first_match, rules_from_config, tile_stats,
+    )
+    from .tile_store import TileStore
+    from .tiles import tile_for
+    from .timing import StageTimer
+    from .verdict import DANGER, VerdictWatcher, verdict_of
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from assessment_store import AssessmentStore, sha256_bytes, sha256_text
+    from countries import CountryIndex
+    from model_manager import ChatStream, ModelManager, candidates, manager_from_config
+    from prescreen import (
+        PRESCREEN_MODEL, SKIP, PrescreenRule, TileStats,
+        describe_stats, first_match, rules_from_config, tile_stats,
+    )
+    from tile_store import TileStore
+    from tiles import tile_for
+    from timing import StageTimer
+    from verdict import DANGER, VerdictWatcher, verdict_of
+
+logger = logging.getLogger(__name__)
+
+# Paths are relative to the project root
+ROOT = Path(__file__).resolve().parents[1]
+CONFIG_PATH = ROOT / "models.yaml"
+DEFAULT_TILE_SERVICE = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile"
+
+
+def load_config() -> dict:
+    """Load AI workflow configuration from models.yaml.
+
+    Returns
+    -------
+    dict
+        Parsed YAML configuration.
+
+    Raises
+    ------
+    FileNotFoundError
+        If models.yaml is not found at the project root.
+    """
+    if not CONFIG_PATH.exists():
+        raise FileNotFoundError(
+            f"Configuration file not found: {CONFIG_PATH}\n"
+            "Ensure models.yaml is present in the project root."
+        )
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    logger.info("Loaded configuration from %s", CONFIG_PATH)
+    return config
+
+
+def database_settings(config: dict) -> "tuple[str, str, str | None, bool]":
+    """Return (directory, SQLite file, CSV export file or None, compression) from the database section."""
+    db_cfg = config.get("database", {})
+    return (
+        db_cfg.get("dir", "database"),
+        db_cfg.get("file", "images.db"),
+        db_cfg.get("csv_export"),
+        db_cfg.get("compress", True),
+    )
+
+
+def open_store(db_dir: str, db_file: str, csv_export: "str | None", compress: bool = True) -> AssessmentStore:
+    """Open the assessment store, importing the legacy CSV log on first open.
+
+    Parameters
+    ----------
+    db_dir : str
+        Database directory, relative to the project root.
+    db_file : str
+        SQLite file name inside db_dir.
+    csv_export : str or None
+        CSV file name inside db_dir, imported once and kept as an export.
+    compress : bool
+        Store descriptions and risk texts zlib-compressed.
+
+    Returns
+    -------
+    AssessmentStore
+        Store holding every logged pipeline run.
+    """
+    database_dir = ROOT / db_dir
+    legacy_csv = database_dir / csv_export if csv_export else None
+    store = AssessmentStore(database_dir / db_file, legacy_csv=legacy_csv, compress=compress)
+    store.seed_description_cache(ROOT)
+    logger.info("Opened assessment store at %s", store.path)
+    return store
+
+
+def tile_settings(config: dict) -> "tuple[str, str, int, str]":
+    """Return (tile store file, tile service URL, prefetch radius, legacy image directory) from image_settings."""
+    img_settings = config.get("image_settings", {})
+    return (
+        img_settings.get("tile_store", "images/tiles.mbtiles"),
+        img_settings.get("tile_service", DEFAULT_TILE_SERVICE),
+        img_settings.get("prefetch", 0),
+        img_settings.get("image_dir", "images"),
+    )
+
+
+def open_tiles(
+    tile_store: str,
+    tile_service: str,
+    prefetch: int = 0,
+    image_dir: "str | None" = None,
+    session: "requests.Session | None" = None,
+) -> TileStore:
+    """Open the tile store, packing in the loose tiles left by earlier versions.
+
+    Parameters
+    ----------
+    tile_store : str
+        SQLite file of the tile store, relative to the project root.
+    tile_service : str
+        Base URL of the XYZ tile service.
+    prefetch : int
+        Radius, in tiles, of the neighbours downloaded in the background.
+    image_dir : str, optional
+        Directory of loose {zoom}_{x}_{y}.png tiles to import, relative to
+        the project root.
+    session : requests.Session, optional
+        Session for tile downloads (default: a new pooled, retrying session).
+
+    Returns
+    -------
+    TileStore
+        Store of every downloaded satellite tile.
+    """
+    tiles = TileStore(ROOT / tile_store, tile_service, session=session, prefetch_radius=prefetch)
+    if image_dir is not None:
+        tiles.import_directory(ROOT / image_dir)
+    logger.info("Opened tile store at %s (%d tiles)", tiles.path, len(tiles))
+    return tiles
+
+
+def until_verdict(stream: ChatStream, on_verdict=None):
+    """Pass the chunks of a streamed risk assessment through until its verdict line.
+
+    The prompt asks for the verdict as the last line, so once that line is
+    complete `on_verdict(verdict)` is called right away and the generation
+    is stopped instead of waiting for the model to finish.
+    """
+    watcher = VerdictWatcher()
+    chunks = iter(stream)
+    for chunk in chunks:
+        if watcher.feed(chunk):
+            yield chunk[:len(chunk) - len(watcher.tail)]
+            if on_verdict is not None:
+                on_verdict(watcher.verdict)
+            chunks.close()
+            return
+        yield chunk
+
+
+class Pipeline:
+    """Runs the risk assessment of locations with one configuration and store.
+
+    Parameters
+    ----------
+    config : dict
+        Parsed models.yaml.
+    store : AssessmentStore
+        Store used for the caches and the run log.
+    models : ModelManager, optional
+        Defaults to the process-wide manager for config.
+    session : requests.Session, optional
+        Session for tile downloads (default: a new pooled, retrying session).
+    tiles : TileStore, optional
+        Store of satellite tiles (default: the one of image_settings,
+        downloading with `session`).
+    countries : CountryIndex, optional
+        If given, every logged run is stored with the country of its
+        location and that country's latest indicators.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        store: AssessmentStore,
+        models: "ModelManager | None" = None,
+        session: "requests.Session | None" = None,
+        tiles: "TileStore | None" = None,
+        countries: "CountryIndex | None" = None,
+    ):
+        self.config = config
+        self.img_cfg = config["image_model"]
+        self.txt_cfg = config["text_model"]
+        self.store = store
+        self.models = models if models is not None else manager_from_config(config)
+        self.rules = rules_from_config(config)
+        self.tiles = tiles if tiles is not None else open_tiles(*tile_settings(config), session=session)
+        self.countries = countries
+        db_dir, _, csv_export, _ = database_settings(config)
+        self.csv_path = ROOT / db_dir / csv_export if csv_export else None
+
+    # --- whole runs ---------------------------------------------------------
+
+    def matches_config(self, record: dict) -> bool:
+        """Return True if a stored run used the prompts and models (or fallbacks) currently configured.
+
+        A run decided by a pre-screen rule matches if that rule would still
+        skip the tile.
+        """
+        description = record["image_description"] or ""
+        if record["image_model"] == PRESCREEN_MODEL:
+            stats = self.store.get_tile_stats(record["image_sha256"]) if record.get("image_sha256") else None
+            rule = first_match(TileStats(**stats), self.rules) if stats is not None else None
+            return (
+                rule is not None and rule.action == SKIP and rule.name == record.get("prescreen")
+                and record["image_prompt"] == self.img_cfg["prompt"]
+                and record["text_prompt"] == self.text_prompt(description)
+            )
+        return (
+            record["image_model"] in candidates(self.img_cfg)
+            and record["image_prompt"] == self.img_cfg["prompt"]
+            and record["text_model"] in candidates(self.txt_cfg)
+            and record["text_prompt"] == self.text_prompt(description)
+        )
+
+    def job_key(self, latitude: float, longitude: float, zoom: int) -> str:
+        """Identify the analysis of a location: its tile plus the configured models and prompts."""
+        x_tile, y_tile = tile_for(latitude, longitude, zoom)
+        return sha256_text("\n".join([
+            f"{zoom}/{x_tile}/{y_tile}",
+            *candidates(self.img_cfg), self.img_cfg["prompt"],
+            *candidates(self.txt_cfg), self.txt_cfg["prompt"],
+        ]))
+
+    def cached_run(self, latitude: float, longitude: float, zoom: int) -> "dict | None":
+        """Return the stored run for the tile of a location, if it matches the configuration."""
+        cached = self.store.lookup(latitude, longitude, zoom)
+        if cached is not None and self.matches_config(cached):
+            return cached
+        return None
+
+    # --- satellite tile -----------------------------------------------------
+
+    def download_tile(
+        self, latitude: float, longitude: float, zoom: int, timer: "StageTimer | None" = None,
+    ) -> bytes:
+        """Return the satellite tile containing a point, from the tile store or the tile service.
+
+        Every point inside an already downloaded tile reuses the stored tile.
+
+        Parameters
+        ----------
+        latitude : float
+            Latitude of the point.
+        longitude : float
+            Longitude of the point.
+        zoom : int
+            Zoom level (1–19).
+        timer : StageTimer, optional
+            Timer of the run; the download is timed as stage "tile".
+
+        Returns
+        -------
+        bytes
+            PNG image of the tile.
+        """
+        with (timer or StageTimer()).span("tile"):
+            image_bytes, _ = self.tiles.get_for(latitude, longitude, zoom)
+        return image_bytes
+
+    def tile_path(self, latitude: float, longitude: float, zoom: int) -> str:
+        """Return the image_path recorded for the tile of a point: tile store file#zoom/x/y."""
+        x_tile, y_tile = tile_for(latitude, longitude, zoom)
+        store_path = self.tiles.path
+        if store_path.is_relative_to(ROOT):
+            store_path = store_path.relative_to(ROOT)
+        return f"{store_path}#{zoom}/{x_tile}/{y_tile}"
+
+    def stored_image(self, record: dict) -> "bytes | None":
+        """Return the tile image of a stored run, or None if it is no longer available.
+
+        Runs logged before the tile store point to a loose PNG file instead.
+        """
+        image_bytes = self.tiles.get_local(record["zoom"], record["tile_x"], record["tile_y"])
+        if image_bytes is None and record.get("image_path"):
+            image_path = ROOT / str(record["image_path"])
+            if image_path.is_file():
+                image_bytes = image_path.read_bytes()
+        return image_bytes
+
+    # --- pixel pre-screen ---------------------------------------------------
+
+    def prescreen(self, image_sha256: str, image_bytes: bytes) -> "tuple[TileStats | None, PrescreenRule | None]":
+        """Compute and store the pixel statistics of a tile; return them with the first matching rule.
+
+        A tile that cannot be decoded gets (None, None): the models still run.
+        """
+        try:
+            stats = tile_stats(image_bytes)
+        except Exception as e:
+            logger.warning("Could not pre-screen image %s: %s", image_sha256[:12], e)
+            return None, None
+        self.store.put_tile_stats(image_sha256, stats.as_dict())
+        return stats, first_match(stats, self.rules)
+
+    def prescreened_record(
+        self,
+        latitude: float,
+        longitude: float,
+        zoom: int,
+        image_sha256: str,
+        stats: TileStats,
+        rule: PrescreenRule,
+        timer: "StageTimer | None" = None,
+    ) -> dict:
+        """Build the record of a run decided by a pre-screen rule, without calling the models."""
+        description = f"{rule.note or rule.name} ({describe_stats(stats)})"
+        risk_text = f"Pre-screen rule \"{rule.name}\" matched; the models were not run.\n{rule.verdict}"
+        return self.make_record(
+            latitude, longitude, zoom, image_sha256,
+            description, PRESCREEN_MODEL, risk_text, PRESCREEN_MODEL, prescreen=rule.name, timer=timer,
+        )
+
+    # --- model stages -------------------------------------------------------
+
+    def text_prompt(self, description: str) -> str:
+        """Return the text model prompt for an image description."""
+        return self.txt_cfg["prompt"].replace("{description}", description)
+
+    @staticmethod
+    def _cached_answer(lookup, key: str, models: list[str], prompt: str) -> "tuple[str | None, str | None]":
+        """Look up a stage cache for the configured model, then for its fallbacks.
+
+        Returns (answer, model that gave it), or (None, None) on a miss.
+        """
+        for model in models:
+            answer = lookup(key, model, prompt)
+            if answer is not None:
+                return answer, model
+        return None, None
+
+    def cached_description(self, image_sha256: str) -> "tuple[str | None, str | None]":
+        """Return (description, model) from the image stage cache, or (None, None).
+
+        Images with identical pixels (see prescreen.pixel_sha256) share their
+        descriptions, so a duplicate tile is not described again. Tiles that
+        only look alike (same content hash) are described on their own.
+        """
+        for image in [image_sha256, *self.store.duplicate_images(image_sha256)]:
+            description, model = self._cached_answer(
+                self.store.get_description, image, candidates(self.img_cfg), self.img_cfg["prompt"],
+            )
+            if description is not None:
+                return description, model
+        return None, None
+
+    def cached_risk(self, description: str) -> "tuple[str | None, str | None]":
+        """Return (risk assessment, model) from the text stage cache, or (None, None)."""
+        return self._cached_answer(
+            self.store.get_risk, description, candidates(self.txt_cfg), self.txt_cfg["prompt"],
+        )
+
+    def describe(self, image_bytes: bytes) -> ChatStream:
+        """Start streaming the image model's description of a tile."""
+        return self.models.stream_for(
+            self.img_cfg,
+            [{"role": "user", "content": self.img_cfg["prompt"], "images": [image_bytes]}],
+        )
+
+    def assess(self, description: str) -> ChatStream:
+        """Start streaming the text model's risk assessment of a description."""
+        return self.models.stream_for(
+            self.txt_cfg,
+            [{"role": "user", "content": self.text_prompt(description)}],
+        )
+
+    # --- run log ------------------------------------------------------------
+
+    def make_record(
+        self,
+        latitude: float,
+        longitude: float,
+        zoom: int,
+        image_sha256: str,
+        image_description: str,
+        image_model: str,
+        risk_text: str,
+        text_model: str,
+        prescreen: "str | None" = None,
+        timer: "StageTimer | None" = None,
+    ) -> dict:
+        """Build the assessment_store record of one completed run.
+
+        `prescreen` is the name of the matched pre-screen rule; the spans of
+        `timer` are stored as the stage timings of the run.
+        """
+        return {
+            "timestamp":         datetime.now().isoformat(timespec="seconds"),
+            "latitude":          latitude,
+            "longitude":         longitude,
+            "zoom":              zoom,
+            "image_path":        self.tile_path(latitude, longitude, zoom),
+            "image_prompt":      self.img_cfg["prompt"],
+            "image_model":       image_model,
+            "image_description": image_description,
+            "text_prompt":       self.text_prompt(image_description),
+            "text_template":     self.txt_cfg["prompt"],
+            "text_model":        text_model,
+            "text_description":  risk_text,
+            "danger":            "Y" if verdict_of(risk_text) == DANGER else "N",
+            "image_sha256":      image_sha256,
+            "prescreen":         prescreen,
+            "timings":           timer.rows() if timer is not None else [],
+        }
+
+    def log(self, record: dict) -> int:
+        """Log one pipeline-run record to the store (and the CSV export, if enabled).
+
+        Parameters
+        ----------
+        record : dict
+            Keys must match assessment_store.COLUMNS.
+
+        Returns
+        -------
+        int
+            Id of the stored run.
+        """
+        run_id = self.store.append(record)
+        if self.countries is not None:
+            self.store.put_countries(self.countries.enrich(pd.DataFrame(
+                {"id": [run_id], "latitude": [record["latitude"]], "longitude": [record["longitude"]]}
+            )))
+        if self.csv_path is not None:
+            self.store.append_csv(self.csv_path, record)
+        logger.info(
+            "Logged to database: lat=%s lon=%s zoom=%s danger=%s",
+            record["latitude"], record["longitude"], record["zoom"], record["danger"],
+        )
+        return run_id
+
+    # --- without UI -----------------------------------------------------------
+
+    def analyse_image(
+        self,
+        image_bytes: bytes,
+        latitude: float,
+        longitude: float,
+        zoom: int,
+        timer: "StageTimer | None" = None,
+    ) -> dict:
+        """Run both model stages on a downloaded tile (each skipped on a cache hit) and log the run.
+
+        If a pre-screen rule skips the tile, no model is called. The stages
+        that ran are timed ("prescreen", "image", "text") on `timer`, which
+        may already hold the "tile" download, and logged with the run.
+
+        Returns
+        -------
+        dict
+            The logged record, with the id of the stored run.
+        """
+        timer = timer or StageTimer()
+        image_sha256 = sha256_bytes(image_bytes)
+        with timer.span("prescreen"):
+            stats, rule = self.prescreen(image_sha256, image_bytes)
+        if rule is not None and rule.action == SKIP:
+            record = self.prescreened_record(latitude, longitude, zoom, image_sha256, stats, rule, timer)
+            record["id"] = self.log(record)
+            return record
+
+        description, image_model = self.cached_description(image_sha256)
+        if description is None:
+            with timer.span("image") as span:
+                stream = self.describe(image_bytes)
+                description = "".join(stream)
+                span.record_model(stream.result)
+            image_model = stream.result.model
+            self.store.put_description(image_sha256, image_model, self.img_cfg["prompt"], description)
+
+        risk_text, text_model = self.cached_risk(description)
+        if risk_text is None:
+            with timer.span("text") as span:
+                stream = self.assess(description)
+                risk_text = "".join(until_verdict(stream))
+                span.record_model(stream.result)
+            text_model = stream.result.model
+            self.store.put_risk(description, text_model, self.txt_cfg["prompt"], risk_text)
+
+        record = self.make_record(
+            latitude, longitude, zoom, image_sha256,
+            description, image_model, risk_text, text_model,
+            prescreen=rule.name if rule is not None else None,
+            timer=timer,
+        )
+        record["id"] = self.log(record)
+        return record
+
+    def analyse(self, latitude: float, longitude: float, zoom: int) -> "tuple[dict, bool]":
+        """Assess one location end to end.
+
+        Returns
+        -------
+        tuple[dict, bool]
+            The run record, and whether it came from the whole-run cache.
+        """
+        cached = self.cached_run(latitude, longitude, zoom)
+        if cached is not None:
+            return cached, True
+        timer = StageTimer()
+        image_bytes = self.download_tile(latitude, longitude, zoom, timer)
+        return self.analyse_image(image_bytes, latitude, longitude, zoom, timer), False
@@ -0,0 +1,185 @@
+"""
+prescreen.py — fast pixel statistics of a satellite tile, before any model runs.
+
+Open ocean, cloud-covered or featureless tiles used to go through the full
+image model + text model pipeline like any complex scene. tile_stats
+computes a few statistics of a tile with NumPy in milliseconds:
+
+- the fraction of water, vegetation, bare-soil and cloud (or snow) pixels,
+  from simple colour indices of the RGB image;
+- the Shannon entropy of the grey levels, low for uniform tiles;
+- a pixel hash (SHA-256 of the decoded pixels), equal for tiles with the
+  same pixels even when their files differ, so an exact duplicate can
+  reuse an earlier description;
+- a content hash of a coarse, quantised thumbnail, equal for tiles that
+  merely look alike. Different places can share it, so it only records
+  near-duplicates and is never used to reuse a result.
+
+The rules in the `prescreen` section of models.yaml then either
+short-circuit a tile (action "skip": no model is called and the rule's
+verdict is logged) or only annotate it (action "annotate": the models run
+and the rule is recorded with the run).
+"""
+
+import hashlib
+import io
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from PIL import Image
+
+if __package__:
+    from .verdict import DANGER, SAFE
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from verdict import DANGER, SAFE
+
+PRESCREEN_MODEL = "prescreen"  # image_model / text_model recorded for runs decided by a rule
+SKIP, ANNOTATE = "skip", "annotate"
+
+_THUMBNAIL = 16  # side of the thumbnail behind the content hash
+_LEVELS = 16  # grey levels per channel of that thumbnail
+
+
+@dataclass(frozen=True)
+class TileStats:
+    """Pixel statistics of one tile; fractions are of all pixels, entropy is in bits (0–8)."""
+
+    water: float
+    vegetation: float
+    bare: float
+    cloud: float
+    entropy: float
+    brightness: float
+    content_hash: str
+    pixel_sha256: "str | None" = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _rgb(image_bytes: bytes) -> np.ndarray:
+    """Decode an image into a (height, width, 3) float32 array with values in [0, 1]."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return np.asarray(image.convert("RGB"), dtype=np.float32) / 255.0
+
+
+def pixel_sha256(rgb: np.ndarray) -> str:
+    """Hash the decoded pixels (and size) of an image: equal only for identical pixels."""
+    pixels = np.round(rgb * 255).astype(np.uint8)
+    return hashlib.sha256(str(pixels.shape).encode() + pixels.tobytes()).hexdigest()
+
+
+def content_hash(rgb: np.ndarray) -> str:
+    """Hash a coarse, quantised thumbnail of an image: equal for tiles that look alike (informational)."""
+    height, width, _ = rgb.shape
+    # block edges (images smaller than the thumbnail keep one block per pixel)
+    rows = np.linspace(0, height, min(_THUMBNAIL, height) + 1).astype(int)
+    cols = np.linspace(0, width, min(_THUMBNAIL, width) + 1).astype(int)
+    # block means: sum over the row blocks, then over the column blocks
+    sums = np.add.reduceat(np.add.reduceat(rgb, rows[:-1], axis=0), cols[:-1], axis=1)
+    counts = np.outer(np.diff(rows), np.diff(cols))[..., None]
+    thumbnail = np.minimum(sums / counts * _LEVELS, _LEVELS - 1).astype(np.uint8)
+    return hashlib.sha256(thumbnail.tobytes()).hexdigest()
+
+
+def tile_stats(image_bytes: bytes) -> TileStats:
+    """Compute the pixel statistics of an encoded (PNG or JPEG) tile.
+
+    Pixels are classified in this order, each pixel counting once: cloud
+    (bright and grey), water (dark, blue above red and at least as blue as
+    green), vegetation (green above red, excess green) and bare soil
+    (red ≥ green ≥ blue, e.g. sand or dry earth). Other pixels (roads,
+    roofs, shadows) are in no class.
+    """
+    rgb = _rgb(image_bytes)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    total = r + g + b + 1e-6
+    brightness = total / 3
+    saturation = rgb.max(axis=2) - rgb.min(axis=2)
+
+    cloud = (brightness > 0.75) & (saturation < 0.12)
+    water = ~cloud & (brightness < 0.5) & (b > r + 0.02) & (b + 0.02 >= g)
+    vegetation = ~cloud & ~water & (g > r) & ((2 * g - r - b) / total > 0.03)
+    bare = ~cloud & ~water & ~vegetation & (r >= g) & (g >= b) & (r - b > 0.05)
+
+    grey = np.round(brightness * 255).astype(np.uint8)
+    p = np.bincount(grey.ravel(), minlength=256) / grey.size
+    p = p[p > 0]
+    return TileStats(
+        water=float(water.mean()),
+        vegetation=float(vegetation.mean()),
+        bare=float(bare.mean()),
+        cloud=float(cloud.mean()),
+        entropy=float(-(p * np.log2(p)).sum()),
+        brightness=float(brightness.mean()),
+        content_hash=content_hash(rgb),
+        pixel_sha256=pixel_sha256(rgb),
+    )
+
+
+@dataclass(frozen=True)
+class PrescreenRule:
+    """One rule of models.yaml: if every bound in `when` holds, apply `action`.
+
+    `when` maps a TileStats field to {"min": ..., "max": ...} (either may
+    be left out); `verdict` (DANGER or SAFE) and `note` are logged for
+    skipped tiles.
+    """
+
+    name: str
+    when: dict
+    action: str = ANNOTATE
+    verdict: str = SAFE
+    note: str = ""
+
+    def matches(self, stats: TileStats) -> bool:
+        values = stats.as_dict()
+        return all(
+            bounds.get("min", -np.inf) <= values[field] <= bounds.get("max", np.inf)
+            for field, bounds in self.when.items()
+        )
+
+
+def rules_from_config(config: dict) -> list[PrescreenRule]:
+    """Return the rules of the `prescreen` section of models.yaml (none if it is disabled).
+
+    Raises
+    ------
+    ValueError
+        If a rule uses an unknown statistic, action or verdict.
+    """
+    section = config.get("prescreen") or {}
+    if not section.get("enabled", True):
+        return []
+    fields = set(TileStats.__dataclass_fields__) - {"content_hash", "pixel_sha256"}
+    rules = []
+    for rule_cfg in section.get("rules") or []:
+        rule = PrescreenRule(
+            name=rule_cfg["name"],
+            when=dict(rule_cfg.get("when") or {}),
+            action=rule_cfg.get("action", ANNOTATE),
+            verdict=str(rule_cfg.get("verdict", SAFE)).upper(),
+            note=(rule_cfg.get("note") or "").strip(),
+        )
+        if not set(rule.when) <= fields:
+            unknown = sorted(set(rule.when) - fields)
+            raise ValueError(f"Pre-screen rule {rule.name!r}: unknown statistics {unknown}")
+        if rule.action not in (SKIP, ANNOTATE):
+            raise ValueError(f"Pre-screen rule {rule.name!r}: action must be {SKIP!r} or {ANNOTATE!r}")
+        if rule.verdict not in (DANGER, SAFE):
+            raise ValueError(f"Pre-screen rule {rule.name!r}: verdict must be {DANGER} or {SAFE}")
+        rules.append(rule)
+    return rules
+
+
+def first_match(stats: TileStats, rules: list[PrescreenRule]) -> "PrescreenRule | None":
+    """Return the first rule matching a tile, or None."""
+    return next((rule for rule in rules if rule.matches(stats)), None)
+
+
+def describe_stats(stats: TileStats) -> str:
+    """Summarise the statistics of a tile in one line."""
+    return (
+        f"water {stats.water:.0%}, vegetation {stats.vegetation:.0%}, bare soil {stats.bare:.0%}, "
+        f"cloud {stats.cloud:.0%}, entropy {stats.entropy:.1f} bits"
+    )
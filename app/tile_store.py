@@ -0,0 +1,240 @@
+"""
+tile_store.py — satellite tiles packed in one SQLite file.
+
+Tiles used to be written as loose PNG files in images/, one per tile, and
+fetched over a fresh connection with no retries. TileStore keeps them in a
+single file with the MBTiles layout (a `tiles` table keyed by zoom_level,
+tile_column, tile_row, plus a `metadata` table), so it can also be opened
+by standard map tools. Note that MBTiles counts rows from the south (TMS),
+while the tile service and the rest of the app count from the north (XYZ);
+TileStore converts at its boundary.
+
+Missing tiles are fetched over a pooled, retrying session (see
+http_session.py), and the neighbours of a requested tile can be
+prefetched in the background, since users tend to look around the
+location they just analysed.
+"""
+
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import requests
+
+if __package__:
+    from .http_session import make_session
+    from .tiles import tile_for, tile_of_file
+else:  # `streamlit run app/streamlit_app.py` puts app/ itself on sys.path
+    from http_session import make_session
+    from tiles import tile_for, tile_of_file
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_WORKERS = 4  # background downloads of neighbouring tiles
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    name  TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level  INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row    INTEGER NOT NULL,
+    tile_data   BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+CREATE TABLE IF NOT EXISTS imported_files (
+    name     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+def _tms_row(zoom: int, y: int) -> int:
+    """Convert an XYZ row (from the north) to an MBTiles/TMS row (from the south), and back."""
+    return (1 << zoom) - 1 - y
+
+
+class TileStore:
+    """Satellite tiles in one MBTiles-style SQLite file, fetched on demand.
+
+    Parameters
+    ----------
+    path : Path
+        SQLite file (created if missing).
+    tile_service : str
+        Base URL of the XYZ tile service ({tile_service}/{z}/{y}/{x}).
+    session : requests.Session, optional
+        Session for downloads (default: a new pooled, retrying session).
+    prefetch_radius : int
+        After a download, also fetch the tiles up to this many tiles away
+        in the background (0 disables prefetching).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        tile_service: str,
+        session: "requests.Session | None" = None,
+        prefetch_radius: int = 0,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tile_service = tile_service
+        self.session = session if session is not None else make_session(PREFETCH_WORKERS + 1)
+        self.prefetch_radius = prefetch_radius
+        self._prefetcher: "ThreadPoolExecutor | None" = None
+        self._prefetching: set[tuple[int, int, int]] = set()
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                "INSERT OR IGNORE INTO metadata VALUES (?, ?)",
+                [("name", "Okavango satellite tiles"), ("format", "png"), ("type", "baselayer")],
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a short-lived autocommit connection."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # -----------------------------------------------------------------------
+    # Local tiles
+    # -----------------------------------------------------------------------
+
+    def get_local(self, zoom: int, x: int, y: int) -> "bytes | None":
+        """Return a stored tile, or None if it was never downloaded."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (zoom, x, _tms_row(zoom, y)),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, zoom: int, x: int, y: int, data: bytes) -> None:
+        """Store (or replace) one tile."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                (zoom, x, _tms_row(zoom, y), sqlite3.Binary(data)),
+            )
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+
+    def import_directory(self, image_dir: Path) -> int:
+        """Pack the loose tiles of an image directory into the store.
+
+        Both the {zoom}_{x}_{y}.png files and the older
+        {latitude}_{longitude}_{zoom}.png ones are read (see
+        tiles.tile_of_file). The files are left in place; tiles already in
+        the store are kept. Imported files are recorded with their size and modification time,
+        so opening the store again only reads files that are new or changed.
+
+        Returns
+        -------
+        int
+            Number of tiles imported.
+        """
+        if not Path(image_dir).is_dir():
+            return 0
+        with self._connect() as conn:
+            seen = {row[0]: tuple(row[1:]) for row in conn.execute("SELECT name, size, mtime_ns FROM imported_files")}
+        rows, files = [], []
+        for path in Path(image_dir).iterdir():
+            tile = tile_of_file(path.name)
+            if tile is None:
+                continue
+            stat = path.stat()
+            if seen.get(path.name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            zoom, x, y = tile
+            rows.append((zoom, x, _tms_row(zoom, y), sqlite3.Binary(path.read_bytes())))
+            files.append((path.name, stat.st_size, stat.st_mtime_ns))
+        if not files:
+            return 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tiles VALUES (?, ?, ?, ?)", rows)
+            imported = conn.total_changes - before
+            conn.executemany("INSERT OR REPLACE INTO imported_files VALUES (?, ?, ?)", files)
+            conn.execute("COMMIT")
+        if imported:
+            logger.info("Imported %d loose tiles from %s into %s", imported, image_dir, self.path)
+        return imported
+
+    # -----------------------------------------------------------------------
+    # Downloads
+    # -----------------------------------------------------------------------
+
+    def _download(self, zoom: int, x: int, y: int) -> bytes:
+        response = self.session.get(f"{self.tile_service}/{zoom}/{y}/{x}", timeout=30)
+        response.raise_for_status()
+        self.put(zoom, x, y, response.content)
+        logger.info("Downloaded tile %d/%d/%d", zoom, x, y)
+        return response.content
+
+    def get(self, zoom: int, x: int, y: int) -> bytes:
+        """Return a tile, downloading (and storing) it if needed.
+
+        A download also starts the prefetch of the tile's neighbours.
+        """
+        data = self.get_local(zoom, x, y)
+        if data is None:
+            data = self._download(zoom, x, y)
+            if self.prefetch_radius > 0:
+                self.prefetch(zoom, x, y, self.prefetch_radius)
+        return data
+
+    def get_for(self, latitude: float, longitude: float, zoom: int) -> "tuple[bytes, tuple[int, int]]":
+        """Return the tile containing a point, and its (x, y)."""
+        x, y = tile_for(latitude, longitude, zoom)
+        return self.get(zoom, x, y), (x, y)
+
+    def prefetch(self, zoom: int, x: int, y: int, radius: int = 1) -> None:
+        """Download the missing tiles around (x, y) in the background.
+
+        Failures are only logged: prefetched tiles are a convenience.
+        """
+        n = 1 << zoom
+        with self._lock:
+            if self._prefetcher is None:
+                self._prefetcher = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="tile-prefetch")
+            for ny in range(max(y - radius, 0), min(y + radius, n - 1) + 1):
+                for dx in range(-radius, radius + 1):
+                    key = (zoom, (x + dx) % n, ny)  # columns wrap around the antimeridian
+                    if key[1:] == (x, y) or key in self._prefetching:
+                        continue
+                    self._prefetching.add(key)
+                    self._prefetcher.submit(self._prefetch_one, *key)
+
+    def _prefetch_one(self, zoom: int, x: int, y: int) -> None:
+        try:
+            if self.get_local(zoom, x, y) is None:
+                self._download(zoom, x, y)
+        except Exception as e:
+            logger.warning("Prefetch of tile %d/%d/%d failed: %s", zoom, x, y, e)
+        finally:
+            with self._lock:
+                self._prefetching.discard((zoom, x, y))
+
+    def wait_for_prefetch(self) -> None:
+        """Block until all prefetches started so far are finished."""
+        with self._lock:
+            prefetcher, self._prefetcher = self._prefetcher, None
+        if prefetcher is not None:
+            prefetcher.shutdown(wait=True)
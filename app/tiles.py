@@ -0,0 +1,94 @@
+"""
+tiles.py — XYZ (Web Mercator) tile coordinates.
+
+Page 2 analyses whole satellite tiles, so two clicks inside the same tile
+show the same image. Caches are therefore keyed by the (zoom, x, y) tile
+rather than by the exact clicked coordinates.
+
+Loose tile files are named images/{zoom}_{x}_{y}.png; files written
+before tiles were keyed this way are named after the clicked point,
+images/{latitude}_{longitude}_{zoom}.png, and tile_of_file resolves both.
+"""
+
+import math
+import re
+
+# Web Mercator is undefined at the poles; tile services clip latitudes to this range
+MAX_LATITUDE = 85.05112878
+
+_TILE_FILE = re.compile(r"^(\d+)_(\d+)_(\d+)\.png$")
+_POINT_FILE = re.compile(r"^(-?\d+(?:\.\d+)?)_(-?\d+(?:\.\d+)?)_(\d+)\.png$")
+
+
+def mercator(latitude: float, longitude: float) -> tuple[float, float]:
+    """Return the Web Mercator position of a coordinate as fractions of the map.
+
+    x runs from 0 (180° W) to 1 (180° E) and y from 0 (north edge) to 1
+    (south edge); the tile at zoom z is (int(x * 2**z), int(y * 2**z)).
+    Latitudes are clipped to ±MAX_LATITUDE.
+    """
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    lat_rad = math.radians(latitude)
+    x = (longitude + 180.0) / 360.0
+    y = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0
+    return x, y
+
+
+def tile_for(latitude: float, longitude: float, zoom: int) -> tuple[int, int]:
+    """Return the (x, y) XYZ tile containing a coordinate.
+
+    Parameters
+    ----------
+    latitude : float
+        Latitude in degrees (clipped to ±MAX_LATITUDE).
+    longitude : float
+        Longitude in degrees.
+    zoom : int
+        Zoom level.
+
+    Returns
+    -------
+    tuple[int, int]
+        Tile column x and row y (y counted from the north).
+    """
+    x, y = mercator(latitude, longitude)
+    n = 2 ** zoom
+    x_tile, y_tile = int(x * n), int(y * n)
+    # longitude 180 and latitude -MAX_LATITUDE fall on the far edge of the grid
+    return min(max(x_tile, 0), n - 1), min(max(y_tile, 0), n - 1)
+
+
+def tile_center(zoom: int, x: int, y: int) -> tuple[float, float]:
+    """Return the (latitude, longitude) of the centre of a tile.
+
+    Parameters
+    ----------
+    zoom : int
+        Zoom level.
+    x, y : int
+        Tile column and row.
+    """
+    n = 2 ** zoom
+    longitude = (x + 0.5) / n * 360.0 - 180.0
+    latitude = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 0.5) / n))))
+    return latitude, longitude
+
+
+def tile_of_file(name: str) -> "tuple[int, int, int] | None":
+    """Return the (zoom, x, y) tile of a loose tile file, or None if the name is neither form.
+
+    Parameters
+    ----------
+    name : str
+        File name, "{zoom}_{x}_{y}.png" or "{latitude}_{longitude}_{zoom}.png".
+    """
+    match = _TILE_FILE.match(name)
+    if match:
+        zoom, x, y = (int(group) for group in match.groups())
+        if x < 2 ** zoom and y < 2 ** zoom:
+            return zoom, x, y
+    match = _POINT_FILE.match(name)
+    if match:
+        latitude, longitude, zoom = float(match[1]), float(match[2]), int(match[3])
+        return (zoom, *tile_for(latitude, longitude, zoom))
+    return None
@@ -0,0 +1,74 @@
+"""
+timing.py — timing spans around the stages of a run.
+
+A StageTimer measures named stages with `with timer.span("stage"):`.
+Model stages also keep what Ollama reports about the call (model load vs
+inference time, token counts), so a slow run can be traced to the tile
+download, the model load or the inference itself. The pipeline stores the
+spans of every assessment with its record (see assessment_store.py), and
+OkavangoData keeps the spans of its download, read and merge steps.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """Duration of one stage, in seconds, plus the model call it made (if any)."""
+
+    stage: str
+    seconds: float = 0.0
+    model: "str | None" = None
+    load_seconds: "float | None" = None
+    inference_seconds: "float | None" = None
+    first_token_seconds: "float | None" = None
+    prompt_tokens: "int | None" = None
+    output_tokens: "int | None" = None
+
+    def record_model(self, result) -> None:
+        """Add the model, load / inference times and token counts of a model_manager.ChatResult."""
+        self.model = result.model
+        self.load_seconds = result.load_seconds
+        self.inference_seconds = result.inference_seconds
+        self.first_token_seconds = result.first_token_seconds
+        self.prompt_tokens = result.prompt_tokens
+        self.output_tokens = result.output_tokens
+
+
+class StageTimer:
+    """Collects the spans of the stages of one run; a stage timed twice keeps its total."""
+
+    def __init__(self) -> None:
+        self.spans: dict[str, Span] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[Span]:
+        """Time the body of a with block as `stage`; yields the Span to attach model details to."""
+        with self._lock:
+            span = self.spans.setdefault(stage, Span(stage))
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                span.seconds += elapsed
+            logger.debug("%s took %.3fs", stage, elapsed)
+
+    def seconds(self) -> dict[str, float]:
+        """Return the duration of every stage, in the order they started."""
+        with self._lock:
+            return {stage: span.seconds for stage, span in self.spans.items()}
+
+    def rows(self) -> list[dict]:
+        """Return the spans as dicts (keys: the fields of Span)."""
+        with self._lock:
+            return [asdict(span) for span in self.spans.values()]
@@ -0,0 +1,77 @@
+"""
+verdict.py — reads the DANGER / SAFE verdict of a risk assessment.
+
+The text model is asked to end its answer with a line that says either
+DANGER or SAFE. While the answer is streamed, VerdictWatcher spots that
+line as soon as it is complete, so the page can show the decision (and
+stop the generation) without waiting for the rest of the answer.
+"""
+
+import re
+
+DANGER = "DANGER"
+SAFE = "SAFE"
+
+# a line starting with the verdict, possibly decorated or labelled and followed by
+# an explanation: "**DANGER**", "SAFE.", "Verdict: DANGER", "DANGER or SAFE: SAFE - ..."
+_VERDICT_LINE = re.compile(
+    r"^[\W_]*(?:[A-Z ]+:)?[\W_]*(DANGER|SAFE)\b[*_ ]*(?:$|[-–—:.,;!(])"
+)
+
+
+def verdict_line(line: str) -> "str | None":
+    """Return DANGER or SAFE if `line` is a verdict line, else None.
+
+    "Safe drinking water" or "Danger of erosion" are not verdict lines: the
+    verdict must be followed by the end of the line or by punctuation.
+    """
+    match = _VERDICT_LINE.match(line.strip().upper())
+    return match.group(1) if match else None
+
+
+def verdict_of(text: str) -> str:
+    """Return the verdict of a complete risk assessment.
+
+    The last verdict line decides; answers without one are flagged DANGER
+    if they mention it anywhere (the rule used before verdict lines were
+    read).
+    """
+    for line in reversed(text.splitlines()):
+        verdict = verdict_line(line)
+        if verdict is not None:
+            return verdict
+    return DANGER if DANGER in text.upper() else SAFE
+
+
+class VerdictWatcher:
+    """Finds the verdict line in a streamed answer, chunk by chunk.
+
+    Examples
+    --------
+    >>> watcher = VerdictWatcher()
+    >>> watcher.feed("4. YES, clearing.\\nDAN")
+    >>> watcher.feed("GER\\n")
+    'DANGER'
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self.verdict: "str | None" = None
+        # text of the last chunk fed after the end of the first verdict line
+        self.tail = ""
+
+    def feed(self, chunk: str) -> "str | None":
+        """Add a chunk of the answer; return the verdict once a verdict line is complete."""
+        self._pending += chunk
+        *complete, self._pending = self._pending.split("\n")
+        for i, line in enumerate(complete):
+            if self.verdict is None and verdict_line(line):
+                self.verdict = verdict_line(line)
+                self.tail = "\n".join(complete[i + 1:] + [self._pending])
+        return self.verdict
+
+    def finish(self) -> "str | None":
+        """Check the last, unterminated line at the end of the answer."""
+        self.verdict = self.verdict or verdict_line(self._pending)
+        self._pending = ""
+        return self.verdict
@@ -0,0 +1,210 @@
+"""Assess many locations from the command line, without the browser.
+
+Locations come from a CSV file (latitude and longitude columns, optional
+zoom column) or from a bounding box, covered with every tile at one zoom
+level. Satellite tiles are downloaded concurrently over one pooled session
+into the tile store (images/tiles.mbtiles, shared with Page 2) while a
+bounded pool of workers runs the two model stages (size it to the number
+of requests the Ollama server runs in parallel, ollama.parallel in
+models.yaml).
+
+Every finished location is logged to the assessment store (database/images.db)
+at once, and locations whose tile already has a run with the current
+models.yaml are skipped. An interrupted batch therefore resumes where it
+stopped when the same command is run again; results are shared with Page 2.
+At the end, the country of every new run is resolved in one bulk query
+(countries.py), unless --no-countries is given.
+
+Usage:
+    python batch.py --csv sites.csv [--zoom 12]
+    python batch.py --bbox 21.5 -20.5 23.5 -18.5 --zoom 10
+"""
+
+import argparse
+import csv
+import logging
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from app.countries import CountryIndex, enrich_store
+from app.http_session import make_session
+from app.model_manager import preload
+from app.okavango import OkavangoData
+from app.pipeline import Pipeline, database_settings, load_config, open_store, open_tiles, tile_settings
+from app.prescreen import PRESCREEN_MODEL
+from app.tiles import tile_center, tile_for
+from app.timing import StageTimer
+
+DOWNLOAD_WORKERS = 8  # concurrent tile downloads (and size of the connection pool)
+MODEL_WORKERS = 1  # locations in the model stages at the same time, unless models.yaml sets ollama.parallel
+BACKLOG_PER_WORKER = 4  # downloaded tiles allowed to wait for each model worker
+
+
+def read_locations(csv_path: Path, zoom: int) -> list[tuple[float, float, int]]:
+    """Read (latitude, longitude, zoom) locations from a CSV file.
+
+    Parameters
+    ----------
+    csv_path : Path
+        File with `latitude` and `longitude` columns and an optional `zoom` column.
+    zoom : int
+        Zoom level for rows without one.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return [
+            (float(row["latitude"]), float(row["longitude"]), int(row.get("zoom") or zoom))
+            for row in csv.DictReader(f)
+        ]
+
+
+def bbox_locations(
+    min_lon: float, min_lat: float, max_lon: float, max_lat: float, zoom: int,
+) -> list[tuple[float, float, int]]:
+    """Return the centre of every tile covering a bounding box, north-west first."""
+    x_min, y_min = tile_for(max_lat, min_lon, zoom)
+    x_max, y_max = tile_for(min_lat, max_lon, zoom)
+    return [
+        (*tile_center(zoom, x, y), zoom)
+        for y in range(y_min, y_max + 1)
+        for x in range(x_min, x_max + 1)
+    ]
+
+
+def unique_tiles(locations) -> list[tuple[float, float, int]]:
+    """Keep the first location of every tile: locations in one tile share one analysis."""
+    seen = set()
+    unique = []
+    for latitude, longitude, zoom in locations:
+        tile = (zoom, *tile_for(latitude, longitude, zoom))
+        if tile not in seen:
+            seen.add(tile)
+            unique.append((latitude, longitude, zoom))
+    return unique
+
+
+def run_batch(
+    pipeline: Pipeline,
+    locations,
+    download_workers: int = DOWNLOAD_WORKERS,
+    model_workers: int = MODEL_WORKERS,
+) -> dict[str, int]:
+    """Assess locations, skipping tiles that were already analysed.
+
+    At most download_workers + BACKLOG_PER_WORKER * model_workers locations
+    are in progress at a time, so when the models are slower than the
+    downloads, the downloads wait instead of piling tiles up in memory.
+
+    Parameters
+    ----------
+    pipeline : Pipeline
+        Pipeline (configuration, store, models, tiles) to run.
+    locations : iterable of (latitude, longitude, zoom)
+        Locations to assess; several in one tile are assessed once.
+    download_workers : int
+        Concurrent tile downloads.
+    model_workers : int
+        Locations in the model stages at the same time.
+
+    Returns
+    -------
+    dict[str, int]
+        Number of locations "cached" (skipped), "analysed", "prescreened"
+        (decided by a pre-screen rule, without the models) and "failed".
+    """
+    counts = {"cached": 0, "analysed": 0, "prescreened": 0, "failed": 0}
+    pending = []
+    for location in unique_tiles(locations):
+        if pipeline.cached_run(*location) is not None:
+            counts["cached"] += 1
+        else:
+            pending.append(location)
+    print(f"{len(pending)} tiles to analyse, {counts['cached']} already done")
+
+    downloads = ThreadPoolExecutor(download_workers, thread_name_prefix="tile")
+    inference = ThreadPoolExecutor(model_workers, thread_name_prefix="model")
+    try:
+        # future -> (stage, location); downloaded tiles move on to the model stage
+        running = {}
+        waiting = iter(pending)
+
+        def start_next() -> None:
+            location = next(waiting, None)
+            if location is not None:
+                timer = StageTimer()
+                running[downloads.submit(pipeline.download_tile, *location, timer)] = ("download", location, timer)
+
+        for _ in range(download_workers + BACKLOG_PER_WORKER * model_workers):
+            start_next()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, location, timer = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    counts["failed"] += 1
+                    print(f"failed   {location[0]:9.4f} {location[1]:10.4f} z{location[2]}: {e}")
+                    start_next()
+                    continue
+                if stage == "download":
+                    future = inference.submit(pipeline.analyse_image, result, *location, timer)
+                    running[future] = ("models", location, timer)
+                else:
+                    start_next()
+                    counts["prescreened" if result["image_model"] == PRESCREEN_MODEL else "analysed"] += 1
+                    rule = f" ({result['prescreen']})" if result.get("prescreen") else ""
+                    print(f"{'DANGER' if result['danger'] == 'Y' else 'safe':8} "
+                          f"{location[0]:9.4f} {location[1]:10.4f} z{location[2]}{rule}")
+    except KeyboardInterrupt:
+        print("Interrupted: finished locations are saved, run the same command again to resume.")
+        downloads.shutdown(wait=False, cancel_futures=True)
+        inference.shutdown(wait=False, cancel_futures=True)
+        raise
+    downloads.shutdown()
+    inference.shutdown()
+    return counts
+
+
+def main() -> int:
+    """Assess the locations given on the command line; return 1 if any failed."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", type=Path, help="CSV file with latitude, longitude (and zoom) columns")
+    source.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                        help="cover this bounding box with tiles")
+    parser.add_argument("--zoom", type=int, help="zoom level (default: image_settings.default_zoom)")
+    parser.add_argument("--download-workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--model-workers", type=int, help="default: ollama.parallel in models.yaml")
+    parser.add_argument("--no-countries", action="store_true", help="do not resolve the country of the runs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    config = load_config()
+    zoom = args.zoom or config.get("image_settings", {}).get("default_zoom", 12)
+    if args.csv is not None:
+        locations = read_locations(args.csv, zoom)
+    else:
+        locations = bbox_locations(*args.bbox, zoom)
+
+    preload(config)
+    tile_store, tile_service, _, image_dir = tile_settings(config)
+    # no prefetching: a batch downloads exactly the tiles it needs
+    tiles = open_tiles(tile_store, tile_service, 0, image_dir, session=make_session(args.download_workers))
+    pipeline = Pipeline(config, open_store(*database_settings(config)), tiles=tiles)
+    model_workers = args.model_workers or (config.get("ollama") or {}).get("parallel", MODEL_WORKERS)
+    counts = run_batch(pipeline, locations, args.download_workers, model_workers)
+    print(f"{counts['analysed']} analysed, {counts['prescreened']} decided by pre-screen rules, "
+          f"{counts['cached']} already done, {counts['failed']} failed")
+    if not args.no_countries:
+        try:
+            countries = CountryIndex.from_data(OkavangoData())
+        except Exception as e:
+            print(f"Countries not resolved, the datasets could not be loaded: {e}")
+        else:
+            print(f"Resolved the country of {enrich_store(pipeline.store, countries)} runs")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+"""Benchmark data loading, Page 1 and the Page 2 pipeline on synthetic data.
+
+Everything runs offline on generated stand-ins, so results are
+reproducible (fixed random seed) and comparable across commits:
+
+- OWID-shaped CSVs for the five datasets and a world map with one square
+  per country, at 1×, 10× and 100× the number of countries of the real
+  data, to time OkavangoData startup (checksums of the downloads), the
+  first read (CSV), later reads (Parquet cache), the merge with the map
+  and point-in-country lookups (one by one and in bulk);
+- the Page 1 work behind a slider move: building the per-year slice index,
+  per-year lookups, time-series gathers and figure-cache hits;
+- an assessment database with 1,000 stored runs per 1×, to time the
+  whole-run and stage cache lookups and the past-assessment layer of the
+  Page 2 map (viewport query, clustering, folium markers);
+- Page 2 runs end to end against the fake Ollama and tile servers the
+  test suite also uses (fakes.py). The fake tiles are uniform, so the
+  pre-screen rules are switched off and every run goes through both models.
+
+Results are written as JSON: one entry per scale and benchmark with the
+median, min and max seconds of the repeats (per call for the lookups).
+--compare prints the change of every median against an earlier result file.
+
+Usage:
+    python benchmark.py [--scales 1 10 100] [--repeat 5] [--runs 20] [--output bench.json] [--compare old.json]
+"""
+
+import argparse
+import contextlib
+import copy
+import hashlib
+import io
+import itertools
+import json
+import platform
+import shutil
+import sqlite3
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from app.assessment_store import COLUMNS, AssessmentStore, sha256_text
+from app.countries import CountryIndex
+from app.okavango import CACHE_DIR_NAME, DATASETS, MANIFEST_NAME, SCHEMAS, TABLES, WORLD_FILE, OkavangoData
+from app.map_overlay import Viewport, history_layer
+from app.page1 import FigureCache, build_slice_index, choropleth_figure
+from app.pipeline import Pipeline, load_config
+from app.tiles import tile_for
+from fakes import FakeOllama, FakeTileServer
+
+SEED = 0
+COUNTRIES = 175  # countries with an ISO3 code in the real datasets (1×)
+AGGREGATES = 25  # regions and income groups without one (World, Africa, ...)
+YEARS = range(1990, 2021)
+MISSING = 0.1  # share of (country, year) rows left out, as OWID omits years without data
+RUNS_PER_SCALE = 1000  # stored assessments per 1×
+LOOKUPS = 200  # calls per repeat of the lookup benchmarks
+RESOLVES = 10_000  # points per bulk point-in-country lookup
+PAGE1_DATASET = "forest_cover"
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def country_codes(n: int) -> list[str]:
+    """Return n distinct three-letter codes ("AAA", "AAB", ...).
+
+    Raises
+    ------
+    ValueError
+        If n is more than the 17,576 possible codes.
+    """
+    codes = ["".join(letters) for letters in itertools.islice(itertools.product(string.ascii_uppercase, repeat=3), n)]
+    if len(codes) < n:
+        raise ValueError(f"At most {len(codes)} synthetic countries, asked for {n}")
+    return codes
+
+
+def synthetic_dataset(name: str, codes: list[str], rng: np.random.Generator) -> pd.DataFrame:
+    """Return an OWID-shaped dataset (Entity, Code, Year, value column) for countries and aggregates."""
+    entities = [f"Country {code}" for code in codes] + [f"Region {i}" for i in range(AGGREGATES)]
+    entity_codes = codes + [None] * (AGGREGATES - 1) + ["OWID_WRL"]
+    rows = pd.DataFrame(
+        [(entity, code, year) for entity, code in zip(entities, entity_codes) for year in YEARS],
+        columns=["Entity", "Code", "Year"],
+    )
+    rows = rows[rng.random(len(rows)) >= MISSING]
+    scale = 1e6 if name in ("forest_change", "deforestation") else 100.0
+    low = -scale if name == "forest_change" else 0.0
+    return rows.assign(**{SCHEMAS[name][0]: rng.uniform(low, scale, len(rows)).round(3)})
+
+
+def synthetic_world(codes: list[str]) -> gpd.GeoDataFrame:
+    """Return a world map with one square per country, laid out on a grid, plus one without ISO3 code."""
+    side = int(np.ceil(np.sqrt(len(codes) + 1)))
+    width, height = 360 / side, 180 / side
+    squares = [
+        box(-180 + col * width, -90 + row * height, -180 + (col + 1) * width, -90 + (row + 1) * height)
+        for row, col in itertools.islice(itertools.product(range(side), repeat=2), len(codes) + 1)
+    ]
+    return gpd.GeoDataFrame(
+        {"ADM0_A3": codes + ["-99"], "NAME": [f"Country {code}" for code in codes] + ["Disputed"]},
+        geometry=squares,
+        crs="EPSG:4326",
+    )
+
+
+def _sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def write_downloads(directory: Path, countries: int, rng: np.random.Generator) -> None:
+    """Write the five datasets, the world map zip and a fresh manifest into a downloads/ directory.
+
+    The manifest marks every file as just checked, so OkavangoData startup
+    verifies the checksums but does not go to the network.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    codes = country_codes(countries)
+    for name, filename in TABLES.items():
+        synthetic_dataset(name, codes, rng).to_csv(directory / filename, index=False)
+
+    shapefile = directory / "world"
+    shapefile.mkdir()
+    synthetic_world(codes).to_file(shapefile / "ne_110m_admin_0_countries.shp")
+    with zipfile.ZipFile(directory / WORLD_FILE, "w") as archive:
+        for part in sorted(shapefile.iterdir()):
+            archive.write(part, part.name)
+    shutil.rmtree(shapefile)
+
+    manifest = {}
+    for url in DATASETS:
+        path = directory / url.split("/")[-1]
+        manifest[path.name] = {"size": path.stat().st_size, "sha256": _sha256(path), "checked_at": time.time()}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def fill_store(store: AssessmentStore, config: dict, runs: int, rng: np.random.Generator) -> list[dict]:
+    """Store `runs` synthetic assessments, with their stage-cache entries, in bulk.
+
+    Returns
+    -------
+    list[dict]
+        The stored runs.
+    """
+    image_prompt = config["image_model"]["prompt"]
+    text_template = config["text_model"]["prompt"]
+    now = datetime.now().isoformat(timespec="seconds")
+    records = []
+    for i in range(runs):
+        latitude, longitude = float(rng.uniform(-60, 70)), float(rng.uniform(-180, 180))
+        description = f"Synthetic scene {i}: forest, river and fields."
+        risk_text = f"1. NO\n2. NO\n3. NO\n4. NO\n{'DANGER' if i % 5 == 0 else 'SAFE'}"
+        records.append({
+            "timestamp": now, "latitude": latitude, "longitude": longitude, "zoom": 12,
+            "image_path": None, "image_prompt": image_prompt, "image_model": config["image_model"]["name"],
+            "image_description": description, "text_prompt": text_template.replace("{description}", description),
+            "text_model": config["text_model"]["name"], "text_description": risk_text,
+            "danger": "Y" if i % 5 == 0 else "N", "image_sha256": sha256_text(f"tile {i}"),
+        })
+
+    with contextlib.closing(sqlite3.connect(store.path)) as conn, conn:
+        conn.executemany(
+            f"INSERT INTO assessments ({', '.join(COLUMNS)}, tile_x, tile_y, image_sha256) "
+            f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?, ?, ?)",
+            [
+                [record[column] for column in COLUMNS]
+                + [*tile_for(record["latitude"], record["longitude"], record["zoom"]), record["image_sha256"]]
+                for record in records
+            ],
+        )
+    # runs written inline, as by earlier versions, then stored once as compact_store.py does
+    store.compact()
+    with contextlib.closing(sqlite3.connect(store.path)) as conn, conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO descriptions "
+            "SELECT image_sha256, image_model, ?, image_description_id, timestamp FROM assessments",
+            (sha256_text(image_prompt),),
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO risks "
+            "SELECT t.sha256, a.text_model, ?, a.text_description_id, a.timestamp "
+            "FROM assessments AS a JOIN texts AS t ON t.id = a.image_description_id",
+            (sha256_text(text_template),),
+        )
+    return records
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+def measure(run, repeat: int, setup=None, calls: int = 1) -> dict:
+    """Time `run` `repeat` times (after an untimed `setup`, if given).
+
+    Returns
+    -------
+    dict
+        median, min and max seconds of one repeat, divided by `calls` for
+        benchmarks that make several calls per repeat.
+    """
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        run()
+        seconds.append((time.perf_counter() - started) / calls)
+    return {"repeat": repeat, "calls": calls, "median": statistics.median(seconds),
+            "min": min(seconds), "max": max(seconds)}
+
+
+def _open_data() -> OkavangoData:
+    with contextlib.redirect_stdout(io.StringIO()):  # OkavangoData prints one line per skipped download
+        return OkavangoData()
+
+
+def bench_data(workdir: Path, repeat: int) -> "tuple[dict[str, dict], pd.DataFrame, gpd.GeoDataFrame]":
+    """Time OkavangoData startup, reads and merge in a directory holding downloads/.
+
+    Returns the timings with the raw and map view of PAGE1_DATASET, for bench_page1.
+    """
+    results = {}
+    cache = workdir / "downloads" / CACHE_DIR_NAME
+    with contextlib.chdir(workdir):  # OkavangoData works in ./downloads
+        results["startup"] = measure(_open_data, repeat)
+
+        def read_all(data: OkavangoData) -> None:
+            for name in TABLES:
+                getattr(data, name)
+            data.world
+
+        state = {}
+
+        def fresh(clear_cache: bool):
+            def setup():
+                if clear_cache:
+                    shutil.rmtree(cache, ignore_errors=True)
+                state["data"] = _open_data()
+            return setup
+
+        results["read csv"] = measure(lambda: read_all(state["data"]), repeat, setup=fresh(True))
+        results["read cached"] = measure(lambda: read_all(state["data"]), repeat, setup=fresh(False))
+
+        def loaded():
+            fresh(False)()
+            read_all(state["data"])
+
+        results["merge"] = measure(lambda: state["data"].merge_with_map(), repeat, setup=loaded)
+        # geo_* views are not cached: every access is one join of the map with the dataset
+        results["geo view"] = measure(lambda: getattr(state["data"], f"geo_{PAGE1_DATASET}"), repeat)
+
+        countries = CountryIndex.from_data(state["data"])
+        results["country index"] = measure(lambda: CountryIndex.from_data(state["data"]), repeat)
+        rng = np.random.default_rng(SEED)
+        latitudes, longitudes = rng.uniform(-85, 85, RESOLVES), rng.uniform(-180, 180, RESOLVES)
+        results["country single"] = measure(
+            lambda: [countries.resolve(lat, lon) for lat, lon in zip(latitudes[:LOOKUPS], longitudes[:LOOKUPS])],
+            repeat, calls=LOOKUPS,
+        )
+        results["country bulk"] = measure(lambda: countries.resolve_many(latitudes, longitudes), repeat, calls=RESOLVES)
+        state["raw"] = getattr(state["data"], PAGE1_DATASET)
+        state["geo"] = getattr(state["data"], f"geo_{PAGE1_DATASET}")
+    return results, state["raw"], state["geo"]
+
+
+def bench_page1(raw: pd.DataFrame, geo: gpd.GeoDataFrame, repeat: int) -> dict[str, dict]:
+    """Time the Page 1 slice index, its lookups and the figure cache on one dataset."""
+    column = SCHEMAS[PAGE1_DATASET][0]
+    years = sorted(geo["Year"].dropna().unique().astype(int).tolist())
+    results = {"slice index": measure(lambda: build_slice_index(raw, column, years), repeat)}
+    index = build_slice_index(raw, column, years)
+
+    results["slice get"] = measure(lambda: [index.get(year) for year in years], repeat, calls=len(years))
+    countries = index.country_list[:10]
+    results["time series"] = measure(
+        lambda: [index.matrix.series(countries) for _ in range(LOOKUPS)], repeat, calls=LOOKUPS,
+    )
+
+    year_slice = index.get(years[-1])
+    results["figure build"] = measure(lambda: choropleth_figure(year_slice, column), repeat)
+    cache = FigureCache()
+    cache.get_or_build(("choropleth", years[-1]), lambda: choropleth_figure(year_slice, column))
+    results["figure cache hit"] = measure(
+        lambda: cache.get_or_build(("choropleth", years[-1]), lambda: choropleth_figure(year_slice, column)),
+        repeat,
+    )
+    return results
+
+
+def bench_store(
+    store: AssessmentStore, records: list[dict], config: dict, repeat: int, rng: np.random.Generator,
+) -> dict[str, dict]:
+    """Time the whole-run and stage cache lookups of a filled assessment store."""
+    sample = [records[i] for i in rng.integers(0, len(records), LOOKUPS)]
+    image_prompt, text_prompt = config["image_model"]["prompt"], config["text_model"]["prompt"]
+    results = {
+        "lookup hit": measure(
+            lambda: [store.lookup(r["latitude"], r["longitude"], r["zoom"]) for r in sample], repeat, calls=LOOKUPS,
+        ),
+        "lookup miss": measure(
+            lambda: [store.lookup(r["latitude"], r["longitude"], 3) for r in sample], repeat, calls=LOOKUPS,
+        ),
+        "description cache": measure(
+            lambda: [store.get_description(r["image_sha256"], r["image_model"], image_prompt) for r in sample],
+            repeat, calls=LOOKUPS,
+        ),
+        "risk cache": measure(
+            lambda: [store.get_risk(r["image_description"], r["text_model"], text_prompt) for r in sample],
+            repeat, calls=LOOKUPS,
+        ),
+        "records": measure(store.records, repeat),
+        "map world view": measure(lambda: history_layer(store, Viewport(-90, -180, 90, 180, zoom=2)), repeat),
+        "map regional view": measure(lambda: history_layer(store, Viewport(-35, 10, 5, 50, zoom=5)), repeat),
+    }
+    return results
+
+
+def bench_pipeline(workdir: Path, store: AssessmentStore, config: dict, runs: int, rng) -> dict[str, dict]:
+    """Run the Page 2 pipeline end to end on `runs` new locations, then again from the whole-run cache."""
+    with FakeOllama() as server, FakeTileServer() as tiles:
+        config = copy.deepcopy(config)
+        config.setdefault("ollama", {})["host"] = server.host
+        config["image_settings"].update({
+            "tile_service": tiles.url,
+            "tile_store": str(workdir / "tiles.mbtiles"),
+            "prefetch": 0,
+            "image_dir": str(workdir / "images"),
+        })
+        config["prescreen"] = {"enabled": False}
+        config["database"] = {"csv_export": None}
+        pipeline = Pipeline(config, store)
+
+        # zoom 14 tiles are never among the stored (zoom 12) runs
+        locations = list(zip(rng.uniform(-60, 70, runs), rng.uniform(-180, 180, runs)))
+        results = {}
+        for name, expect_cached in (("analyse", False), ("analyse cached", True)):
+            seconds = []
+            for latitude, longitude in locations:
+                started = time.perf_counter()
+                _, cached = pipeline.analyse(float(latitude), float(longitude), 14)
+                seconds.append(time.perf_counter() - started)
+                if cached != expect_cached:
+                    raise RuntimeError(f"{name}: unexpected cache {'hit' if cached else 'miss'}")
+            results[name] = {"repeat": runs, "calls": 1, "median": statistics.median(seconds),
+                             "min": min(seconds), "max": max(seconds)}
+
+    timings = store.stage_timings()
+    for stage, group in timings.groupby("stage", sort=False):
+        results[f"stage {stage}"] = {"repeat": len(group), "calls": 1, "median": float(group["seconds"].median()),
+                                     "min": float(group["seconds"].min()), "max": float(group["seconds"].max())}
+    return results
+
+
+def run_benchmarks(scales: list[int], repeat: int, runs: int, workdir: Path) -> list[dict]:
+    """Generate the data of every scale in workdir and run all benchmarks on it.
+
+    Returns
+    -------
+    list[dict]
+        One entry per (scale, group, name) with the timing summary of measure().
+    """
+    config = load_config()
+    results = []
+    for scale in scales:
+        rng = np.random.default_rng(SEED)
+        root = workdir / f"scale-{scale}"
+        write_downloads(root / "downloads", COUNTRIES * scale, rng)
+        store = AssessmentStore(root / "images.db")
+        records = fill_store(store, config, RUNS_PER_SCALE * scale, rng)
+        store = AssessmentStore(store.path)  # reopening indexes the locations of the bulk-inserted runs
+
+        data, raw, geo = bench_data(root, repeat)
+        groups = {
+            "data": data,
+            "page1": bench_page1(raw, geo, repeat),
+            "store": bench_store(store, records, config, repeat, rng),
+            "pipeline": bench_pipeline(root, store, config, runs, rng),
+        }
+        size = {"countries": COUNTRIES * scale, "rows": len(raw), "assessments": len(records)}
+        for group, timings in groups.items():
+            for name, summary in timings.items():
+                results.append({"scale": scale, "group": group, "name": name, **size, **summary})
+    return results
+
+
+def compare(old: list[dict], new: list[dict]) -> pd.DataFrame:
+    """Return the median of every benchmark in two result lists and their ratio (new / old)."""
+    key = ["scale", "group", "name"]
+    merged = pd.DataFrame(old)[key + ["median"]].merge(
+        pd.DataFrame(new)[key + ["median"]], on=key, suffixes=("_old", "_new"),
+    )
+    return merged.assign(ratio=merged["median_new"] / merged["median_old"])
+
+
+def _commit() -> "str | None":
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    """Run the benchmarks, write the JSON results and print them (with the comparison, if asked)."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="data sizes, in multiples of 1×")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats of every benchmark")
+    parser.add_argument("--runs", type=int, default=20, help="Page 2 runs per scale")
+    parser.add_argument("--output", type=Path, default=Path("bench.json"), help="JSON result file")
+    parser.add_argument("--compare", type=Path, help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="okavango-bench-") as workdir:
+        results = run_benchmarks(args.scales, args.repeat, args.runs, Path(workdir))
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    table = pd.DataFrame(results)[["scale", "group", "name", "median", "min", "max"]]
+    print(table.to_string(index=False, float_format=lambda value: f"{value:.3g}"))
+    print(f"Results written to {args.output}")
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))["results"]
+        print(compare(old, results).to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
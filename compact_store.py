@@ -0,0 +1,42 @@
+"""Compact the assessment store: store every prompt and text once, compressed.
+
+Runs logged by earlier versions repeat the full image prompt and text
+prompt on every row, and the text prompt embeds the image description a
+second time. This moves their prompts into the versioned prompt table and
+their descriptions and risk texts into the shared text table (referenced
+by id), re-encodes the stored texts with the database.compress setting of
+models.yaml (or --no-compress), and vacuums the file. Runs read back
+exactly as before.
+
+Usage:
+    python compact_store.py [--no-compress]
+"""
+
+import argparse
+import sys
+
+from app.pipeline import database_settings, load_config, open_store
+
+
+def main() -> int:
+    """Compact the store of models.yaml and print the space saved."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-compress", action="store_true", help="store texts uncompressed")
+    args = parser.parse_args()
+
+    db_dir, db_file, csv_export, compress = database_settings(load_config())
+    store = open_store(db_dir, db_file, csv_export, compress and not args.no_compress)
+    stats = store.compact()
+    prompts = store.prompts()
+
+    print(f"Moved the text of {stats['runs']} runs, re-encoded {stats['texts']} texts, "
+          f"removed {stats['removed']} unused texts.")
+    print(f"Prompt versions: {(prompts['kind'] == 'image').sum()} image, {(prompts['kind'] == 'text').sum()} text.")
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    print(f"{store.path}: {stats['bytes_before'] / 1e6:.2f} MB -> {stats['bytes_after'] / 1e6:.2f} MB "
+          f"({saved / max(stats['bytes_before'], 1):.0%} smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Report DANGER rates of the Page 2 assessments by country.
+
+Runs logged without a country (before it was recorded, or by a batch run
+with --no-countries) are first resolved in one bulk point-in-country query
+on the Natural Earth map, and stored with the latest forest cover,
+deforestation and protected-area values of their country. With --refresh
+every run is resolved again, e.g. after the datasets were updated.
+
+Usage:
+    python country_report.py [--refresh] [--all-runs] [--top 20]
+"""
+
+import argparse
+import sys
+
+from app.countries import CountryIndex, enrich_store
+from app.okavango import OkavangoData
+from app.pipeline import database_settings, load_config, open_store
+
+
+def main() -> int:
+    """Resolve the country of stored runs and print the DANGER rate of every country."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refresh", action="store_true", help="resolve every run again, with the latest data")
+    parser.add_argument("--all-runs", action="store_true",
+                        help="count every run, not only the latest run of each tile")
+    parser.add_argument("--top", type=int, default=20, help="countries printed (default: 20)")
+    args = parser.parse_args()
+
+    store = open_store(*database_settings(load_config()))
+    countries = CountryIndex.from_data(OkavangoData())
+    print(f"Resolved the country of {enrich_store(store, countries, refresh=args.refresh)} runs")
+
+    summary = store.danger_by_country(latest_only=not args.all_runs)
+    if summary.empty:
+        print("No assessments on land yet.")
+        return 0
+    print(summary.head(args.top).to_string(index=False, float_format=lambda value: f"{value:.2f}", na_rep="-"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+fakes.py — local stand-ins for the Ollama API and an XYZ tile service.
+
+Both run an HTTP server on 127.0.0.1 (random free port) on a background
+thread and record every request, so the pipeline can run without a model
+server or the network: the test suite uses them, and benchmark.py times
+Page 2 runs end to end against them.
+
+- FakeOllama implements the endpoints the app uses (/api/tags, /api/pull,
+  /api/chat, /api/generate) and answers with canned text and fixed
+  durations.
+- FakeTileServer serves GET /{zoom}/{y}/{x} with a distinct small PNG per
+  tile over keep-alive HTTP/1.1 connections, and records the client
+  connection of every request, so connection reuse, retries and
+  prefetching can be checked.
+"""
+
+import json
+import select
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOAD_NS = 2_000_000_000  # reported load_duration of a model that was not resident
+EVAL_NS = 500_000_000  # reported eval_duration of every answer
+
+
+class FakeOllama:
+    """Fake Ollama server listening on 127.0.0.1 (random free port).
+
+    Parameters
+    ----------
+    models : list[str]
+        Models reported as available locally by /api/tags.
+    replies : dict[str, str], optional
+        Answer text per model (default: "<model> says SAFE").
+    delay : float or dict[str, float]
+        Seconds to wait before answering /api/chat (for all models, or per
+        model), to simulate slow models.
+    """
+
+    def __init__(self, models=("llava:latest", "mistral:latest"), replies=None, delay=0.0):
+        self.models = list(models)
+        self.replies = dict(replies or {})
+        self.delay = delay
+        self.requests = []  # (path, parsed JSON body)
+        self.loaded = set()  # models currently "in memory"
+        self.cancelled = []  # models whose chat request the client closed before the answer
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        """Base URL to pass to ollama.Client(host=...)."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def calls(self, path: str) -> list:
+        """Return the JSON bodies of all requests made to `path`."""
+        return [body for p, body in self.requests if p == path]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def delay_for(self, model: str) -> float:
+        if isinstance(self.delay, dict):
+            return self.delay.get(model.split(":")[0], 0.0)
+        return self.delay
+
+    def reply_for(self, model: str) -> str:
+        return self.replies.get(model.split(":")[0], f"{model} says\nSAFE")
+
+    def _timings(self, model: str) -> dict:
+        load = 0 if model in self.loaded else LOAD_NS
+        self.loaded.add(model)
+        return {
+            "load_duration": load,
+            "prompt_eval_count": 12,
+            "prompt_eval_duration": 100_000_000,
+            "eval_count": 34,
+            "eval_duration": EVAL_NS,
+            "total_duration": load + 100_000_000 + EVAL_NS,
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                fake.requests.append((self.path, None))
+                if self.path == "/api/tags":
+                    self._send_json({"models": [
+                        {"name": m, "model": m, "modified_at": "2026-01-01T00:00:00Z", "size": 1, "digest": "x"}
+                        for m in fake.models
+                    ]})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                fake.requests.append((self.path, body))
+                model = body.get("model", "")
+
+                if self.path == "/api/pull":
+                    fake.models.append(model if ":" in model else f"{model}:latest")
+                    self._send_json({"status": "success"})
+                elif self.path == "/api/generate":
+                    self._send_json({"model": model, "created_at": "2026-01-01T00:00:00Z",
+                                     "response": "", "done": True, **fake._timings(model)})
+                elif self.path == "/api/chat":
+                    time.sleep(fake.delay_for(model))
+                    if self._client_gone():
+                        fake.cancelled.append(model)  # like Ollama, stop generating for a closed connection
+                        return
+                    self._chat(model, body)
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _client_gone(self):
+                readable, _, _ = select.select([self.connection], [], [], 0)
+                return bool(readable) and self.connection.recv(1, socket.MSG_PEEK) == b""
+
+            def _chat(self, model, body):
+                text = fake.reply_for(model)
+                timings = fake._timings(model)
+                if not body.get("stream"):
+                    self._send_json({"model": model, "created_at": "2026-01-01T00:00:00Z",
+                                     "message": {"role": "assistant", "content": text},
+                                     "done": True, "done_reason": "stop", **timings})
+                    return
+                # streamed answer: one NDJSON line per word, the last one carries the timings
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                words = text.split(" ")
+                for i, word in enumerate(words):
+                    chunk = word + (" " if i < len(words) - 1 else "")
+                    line = {"model": model, "created_at": "2026-01-01T00:00:00Z",
+                            "message": {"role": "assistant", "content": chunk}, "done": False}
+                    self.wfile.write(json.dumps(line).encode() + b"\n")
+                    self.wfile.flush()
+                done = {"model": model, "created_at": "2026-01-01T00:00:00Z",
+                        "message": {"role": "assistant", "content": ""},
+                        "done": True, "done_reason": "stop", **timings}
+                self.wfile.write(json.dumps(done).encode() + b"\n")
+
+        return Handler
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def tile_png(zoom: int, x: int, y: int, size: int = 8) -> bytes:
+    """Return the image served for a tile: a valid RGB PNG with a colour unique to the tile."""
+    colour = bytes([zoom * 16 % 256, x % 256, y % 256])
+    rows = b"".join(b"\x00" + colour * size for _ in range(size))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + _chunk(b"IDAT", zlib.compress(rows))
+        + _chunk(b"IEND", b"")
+    )
+
+
+class FakeTileServer:
+    """Fake tile service listening on 127.0.0.1 (random free port).
+
+    Parameters
+    ----------
+    failures : dict[str, int], optional
+        Number of 503 answers per path ("/{zoom}/{y}/{x}") before the tile
+        is served, to simulate a flaky server.
+    """
+
+    def __init__(self, failures=None):
+        self.failures = Counter(failures or {})
+        self.requests = []  # (path, client port)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base URL to use as image_settings.tile_service."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def paths(self) -> list[str]:
+        """Return the paths of all requests, in order."""
+        return [path for path, _ in self.requests]
+
+    def connections(self) -> int:
+        """Return the number of distinct client connections used."""
+        return len({port for _, port in self.requests})
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep connections open between requests
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests.append((self.path, self.client_address[1]))
+                    failing = fake.failures[self.path] > 0
+                    if failing:
+                        fake.failures[self.path] -= 1
+                if failing:
+                    self._send(503, b"busy", "text/plain")
+                    return
+                try:
+                    zoom, y, x = (int(part) for part in self.path.strip("/").split("/"))
+                except ValueError:
+                    self._send(404, b"not found", "text/plain")
+                    return
+                self._send(200, tile_png(zoom, x, y), "image/png")
+
+        return Handler
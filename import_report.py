@@ -0,0 +1,92 @@
+"""Report the import cost of each Streamlit page module.
+
+Every page is imported in a fresh interpreter with `python -X importtime`,
+so each figure includes the cost of its heavy dependencies (geopandas,
+plotly, folium, ollama, ...). With --budget-ms the script exits with
+status 1 if any page exceeds the budget, so it can guard against import
+regressions in CI.
+
+Usage:
+    python import_report.py [--top 15] [--budget-ms 3000]
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent / "app"
+
+# modules imported by streamlit_app.py when the corresponding page is first shown
+PAGES = {
+    "Page 1 - Analysis": "page1",
+    "Page 2 - AI Risk Assessment": "page2",
+}
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """Parse the output of `python -X importtime`.
+
+    Parameters
+    ----------
+    stderr : str
+        Standard error of the interpreter run with -X importtime.
+
+    Returns
+    -------
+    list[tuple[str, int, int]]
+        (module, self time in µs, cumulative time in µs) per imported module.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module: str) -> list[tuple[str, int, int]]:
+    """Import `module` from app/ in a fresh interpreter and return its import timings."""
+    code = f"import sys; sys.path.insert(0, {str(APP_DIR)!r}); import {module}"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main() -> int:
+    """Print the import cost of every page; return 1 if a page exceeds --budget-ms."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="number of top-level packages listed per page")
+    parser.add_argument("--budget-ms", type=float, help="fail if a page takes longer than this to import")
+    args = parser.parse_args()
+
+    over_budget = False
+    for page, module in PAGES.items():
+        rows = measure(module)
+        total_ms = next(cum for name, _, cum in rows if name == module) / 1000
+        print(f"{page} ({module}): {total_ms:,.0f} ms")
+
+        # top-level packages only (no dots), most expensive first
+        packages = sorted(
+            ((name, cum) for name, _, cum in rows if "." not in name and name != module),
+            key=lambda row: row[1],
+            reverse=True,
+        )
+        for name, cum in packages[:args.top]:
+            print(f"    {cum / 1000:8,.1f} ms  {name}")
+
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            print(f"    over budget ({args.budget_ms:,.0f} ms)")
+            over_budget = True
+
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Report latency percentiles of the Page 2 pipeline, per stage and model.
+
+Every logged run stores the duration of its stages (tile download,
+pre-screen, image model, text model) with the model load time, inference
+time and token counts reported by Ollama. This prints p50 / p95 / p99 of
+each stage and model, plus whole runs ("total"), to size hardware and
+catch regressions. With --budget the script exits with status 1 if the
+p95 of a stage exceeds its budget, so it can guard against slowdowns.
+
+Usage:
+    python latency_report.py [--since 2026-10-01] [--budget image=30 --budget text=20]
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+
+from app.pipeline import database_settings, load_config, open_store
+
+QUANTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+def latency_percentiles(timings: pd.DataFrame) -> pd.DataFrame:
+    """Summarise stage timings per stage and model.
+
+    Parameters
+    ----------
+    timings : pd.DataFrame
+        Rows of AssessmentStore.stage_timings().
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (stage, model) with the number of runs, the p50 / p95 /
+        p99 duration in seconds, the median model load time and the median
+        generation speed in tokens per second (over the runs whose model
+        reported them); "total" rows cover whole runs.
+    """
+    if timings.empty:
+        return pd.DataFrame(columns=["stage", "model", "runs", *QUANTILES, "load_p50", "tokens_per_s"])
+    totals = timings.groupby("assessment_id", as_index=False)["seconds"].sum().assign(stage="total")
+    rows = pd.concat([timings, totals], ignore_index=True)
+    rows["model"] = rows["model"].fillna("")
+    # streams closed at the verdict have no model times (NULL): they count for the
+    # durations but not for the load time or generation speed
+    model_times = ["load_seconds", "inference_seconds", "output_tokens"]
+    rows[model_times] = rows[model_times].astype(float)
+    rows["tokens_per_s"] = rows["output_tokens"] / rows["inference_seconds"].where(rows["inference_seconds"] > 0)
+    grouped = rows.groupby(["stage", "model"], sort=False)
+    summary = grouped["seconds"].quantile(list(QUANTILES.values())).unstack()
+    summary.columns = list(QUANTILES)
+    summary.insert(0, "runs", grouped.size())
+    summary["load_p50"] = grouped["load_seconds"].median()
+    summary["tokens_per_s"] = grouped["tokens_per_s"].median()
+    return summary.reset_index()
+
+
+def over_budget(summary: pd.DataFrame, budgets: dict[str, float]) -> list[str]:
+    """Return a message for every stage and model whose p95 exceeds the budget of its stage."""
+    return [
+        f"{row.stage} {row.model}".strip() + f": p95 {row.p95:.2f}s > budget {budgets[row.stage]:.2f}s"
+        for row in summary.itertuples()
+        if row.stage in budgets and row.p95 > budgets[row.stage]
+    ]
+
+
+def _budget(text: str) -> tuple[str, float]:
+    stage, _, seconds = text.partition("=")
+    return stage, float(seconds)
+
+
+def main() -> int:
+    """Print the latency percentiles; return 1 if a stage exceeds its --budget."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", help="only runs logged at or after this date (ISO format)")
+    parser.add_argument("--budget", type=_budget, action="append", default=[], metavar="STAGE=SECONDS",
+                        help="fail if the p95 of a stage is above this many seconds (repeatable)")
+    args = parser.parse_args()
+
+    store = open_store(*database_settings(load_config()))
+    summary = latency_percentiles(store.stage_timings(args.since))
+    if summary.empty:
+        print("No timed runs yet: stage timings are recorded for runs logged from now on.")
+        return 0
+    print(summary.to_string(index=False, float_format=lambda value: f"{value:.2f}", na_rep="-"))
+
+    problems = over_budget(summary, dict(args.budget))
+    for problem in problems:
+        print(f"over budget: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
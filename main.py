@@ -4,6 +4,7 @@ from app.okavango import OkavangoData
 def main() -> None:
     """Download all datasets, merge with the world map, and print a basic summary."""
     data = OkavangoData()
+    data.merge_with_map()
 
     summary = {
         "forest_change": data.forest_change,
@@ -19,6 +20,10 @@ def main() -> None:
 
     print("All datasets loaded and merged successfully.")
 
+    # where the time went: download, read and merge steps
+    for stage, seconds in data.timer.seconds().items():
+        print(f"  {stage}: {seconds:.2f}s")
+
 
 if __name__ == "__main__":
     main()
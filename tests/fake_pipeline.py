@@ -0,0 +1,50 @@
+"""
+Pipelines for tests, wired to fake tile and model servers.
+
+TileSession stands in for the requests session of the tile downloads and
+make_pipeline builds a Pipeline with a minimal configuration, a store in
+a temporary directory and a ModelManager for a FakeOllama server.
+"""
+
+from app.assessment_store import AssessmentStore
+from app.model_manager import ModelManager
+from app.pipeline import Pipeline
+from fakes import tile_png
+
+
+class TileSession:
+    """Serves a distinct PNG per tile URL (or `image` for every tile); URLs listed in `broken` fail."""
+
+    def __init__(self, broken=(), image=None):
+        self.broken = set(broken)
+        self.image = image
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        session = self
+        zoom, y, x = (int(part) for part in url.split("/")[-3:])
+
+        class Response:
+            content = session.image if session.image is not None else tile_png(zoom, x, y)
+
+            def raise_for_status(self):
+                if url in session.broken:
+                    raise OSError(f"tile server error for {url}")
+
+        return Response()
+
+
+def make_pipeline(tmp_path, host, session, prompt="Describe.", prescreen=None):
+    config = {
+        "image_model": {"name": "llava", "prompt": prompt},
+        "text_model": {"name": "mistral", "prompt": "Assess: {description}"},
+        "image_settings": {
+            "tile_service": "http://tiles",
+            "tile_store": str(tmp_path / "tiles.mbtiles"),
+            "image_dir": str(tmp_path / "images"),
+        },
+        "prescreen": prescreen,
+    }
+    store = AssessmentStore(tmp_path / "images.db")
+    return Pipeline(config, store, models=ModelManager(host=host), session=session)
@@ -0,0 +1,214 @@
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from app.assessment_store import COLUMNS, AssessmentStore, sha256_text
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _record(latitude, longitude, zoom, danger="N"):
+    record = {column: f"{column} text" for column in COLUMNS}
+    record.update(latitude=latitude, longitude=longitude, zoom=zoom, danger=danger)
+    return record
+
+
+def test_store_migrates_legacy_csv_once(tmp_path):
+    """
+    The existing images.csv is imported on first open, and only once.
+    """
+
+    legacy = tmp_path / "images.csv"
+    shutil.copy(ROOT / "database" / "images.csv", legacy)
+    expected = pd.read_csv(legacy)
+
+    store = AssessmentStore(tmp_path / "images.db", legacy_csv=legacy)
+    AssessmentStore(tmp_path / "images.db", legacy_csv=legacy)
+
+    records = store.records()
+    assert len(records) == len(expected)
+    first = expected.iloc[0]
+    cached = store.lookup(float(first["latitude"]), float(first["longitude"]), int(first["zoom"]))
+    assert cached["image_description"] == first["image_description"]
+
+
+def test_store_lookup_returns_most_recent_run(tmp_path):
+    """
+    Lookups return the latest row of the matching location and zoom.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    store.append(_record(1.5, 2.5, 10, danger="N"))
+    store.append(_record(1.5, 2.5, 10, danger="Y"))
+    store.append(_record(1.5, 2.5, 11))
+
+    assert store.lookup(1.5, 2.5, 10)["danger"] == "Y"
+    assert store.lookup(1.5, 3.5, 10) is None
+
+
+def test_store_concurrent_appends_and_csv_export(tmp_path):
+    """
+    Appends from many threads are all stored, and the CSV export round-trips.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: store.append(_record(float(i), 0.0, 12)), range(50)))
+        list(pool.map(lambda i: store.append_csv(tmp_path / "mirror.csv", _record(float(i), 0.0, 12)), range(50)))
+
+    assert store.export_csv(tmp_path / "export.csv") == 50
+    assert pd.read_csv(tmp_path / "export.csv").columns.tolist() == COLUMNS
+    assert len(pd.read_csv(tmp_path / "mirror.csv")) == 50
+
+
+def test_store_lookup_is_keyed_by_tile(tmp_path):
+    """
+    A click elsewhere in an analysed tile is a cache hit; the neighbouring tile is not.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    store.append(_record(51.5074, -0.1278, 10))
+
+    assert store.lookup(51.5080, -0.1300, 10) is not None
+    assert store.lookup(51.5074, -0.5, 10) is None
+    assert store.lookup_tile(10, 511, 340)["latitude"] == 51.5074
+
+
+def test_stage_caches_are_independent(tmp_path):
+    """
+    A changed text prompt misses the risk cache but still hits the description cache.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    store.put_description("abc123", "llava", "Describe.", "A forest.")
+    store.put_risk("A forest.", "mistral", "Assess: {description}", "SAFE")
+
+    assert store.get_description("abc123", "llava", "Describe.") == "A forest."
+    assert store.get_description("abc123", "llava", "Describe in detail.") is None
+    assert store.get_risk("A forest.", "mistral", "Assess: {description}") == "SAFE"
+    assert store.get_risk("A forest.", "mistral", "Assess carefully: {description}") is None
+
+
+def test_migrated_runs_seed_the_risk_cache(tmp_path):
+    """
+    Runs imported from the CSV log fill the risk cache under their prompt template.
+    """
+
+    import yaml
+
+    legacy = tmp_path / "images.csv"
+    shutil.copy(ROOT / "database" / "images.csv", legacy)
+    first = pd.read_csv(legacy).iloc[0]
+    template = yaml.safe_load((ROOT / "models.yaml").read_text())["text_model"]["prompt"]
+
+    store = AssessmentStore(tmp_path / "images.db", legacy_csv=legacy)
+
+    assert store.get_risk(first["image_description"], first["text_model"], template) == first["text_description"]
+
+
+def test_prompts_and_texts_are_stored_once(tmp_path):
+    """
+    Runs reference one row per prompt version and per text; long texts are compressed; reads are unchanged.
+    """
+
+    import sqlite3
+
+    store = AssessmentStore(tmp_path / "images.db")
+    description = "Dense forest with a river and a few fields. " * 10
+    record = _record(1.5, 2.5, 10)
+    record.update(image_prompt="Describe.", image_description=description,
+                  text_prompt=f"Assess: {description}", text_description="Looks fine.\nSAFE")
+    store.append(record)
+    store.append({**record, "latitude": 3.5})
+    store.append({**record, "image_prompt": "Describe in detail."})
+
+    with sqlite3.connect(store.path) as conn:
+        texts = conn.execute("SELECT compressed FROM texts ORDER BY id").fetchall()
+        inline = conn.execute("SELECT image_prompt, text_prompt, image_description FROM assessments").fetchall()
+
+    assert texts == [(1,), (0,)]
+    assert set(inline) == {(None, None, None)}
+    assert store.prompts()[["kind", "version"]].values.tolist() == [["image", 1], ["image", 2], ["text", 1]]
+    assert store.prompts().iloc[2]["prompt"] == "Assess: {description}"
+    runs = store.records()
+    assert runs.iloc[0].to_dict() == {**record, "latitude": 1.5, "zoom": 10}
+    assert runs.loc[2, "image_prompt"] == "Describe in detail."
+    assert store.lookup(3.5, 2.5, 10)["image_description"] == description
+
+
+def test_text_template_survives_a_description_found_in_it(tmp_path):
+    """
+    A description that also occurs in the fixed prompt text ("forest") does not corrupt the stored template:
+    the template given with the run is used, and without one the prompt stays inline.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    template = "Is this forest at risk? Scene: {description}"
+    record = _record(1.5, 2.5, 10)
+    record.update(image_description="forest", text_prompt=template.replace("{description}", "forest"))
+
+    store.append({**record, "text_template": template})
+    store.append({**record, "latitude": 40.5})  # no template given: ambiguous
+
+    assert store.prompts().query("kind == 'text'")["prompt"].tolist() == [template]
+    assert store.records()["text_prompt"].tolist() == [record["text_prompt"]] * 2
+
+
+def test_compact_moves_inline_runs(tmp_path):
+    """
+    Runs stored inline by earlier versions are moved to the shared tables without changing what is read.
+    """
+
+    import sqlite3
+
+    legacy = tmp_path / "images.csv"
+    shutil.copy(ROOT / "database" / "images.csv", legacy)
+    store = AssessmentStore(tmp_path / "images.db", legacy_csv=legacy)
+    expected = store.records()
+    with sqlite3.connect(store.path) as conn:
+        # put the text back inline, as an earlier version would have stored it
+        conn.execute("UPDATE assessments SET image_prompt_id = NULL, text_prompt_id = NULL, "
+                     "image_description_id = NULL, text_description_id = NULL")
+        for row in expected.itertuples():
+            conn.execute(
+                "UPDATE assessments SET image_prompt = ?, text_prompt = ?, image_description = ?, "
+                "text_description = ? WHERE id = ?",
+                (row.image_prompt, row.text_prompt, row.image_description, row.text_description, row.Index + 1),
+            )
+    pd.testing.assert_frame_equal(store.records(), expected)
+
+    stats = store.compact()
+
+    assert stats["runs"] == len(expected)
+    pd.testing.assert_frame_equal(store.records(), expected)
+    with sqlite3.connect(store.path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM assessments WHERE image_description IS NOT NULL").fetchone() == (0,)
+    assert store.compact()["runs"] == 0
+
+
+def test_stage_caches_survive_the_upgrade(tmp_path):
+    """
+    Descriptions and risk texts cached by a version-6 store are still found after the upgrade.
+    """
+
+    import sqlite3
+
+    from app.assessment_store import _MIGRATIONS, _SCHEMA
+
+    with sqlite3.connect(tmp_path / "images.db") as conn:
+        conn.row_factory = sqlite3.Row
+        conn.executescript(_SCHEMA)
+        for migration in _MIGRATIONS[:5]:
+            migration(conn)
+        conn.execute("PRAGMA user_version = 6")
+        conn.execute("INSERT INTO descriptions VALUES ('abc123', 'llava', ?, 'A forest.', '2026-01-01')",
+                     (sha256_text("Describe."),))
+        conn.execute("INSERT INTO risks VALUES (?, 'mistral', ?, 'SAFE', '2026-01-01')",
+                     (sha256_text("A forest."), sha256_text("Assess: {description}")))
+
+    store = AssessmentStore(tmp_path / "images.db")
+
+    assert store.get_description("abc123", "llava", "Describe.") == "A forest."
+    assert store.get_risk("A forest.", "mistral", "Assess: {description}") == "SAFE"
@@ -0,0 +1,56 @@
+from batch import BACKLOG_PER_WORKER, bbox_locations, run_batch, unique_tiles
+from app.assessment_store import AssessmentStore
+from fakes import FakeOllama
+from tests.fake_pipeline import TileSession, make_pipeline
+
+
+def test_bbox_covers_every_tile_once():
+    """
+    A bounding box becomes one location per tile; locations in one tile are analysed once.
+    """
+
+    locations = bbox_locations(22.0, -20.0, 23.0, -19.0, 8)
+
+    assert len(locations) == len(unique_tiles(locations)) == 2 * 2
+    assert len(unique_tiles([(-19.5, 22.5, 12), (-19.5001, 22.5001, 12), (-19.5, 22.5, 11)])) == 2
+
+
+def test_batch_resumes_after_failures(tmp_path):
+    """
+    Failed locations are retried on the next run; finished ones are not analysed again.
+    """
+
+    locations = bbox_locations(22.0, -20.0, 23.0, -19.0, 8)
+    with FakeOllama(replies={"mistral": "Burn scars.\nDANGER"}) as server:
+        flaky = TileSession(broken={"http://tiles/8/142/144"})
+        first = run_batch(make_pipeline(tmp_path, server.host, flaky), locations)
+        second = run_batch(make_pipeline(tmp_path, server.host, TileSession()), locations)
+
+    assert first == {"cached": 0, "analysed": 3, "prescreened": 0, "failed": 1}
+    assert second == {"cached": 3, "analysed": 1, "prescreened": 0, "failed": 0}
+    records = AssessmentStore(tmp_path / "images.db").records()
+    assert len(records) == 4
+    assert set(records["danger"]) == {"Y"}
+
+
+def test_downloads_wait_for_slow_models(tmp_path):
+    """
+    When the models are slower than the downloads, only a bounded backlog of tiles is downloaded ahead.
+    """
+
+    locations = bbox_locations(22.0, -20.0, 24.0, -18.0, 9)
+    session = TileSession()
+    ahead = []
+    with FakeOllama(delay=0.02) as server:
+        pipeline = make_pipeline(tmp_path, server.host, session)
+        analyse_image = pipeline.analyse_image
+
+        def counting_analyse_image(*args):
+            ahead.append(len(session.urls) - len(ahead))
+            return analyse_image(*args)
+
+        pipeline.analyse_image = counting_analyse_image
+        counts = run_batch(pipeline, locations, download_workers=2, model_workers=1)
+
+    assert counts["analysed"] == len(locations) > 2 + BACKLOG_PER_WORKER
+    assert max(ahead) <= 2 + BACKLOG_PER_WORKER
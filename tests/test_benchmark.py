@@ -0,0 +1,36 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.okavango import SCHEMAS, apply_schema
+from benchmark import compare, run_benchmarks, synthetic_dataset
+
+
+def test_synthetic_datasets_match_the_schemas():
+    """
+    Generated datasets pass the schema check of the real downloads, with countries and aggregates.
+    """
+
+    for name in SCHEMAS:
+        df = apply_schema(synthetic_dataset(name, ["AAA", "AAB"], np.random.default_rng(0)), name)
+        assert set(df["Code"].dropna()) == {"AAA", "AAB", "OWID_WRL"}
+        assert df["Entity"].str.startswith("Region").any()
+
+
+def test_benchmarks_cover_every_group(tmp_path):
+    """
+    One small run times data loading, Page 1, the store and Page 2 runs, with JSON-ready results.
+    """
+
+    results = run_benchmarks([1], repeat=1, runs=2, workdir=tmp_path)
+    table = pd.DataFrame(results)
+
+    assert set(table["group"]) == {"data", "page1", "store", "pipeline"}
+    assert {"startup", "merge", "slice index", "lookup hit", "analyse", "analyse cached"} <= set(table["name"])
+    assert (table["median"] >= 0).all()
+    assert table.loc[table["name"] == "analyse", "repeat"].item() == 2
+    json.dumps(results)
+
+    slower = [{**result, "median": result["median"] * 2} for result in results]
+    assert (compare(results, slower)["ratio"].dropna() == 2).all()
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from app.okavango import OkavangoData
+
+
+def test_read_table_uses_parquet_cache(tmp_path, monkeypatch):
+    """
+    The first read stores a Parquet copy; later reads use it until the CSV changes.
+    """
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+
+    source = tmp_path / "annual-deforestation.csv"
+    source.write_text("Entity,Code,Year,Deforestation\nPortugal,PRT,2020,1.5\n")
+
+    first = data._read_table("annual-deforestation.csv")
+    assert len(list((tmp_path / "cache").glob("*.parquet"))) == 1
+
+    # a cache hit must not parse the CSV again
+    read_csv = pd.read_csv
+    monkeypatch.setattr(pd, "read_csv", lambda *a, **k: (_ for _ in ()).throw(AssertionError))
+    pd.testing.assert_frame_equal(data._read_table("annual-deforestation.csv"), first)
+
+    # a changed source invalidates the cache and replaces the old copy
+    monkeypatch.setattr(pd, "read_csv", read_csv)
+    source.write_text("Entity,Code,Year,Deforestation\nPortugal,PRT,2020,1.5\nSpain,ESP,2020,2.0\n")
+    assert len(data._read_table("annual-deforestation.csv")) == 2
+    assert len(list((tmp_path / "cache").glob("*.parquet"))) == 1
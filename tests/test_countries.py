@@ -0,0 +1,118 @@
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from app.assessment_store import COLUMNS, AssessmentStore
+from app.countries import CountryIndex, enrich_store
+from app.okavango import SCHEMAS, TABLES, OkavangoData
+from fakes import FakeOllama
+from tests.fake_pipeline import TileSession, make_pipeline
+
+
+def _data():
+    """OkavangoData with two square countries, a disputed square and a few years of every dataset."""
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = Path("downloads")
+    data.world = gpd.GeoDataFrame(
+        {"ADM0_A3": ["AAA", "BBB", pd.NA]},
+        geometry=[box(0, 0, 10, 10), box(10, 0, 20, 10), box(0, 20, 10, 30)],
+        crs="EPSG:4326",
+    )
+    for name in TABLES:
+        rows = pd.DataFrame({
+            "Entity": ["A", "A", "B", "B", "World"],
+            "Code": ["AAA", "AAA", "BBB", "BBB", None],
+            "Year": [2019, 2020, 2019, 2020, 2020],
+            SCHEMAS[name][0]: [1.0, 2.0, 3.0, np.nan, 9.0],
+        })
+        setattr(data, name, rows)
+    return data
+
+
+def _record(latitude, longitude, danger="N"):
+    record = {column: f"{column} text" for column in COLUMNS}
+    record.update(latitude=latitude, longitude=longitude, zoom=12, danger=danger)
+    return record
+
+
+def test_points_resolve_to_their_country():
+    """
+    Points resolve to the polygon containing them, one at a time or in bulk; points just off a
+    coast take the nearest country, points at sea and in disputed areas none.
+    """
+
+    countries = CountryIndex.from_data(_data())
+    latitudes = [5, 5, 5, 5.2, 50, 25]
+    longitudes = [5, 15, 10, -0.3, 5, 5]
+
+    codes = countries.resolve_many(latitudes, longitudes)
+
+    assert codes.tolist() == ["AAA", "BBB", "AAA", "AAA", None, None]
+    assert [countries.resolve(lat, lon) for lat, lon in zip(latitudes, longitudes)] == codes.tolist()
+
+
+def test_latest_indicators_per_country():
+    """
+    Every country gets the latest non-missing value of each indicator, with its year.
+    """
+
+    countries = CountryIndex.from_data(_data())
+
+    assert countries.describe(5, 5) == {
+        "iso3": "AAA",
+        "forest_cover": 2.0, "forest_cover_year": 2020,
+        "deforestation": 2.0, "deforestation_year": 2020,
+        "land_protected": 2.0, "land_protected_year": 2020,
+    }
+    assert countries.describe(5, 15)["forest_cover_year"] == 2019
+    assert countries.describe(50, 5) is None
+
+
+def test_runs_are_stored_with_their_country(tmp_path):
+    """
+    Runs are enriched once in bulk and DANGER rates are aggregated by country, counting the
+    latest run of each tile unless asked for every run.
+    """
+
+    countries = CountryIndex.from_data(_data())
+    store = AssessmentStore(tmp_path / "images.db")
+    first = store.append(_record(5, 5, danger="N"))
+    store.append(_record(5.0001, 5.0001, danger="Y"))  # same tile, analysed again
+    store.append(_record(2, 2, danger="N"))
+    store.append(_record(5, 15, danger="Y"))
+    store.append(_record(50, 5, danger="Y"))
+
+    assert enrich_store(store, countries) == 5
+    assert enrich_store(store, countries) == 0
+    assert store.country_of(first) == {
+        "iso3": "AAA",
+        "forest_cover": 2.0, "forest_cover_year": 2020,
+        "deforestation": 2.0, "deforestation_year": 2020,
+        "land_protected": 2.0, "land_protected_year": 2020,
+    }
+
+    latest = store.danger_by_country().set_index("iso3")
+    every_run = store.danger_by_country(latest_only=False).set_index("iso3")
+
+    assert latest.index.tolist() == ["BBB", "AAA"]
+    assert latest.loc["AAA", ["runs", "dangers", "danger_rate"]].tolist() == [2, 1, 0.5]
+    assert every_run.loc["AAA", "runs"] == 3
+    assert latest.loc["BBB", "forest_cover"] == 3.0
+    assert enrich_store(store, countries, refresh=True) == 5
+
+
+def test_pipeline_stores_the_country_of_each_run(tmp_path):
+    """
+    A pipeline given a country index stores the country with every run it logs.
+    """
+
+    with FakeOllama(replies={"mistral": "Deforestation.\nDANGER"}) as server:
+        pipeline = make_pipeline(tmp_path, server.host, TileSession())
+        pipeline.countries = CountryIndex.from_data(_data())
+        pipeline.analyse(5, 15, 12)
+
+    assert pipeline.store.unresolved_locations().empty
+    assert pipeline.store.danger_by_country()[["iso3", "runs", "dangers"]].values.tolist() == [["BBB", 1, 1]]
@@ -1,10 +1,53 @@
+import pytest
 import requests
-from types import SimpleNamespace
 
-from app.okavango import OkavangoData
+from app.okavango import OkavangoData, REVALIDATE_AFTER
 
 
-def test_download_dataset_creates_file(tmp_path, monkeypatch):
+class FakeResponse:
+    """Minimal streaming response as returned by requests.Session.get(stream=True)."""
+
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), 4):
+            yield self.content[i:i + 4]
+
+
+class FakeSession:
+    """Stands in for requests.Session and records the headers of every request.
+    Honours Range requests against the full content it serves."""
+
+    def __init__(self, status_code=200, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        if "Range" in headers and self.status_code == 200:
+            start = int(headers["Range"].split("=")[1].rstrip("-"))
+            body = self.content[start:]
+            extra = {"Content-Range": f"bytes {start}-{len(self.content) - 1}/{len(self.content)}"}
+            return FakeResponse(206, body, {**self.headers, **extra})
+        return FakeResponse(self.status_code, self.content, self.headers)
+
+
+def test_download_dataset_creates_file(tmp_path):
     """
     Test Function 1: download_dataset
     Ensures a file is written to downloads directory.
@@ -15,15 +58,7 @@ def test_download_dataset_creates_file(tmp_path, monkeypatch):
     data.download_dir = tmp_path
 
     fake_content = b"Entity,Year,Code,Value\nPortugal,2020,PRT,123\n"
-
-    # Mock requests.get
-    def fake_get(*args, **kwargs):
-        return SimpleNamespace(
-            content=fake_content,
-            raise_for_status=lambda: None
-        )
-
-    monkeypatch.setattr(requests, "get", fake_get)
+    data.session = FakeSession(content=fake_content, headers={"ETag": '"v1"'})
 
     url = "https://ourworldindata.org/grapher/annual-deforestation.csv"
     data.download_dataset(url)
@@ -31,4 +66,107 @@ def test_download_dataset_creates_file(tmp_path, monkeypatch):
     output_file = tmp_path / "annual-deforestation.csv"
 
     assert output_file.exists()
-    assert output_file.read_bytes() == fake_content
\ No newline at end of file
+    assert output_file.read_bytes() == fake_content
+    assert data._read_manifest()["annual-deforestation.csv"]["etag"] == '"v1"'
+
+
+def test_download_dataset_revalidates_stale_file(tmp_path):
+    """
+    Stale files are revalidated with a conditional request; a 304 keeps the local copy.
+    """
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+
+    output_file = tmp_path / "annual-deforestation.csv"
+    output_file.write_bytes(b"old")
+    data._update_manifest("annual-deforestation.csv", {"etag": '"v1"', "checked_at": 0})
+
+    data.session = FakeSession(status_code=304)
+    data.download_dataset("https://ourworldindata.org/grapher/annual-deforestation.csv")
+
+    assert data.session.requests[0]["If-None-Match"] == '"v1"'
+    assert output_file.read_bytes() == b"old"
+    assert data._read_manifest()["annual-deforestation.csv"]["checked_at"] > REVALIDATE_AFTER
+
+
+def test_download_dataset_resumes_partial_file(tmp_path):
+    """
+    A leftover .part file is resumed with a Range request and renamed into place.
+    """
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+
+    fake_content = b"Entity,Year,Code,Value\nPortugal,2020,PRT,123\n"
+    (tmp_path / "annual-deforestation.csv.part").write_bytes(fake_content[:10])
+    data.session = FakeSession(content=fake_content)
+
+    data.download_dataset("https://ourworldindata.org/grapher/annual-deforestation.csv")
+
+    assert data.session.requests[0]["Range"] == "bytes=10-"
+    assert (tmp_path / "annual-deforestation.csv").read_bytes() == fake_content
+    assert not (tmp_path / "annual-deforestation.csv.part").exists()
+    assert data._read_manifest()["annual-deforestation.csv"]["size"] == len(fake_content)
+
+
+def test_verify_downloads_removes_corrupted_file(tmp_path):
+    """
+    A file that no longer matches the manifest checksum is deleted on startup.
+    """
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+    data.session = FakeSession(content=b"complete file")
+
+    url = "https://ourworldindata.org/grapher/annual-deforestation.csv"
+    data.download_dataset(url)
+    (tmp_path / "annual-deforestation.csv").write_bytes(b"compl")
+
+    data.verify_downloads()
+
+    assert not (tmp_path / "annual-deforestation.csv").exists()
+    assert "annual-deforestation.csv" not in data._read_manifest()
+
+
+def test_download_dataset_keeps_part_file_when_incomplete(tmp_path):
+    """
+    A body shorter than the announced Content-Length is not renamed into place.
+    """
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+    data.session = FakeSession(content=b"short", headers={"Content-Length": "100"})
+
+    with pytest.raises(requests.exceptions.RequestException):
+        data.download_dataset("https://ourworldindata.org/grapher/annual-deforestation.csv")
+
+    assert not (tmp_path / "annual-deforestation.csv").exists()
+    assert (tmp_path / "annual-deforestation.csv.part").read_bytes() == b"short"
+
+
+def test_download_dataset_restarts_on_unexpected_range(tmp_path):
+    """
+    Resumes ask for the identity encoding; a 206 for another range than requested restarts from byte 0.
+    """
+
+    class WrongRangeSession(FakeSession):
+        def get(self, url, headers=None, **kwargs):
+            headers = headers or {}
+            if "Range" in headers:
+                self.requests.append(headers)
+                return FakeResponse(206, self.content[2:], {"Content-Range": f"bytes 2-{len(self.content) - 1}/*"})
+            return super().get(url, headers, **kwargs)
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+
+    fake_content = b"Entity,Year,Code,Value\nPortugal,2020,PRT,123\n"
+    (tmp_path / "annual-deforestation.csv.part").write_bytes(fake_content[:10])
+    data.session = WrongRangeSession(content=fake_content)
+
+    data.download_dataset("https://ourworldindata.org/grapher/annual-deforestation.csv")
+
+    assert data.session.requests[0]["Accept-Encoding"] == "identity"
+    assert "Range" not in data.session.requests[1]
+    assert (tmp_path / "annual-deforestation.csv").read_bytes() == fake_content
@@ -0,0 +1,36 @@
+import ast
+from pathlib import Path
+
+from import_report import parse_importtime
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_streamlit_app_defers_heavy_imports():
+    """
+    The entry script only imports streamlit at module level; page modules load on demand.
+    """
+
+    tree = ast.parse((ROOT / "app" / "streamlit_app.py").read_text(encoding="utf-8"))
+    top_level = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            top_level.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            top_level.add(node.module.split(".")[0])
+
+    assert top_level == {"streamlit"}
+
+
+def test_parse_importtime():
+    """
+    Self and cumulative times are read per module, header lines are skipped.
+    """
+
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   numpy.core\n"
+        "import time:       300 |        420 | numpy\n"
+    )
+
+    assert parse_importtime(stderr) == [("numpy.core", 120, 120), ("numpy", 300, 420)]
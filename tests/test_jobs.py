@@ -0,0 +1,75 @@
+import time
+
+from app.assessment_store import JOB_DONE, JOB_FAILED, JOB_QUEUED, AssessmentStore
+from app.jobs import JobWorkers
+from fakes import FakeOllama
+from tests.fake_pipeline import TileSession, make_pipeline
+
+
+def _wait_for(store, job_ids, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = {job["id"]: job for job in store.jobs(limit=100)}
+        if all(jobs[i]["status"] in (JOB_DONE, JOB_FAILED) for i in job_ids):
+            return jobs
+        time.sleep(0.05)
+    raise AssertionError("jobs did not finish")
+
+
+def test_identical_jobs_are_deduplicated(tmp_path):
+    """
+    The same tile with the same models and prompts is one job; another prompt is a new job.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    pipeline = make_pipeline(tmp_path, "http://unused", TileSession())
+    workers = JobWorkers(pipeline)  # not started: jobs stay queued
+
+    first = workers.submit(-19.5, 22.5, 12)
+    same_tile = workers.submit(-19.5001, 22.5001, 12)
+    other = JobWorkers(make_pipeline(tmp_path, "http://unused", TileSession(), prompt="Other."))
+    other_prompt = other.submit(-19.5, 22.5, 12)
+
+    assert first == same_tile != other_prompt
+    assert [job["status"] for job in store.jobs()] == [JOB_QUEUED, JOB_QUEUED]
+
+
+def test_workers_run_queued_jobs_and_retry_failures(tmp_path):
+    """
+    Workers finish queued jobs in the background, each with the verdict of its own run; a failed job
+    is queued again when resubmitted.
+    """
+
+    with FakeOllama(replies={"mistral": "Flooding.\nDANGER"}) as server:
+        session = TileSession(broken={"http://tiles/12/2274/2224"})
+        pipeline = make_pipeline(tmp_path, server.host, session)
+        workers = JobWorkers(pipeline, workers=2).start()
+        try:
+            ok = workers.submit(-19.5, 22.5, 12)
+            broken = workers.submit(-19.5, 15.5, 12)
+            jobs = _wait_for(pipeline.store, [ok, broken])
+            assert jobs[ok]["status"] == JOB_DONE and jobs[ok]["danger"] == "Y"
+            assert jobs[broken]["status"] == JOB_FAILED and "tile server error" in jobs[broken]["error"]
+            assert jobs[broken]["run_id"] is None and jobs[broken]["danger"] is None
+
+            session.broken.clear()
+            assert workers.submit(-19.5, 15.5, 12) == broken
+            assert _wait_for(pipeline.store, [broken])[broken]["status"] == JOB_DONE
+        finally:
+            workers.stop(timeout=5)
+
+    assert pipeline.store.lookup(-19.5, 22.5, 12)["danger"] == "Y"
+    assert len(pipeline.store.records()) == 2
+
+
+def test_interrupted_jobs_are_requeued(tmp_path):
+    """
+    Jobs left running when the app stopped are picked up again on the next start.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    store.submit_job("key", -19.5, 22.5, 12)
+    assert store.claim_job()["status"] == "running"
+
+    assert store.requeue_running_jobs() == 1
+    assert store.jobs()[0]["status"] == JOB_QUEUED
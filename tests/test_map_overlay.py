@@ -0,0 +1,74 @@
+import numpy as np
+
+from app.assessment_store import COLUMNS, AssessmentStore
+from app.map_overlay import MAX_MARKERS, Viewport, history_layer, runs_in_view
+
+
+def _record(latitude, longitude, zoom=12, danger="N"):
+    record = {column: f"{column} text" for column in COLUMNS}
+    record.update(latitude=latitude, longitude=longitude, zoom=zoom, danger=danger)
+    return record
+
+
+def test_viewport_reads_the_latest_run_of_each_tile_inside_it(tmp_path):
+    """
+    The location index returns the tiles inside the view with their latest verdict, across the antimeridian too.
+    """
+
+    store = AssessmentStore(tmp_path / "images.db")
+    store.append(_record(-19.5, 22.5, danger="N"))
+    store.append(_record(-19.5001, 22.5001, danger="Y"))
+    store.append(_record(48.8, 2.3))
+    store.append(_record(-17.7, 178.1))
+    store.append(_record(-14.3, -170.7))
+
+    okavango, clustered = runs_in_view(store, Viewport(-25, 15, -15, 30, zoom=6))
+    pacific, _ = runs_in_view(store, Viewport(-30, 170, 0, 200, zoom=4))
+
+    assert not clustered
+    assert okavango["danger"].tolist() == ["Y"]
+    assert sorted(pacific["longitude"]) == [-170.7, 178.1]
+    assert len(runs_in_view(store, Viewport.from_map(None))[0]) == 4
+    # reopening rebuilds nothing: the index already holds the latest run of each tile
+    assert len(AssessmentStore(tmp_path / "images.db").runs_in_box(-90, -180, 90, 180)) == 4
+
+
+def test_viewport_boxes():
+    """
+    Views panned past ±180° are split in two boxes; a view wider than the world is one box.
+    """
+
+    state = {"bounds": {"_southWest": {"lat": -10, "lng": 350}, "_northEast": {"lat": 10, "lng": 370}}, "zoom": 5}
+
+    assert Viewport.from_map(state).boxes() == [(-10, -10, 10, 10)]
+    assert Viewport(-10, 170, 10, 190, 5).boxes() == [(-10, 170, 10, 180), (-10, -180, 10, -170)]
+    assert Viewport(-100, -400, 100, 400, 1).boxes() == [(-90, -180, 90, 180)]
+
+
+def test_many_runs_are_clustered(tmp_path):
+    """
+    Zoomed out over more than MAX_MARKERS tiles, runs are drawn as a bounded number of clusters
+    that keep every run and verdict; zoomed in, each run gets its own marker.
+    """
+
+    import sqlite3
+
+    store = AssessmentStore(tmp_path / "images.db")
+    rng = np.random.default_rng(0)
+    n = 5 * MAX_MARKERS
+    locations = zip(rng.uniform(-60, 60, n), rng.uniform(-180, 180, n))
+    with sqlite3.connect(store.path) as conn:
+        conn.executemany(
+            "INSERT INTO assessments (timestamp, latitude, longitude, zoom, danger) VALUES ('2026-10-01', ?, ?, 14, ?)",
+            [(float(lat), float(lon), "Y" if i % 4 == 0 else "N") for i, (lat, lon) in enumerate(locations)],
+        )
+    store = AssessmentStore(tmp_path / "images.db")  # indexes the inserted rows
+
+    clusters, clustered = runs_in_view(store, Viewport(-90, -180, 90, 180, zoom=1))
+    corner, corner_clustered = runs_in_view(store, Viewport(0, 0, 10, 10, zoom=7))
+
+    assert clustered and not corner_clustered
+    assert len(clusters) <= 4 ** 3
+    assert clusters["runs"].sum() == n and clusters["dangers"].sum() == n // 4
+    assert len(history_layer(store, Viewport(-90, -180, 90, 180, zoom=1))._children) == len(clusters)
+    assert len(history_layer(store, Viewport(0, 0, 10, 10, zoom=7))._children) == len(corner)
@@ -3,7 +3,7 @@ import pandas as pd
 from pathlib import Path
 from shapely.geometry import Point
 
-from app.okavango import OkavangoData
+from app.okavango import TABLES, OkavangoData
 
 
 def test_merge_with_map_creates_geodataframes(monkeypatch):
@@ -46,4 +46,63 @@ def test_merge_with_map_creates_geodataframes(monkeypatch):
 
     assert isinstance(data.geo_forest_change, gpd.GeoDataFrame)
     assert "geometry" in data.geo_forest_change.columns
-    assert "Code" in data.geo_forest_change.columns
\ No newline at end of file
+    assert "Code" in data.geo_forest_change.columns
+
+
+def test_geo_views_share_one_geometry_table(monkeypatch):
+    """
+    Each geo_* view joins the one world table with its own dataset:
+    the map is read once and every view references the same polygons.
+    """
+
+    world = gpd.GeoDataFrame({"ADM0_A3": ["PRT"], "geometry": [Point(0, 0)]}, geometry="geometry", crs="EPSG:4326")
+    reads = []
+
+    def fake_read_file(path):
+        reads.append(path)
+        return world
+
+    monkeypatch.setattr(gpd, "read_file", fake_read_file)
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = Path("downloads")
+
+    data.forest_change = pd.DataFrame({"Entity": ["Portugal"] * 2, "Code": ["PRT"] * 2, "Year": [2019, 2020], "Value": [1, 2]})
+    data.deforestation = data.forest_change
+    data.land_protected = data.forest_change
+    data.land_degraded = data.forest_change
+    data.forest_cover = pd.DataFrame({"Entity": ["World"], "Code": [None], "Year": [2020], "Value": [9]})
+
+    geo = data.geo_forest_change
+
+    assert len(reads) == 1
+    assert list(geo.columns) == ["ADM0_A3", "geometry", "Entity", "Code", "Year", "Value"]
+    assert geo.geometry.iloc[0] is geo.geometry.iloc[1] is data.world.geometry.iloc[0]
+    assert data.panel.index.names == ["Code", "Year"]
+    # aggregates without an ISO3 code never reach the map
+    assert data.geo_forest_cover["Value"].isna().all()
+
+
+def test_geo_view_reads_only_its_dataset():
+    """
+    Opening one map view reads that dataset only, not the other four; its country-years without a
+    value are kept, as in the dataset.
+    """
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = Path("downloads")
+    data.world = gpd.GeoDataFrame({"ADM0_A3": ["PRT"], "geometry": [Point(0, 0)]}, geometry="geometry", crs="EPSG:4326")
+    reads = []
+
+    def fake_read_table(filename):
+        reads.append(filename)
+        return pd.DataFrame({
+            "Entity": ["Portugal"] * 2, "Code": ["PRT"] * 2, "Year": [2019, 2020], "Deforestation": [None, 5.0],
+        })
+
+    data._read_table = fake_read_table
+    geo = data.geo_deforestation
+
+    assert reads == [TABLES["deforestation"]]
+    assert geo["Year"].tolist() == [2019, 2020]
+    assert geo["Deforestation"].isna().tolist() == [True, False]
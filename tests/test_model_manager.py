@@ -0,0 +1,157 @@
+import time
+
+import ollama
+import pytest
+
+from app.model_manager import ModelManager, ModelTimeout, preload
+from fakes import EVAL_NS, LOAD_NS, FakeOllama
+
+
+def test_models_are_checked_once_and_pulled_only_when_missing():
+    """
+    Availability is asked once per process; only a missing model is pulled.
+    """
+
+    with FakeOllama(models=["llava:latest"]) as server:
+        manager = ModelManager(host=server.host)
+        for _ in range(3):
+            manager.chat("llava", [{"role": "user", "content": "describe"}])
+            manager.chat("mistral", [{"role": "user", "content": "assess"}])
+
+        assert len(server.calls("/api/tags")) == 2  # once per model
+        assert [body["model"] for body in server.calls("/api/pull")] == ["mistral"]
+        assert len(server.calls("/api/chat")) == 6
+
+
+def test_chat_reports_load_and_inference_time_separately():
+    """
+    The first call pays the model load; once resident, only inference time remains.
+    """
+
+    with FakeOllama(replies={"mistral": "No risk.\nSAFE"}) as server:
+        manager = ModelManager(host=server.host, keep_alive="10m")
+        cold = manager.chat("mistral", [{"role": "user", "content": "assess"}])
+        warm = manager.chat("mistral", [{"role": "user", "content": "assess"}])
+
+    assert cold.content == "No risk.\nSAFE"
+    assert cold.load_seconds == LOAD_NS / 1e9
+    assert warm.load_seconds == 0
+    assert warm.inference_seconds == (100_000_000 + EVAL_NS) / 1e9
+    assert warm.output_tokens == 34
+    assert all(body["keep_alive"] == "10m" for body in server.calls("/api/chat"))
+
+
+def test_preload_warms_up_configured_models():
+    """
+    Both models of models.yaml are loaded at start-up with the configured keep_alive.
+    """
+
+    with FakeOllama() as server:
+        config = {
+            "ollama": {"host": server.host, "keep_alive": -1},
+            "image_model": {"name": "llava"},
+            "text_model": {"name": "mistral"},
+        }
+        load_times = preload(config)
+
+        assert load_times == {"llava": LOAD_NS / 1e9, "mistral": LOAD_NS / 1e9}
+        assert [(b["model"], b["keep_alive"]) for b in server.calls("/api/generate")] == [
+            ("llava", -1), ("mistral", -1),
+        ]
+        # the next request finds the models resident
+        result = ModelManager(client=ollama.Client(host=server.host)).chat("llava", [])
+        assert result.load_seconds == 0
+
+
+def test_preload_only_checks_fallbacks():
+    """
+    Missing fallback models are not pulled at start-up unless ollama.pull_fallbacks is set.
+    """
+
+    config = {
+        "image_model": {"name": "llava", "fallbacks": ["moondream"]},
+        "text_model": {"name": "mistral", "fallbacks": ["phi3:mini"]},
+    }
+    with FakeOllama() as server:
+        preload({**config, "ollama": {"host": server.host}})
+    with FakeOllama() as pulling:
+        preload({**config, "ollama": {"host": pulling.host, "pull_fallbacks": True}})
+
+    assert server.calls("/api/pull") == []
+    assert [body["model"] for body in pulling.calls("/api/pull")] == ["moondream", "phi3:mini"]
+
+
+def test_stream_chat_yields_chunks_and_times_first_token():
+    """
+    A streamed answer arrives in several chunks; the result holds the full text and timings.
+    """
+
+    with FakeOllama(replies={"llava": "Dense forest along a river bank"}) as server:
+        stream = ModelManager(host=server.host).stream_chat("llava", [{"role": "user", "content": "x"}])
+        chunks = list(stream)
+
+    assert len(chunks) == 6
+    assert "".join(chunks) == stream.result.content == "Dense forest along a river bank"
+    assert stream.result.first_token_seconds is not None
+    assert stream.result.load_seconds == LOAD_NS / 1e9
+    assert server.calls("/api/chat")[0]["stream"] is True
+
+
+def test_stream_stopped_early_keeps_partial_text():
+    """
+    Leaving the stream early closes it; the text received so far is kept.
+    """
+
+    with FakeOllama(replies={"mistral": "1. YES\nDANGER\nextra words here"}) as server:
+        stream = ModelManager(host=server.host).stream_chat("mistral", [])
+        chunks = iter(stream)
+        received = next(chunks) + next(chunks)
+        chunks.close()
+
+    assert stream.result.content == received == "1. YES\nDANGER\nextra "
+
+
+def test_slow_model_falls_back_within_latency_budget():
+    """
+    A model silent past its latency budget is abandoned for the next fallback, which is recorded.
+    """
+
+    with FakeOllama(models=["llava:latest", "moondream:latest"], delay={"llava": 1.0}) as server:
+        stream = ModelManager(host=server.host).stream_chat(
+            "llava", [], fallbacks=["moondream"], timeout=5, latency_budget=0.3,
+        )
+        text = "".join(stream)
+
+    assert stream.result.model == "moondream"
+    assert text == "moondream says\nSAFE"
+    assert stream.skipped[0][0] == "llava"
+    assert "latency budget" in stream.skipped[0][1]
+
+
+def test_abandoned_model_request_is_cancelled():
+    """
+    A model abandoned for its latency budget has its connection closed, so the server stops
+    generating instead of competing with the fallback.
+    """
+
+    with FakeOllama(models=["llava:latest", "moondream:latest"], delay={"llava": 1.0}) as server:
+        stream = ModelManager(host=server.host).stream_chat(
+            "llava", [], fallbacks=["moondream"], timeout=5, latency_budget=0.3,
+        )
+        list(stream)
+        deadline = time.monotonic() + 3
+        while not server.cancelled and time.monotonic() < deadline:
+            time.sleep(0.05)  # the server notices once its delay is over
+
+    assert server.cancelled == ["llava"]
+
+
+def test_timeout_without_fallback_raises():
+    """
+    With no fallback left, exceeding the timeout is an error instead of an endless wait.
+    """
+
+    with FakeOllama(delay=1.0) as server:
+        stream = ModelManager(host=server.host).stream_chat("mistral", [], timeout=0.3)
+        with pytest.raises(ModelTimeout):
+            list(stream)
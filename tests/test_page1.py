@@ -0,0 +1,78 @@
+import pandas as pd
+
+from app.page1 import build_slice_index
+
+
+def test_build_slice_index_precomputes_year_slices():
+    """
+    Each year maps to the country rows sorted by value, with KPIs and top/bottom rows.
+    """
+
+    raw_df = pd.DataFrame({
+        "Entity": ["Portugal", "Spain", "France", "World", "Portugal", "Italy"],
+        "Code": ["PRT", "ESP", "FRA", None, "PRT", "ITA"],
+        "Year": [2020, 2020, 2020, 2020, 2021, 2020],
+        "Value": [3.0, 1.0, 2.0, 100.0, 5.0, None],
+    })
+
+    index = build_slice_index(raw_df, "Value")
+    year_slice = index.get(2020)
+
+    assert index.years == [2020, 2021]
+    assert index.country_list == ["France", "Italy", "Portugal", "Spain"]
+    assert year_slice.countries["Entity"].tolist() == ["Spain", "France", "Portugal"]
+    assert year_slice.top["Entity"] == "Portugal"
+    assert year_slice.bottom["Entity"] == "Spain"
+    assert year_slice.default_entities == ["Portugal", "France", "Spain"]
+    assert year_slice.n_each == 1
+    assert year_slice.top_bottom["Entity"].tolist() == ["Spain", "Portugal"]
+    assert index.code_to_entity["ITA"] == "Italy"
+    assert index.get(1999).empty
+
+
+def test_entity_year_matrix_gathers_series():
+    """
+    The time series of several countries come from one row gather, without missing years.
+    """
+
+    raw_df = pd.DataFrame({
+        "Entity": ["Portugal", "Portugal", "Spain", "Spain"],
+        "Code": ["PRT", "PRT", "ESP", "ESP"],
+        "Year": [2021, 2020, 2020, 2022],
+        "Value": [2.0, 1.0, 5.0, None],
+    })
+
+    index = build_slice_index(raw_df, "Value")
+    series = index.matrix.series(["Spain", "Atlantis", "Portugal"])
+
+    assert [country for country, _, _ in series] == ["Spain", "Portugal"]
+    assert series[0][1].tolist() == [2020] and series[0][2].tolist() == [5.0]
+    assert series[1][1].tolist() == [2020, 2021] and series[1][2].tolist() == [1.0, 2.0]
+
+
+def test_figure_cache_counts_hits_and_evicts_least_recently_used():
+    """
+    Figures are built once per key, returned as fresh copies, and evicted in LRU order.
+    """
+
+    import plotly.graph_objects as go
+
+    from app.page1 import FigureCache
+
+    cache = FigureCache(maxsize=2)
+    builds = []
+
+    def build(title):
+        builds.append(title)
+        return go.Figure(layout={"title": {"text": title}})
+
+    first = cache.get_or_build(("a",), lambda: build("a"))
+    again = cache.get_or_build(("a",), lambda: build("a"))
+    cache.get_or_build(("b",), lambda: build("b"))
+    cache.get_or_build(("a",), lambda: build("a"))
+    cache.get_or_build(("c",), lambda: build("c"))  # evicts "b"
+    cache.get_or_build(("b",), lambda: build("b"))
+
+    assert again is not first and again.layout.title.text == "a"
+    assert builds == ["a", "b", "c", "b"]
+    assert cache.stats() == {"hits": 2, "misses": 4, "size": 2, "maxsize": 2}
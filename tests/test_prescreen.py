@@ -0,0 +1,111 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.prescreen import PRESCREEN_MODEL, rules_from_config, tile_stats
+from fakes import FakeOllama
+from tests.fake_pipeline import TileSession, make_pipeline
+
+OCEAN = (12, 40, 90)
+FOREST = (40, 90, 35)
+SAND = (210, 180, 130)
+
+RULES = {"rules": [
+    {"name": "open water", "when": {"water": {"min": 0.95}, "entropy": {"max": 4.5}},
+     "action": "skip", "verdict": "SAFE", "note": "Open water."},
+    {"name": "shoreline", "when": {"water": {"min": 0.3}}, "action": "annotate"},
+]}
+
+
+def _encode(pixels: np.ndarray, format: str = "PNG", **options) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def _tile(*colours) -> np.ndarray:
+    """256×256 tile split into vertical bands of the given colours."""
+    pixels = np.zeros((256, 256, 3))
+    for i, band in enumerate(np.array_split(np.arange(256), len(colours))):
+        pixels[:, band] = colours[i]
+    return pixels
+
+
+def test_tile_stats_classify_pixels():
+    """
+    Colour indices give the water, vegetation and bare-soil fractions; uniform tiles have no entropy.
+    """
+
+    stats = tile_stats(_encode(_tile(OCEAN, FOREST, SAND, SAND)))
+
+    assert stats.water == pytest.approx(0.25)
+    assert stats.vegetation == pytest.approx(0.25)
+    assert stats.bare == pytest.approx(0.5)
+    assert stats.cloud == 0
+    assert stats.entropy == pytest.approx(1.5)
+    assert tile_stats(_encode(_tile(OCEAN))).entropy == 0
+
+
+def test_content_hash_ignores_encoding():
+    """
+    The same scene saved as PNG and as JPEG has the same content hash; another scene does not.
+    """
+
+    scene = _tile(OCEAN, FOREST)
+
+    assert tile_stats(_encode(scene)).content_hash == tile_stats(_encode(scene, "JPEG")).content_hash
+    assert tile_stats(_encode(scene)).content_hash != tile_stats(_encode(_tile(FOREST, OCEAN))).content_hash
+    # only identical pixels share the pixel hash
+    assert tile_stats(_encode(scene)).pixel_sha256 == tile_stats(_encode(scene, compress_level=1)).pixel_sha256
+    assert tile_stats(_encode(scene)).pixel_sha256 != tile_stats(_encode(scene, "JPEG")).pixel_sha256
+
+
+def test_invalid_rules_are_rejected():
+    """
+    Rules naming unknown statistics or actions fail when models.yaml is read.
+    """
+
+    with pytest.raises(ValueError, match="unknown statistics"):
+        rules_from_config({"prescreen": {"rules": [{"name": "x", "when": {"ndvi": {"min": 0.5}}}]}})
+    with pytest.raises(ValueError, match="action"):
+        rules_from_config({"prescreen": {"rules": [{"name": "x", "when": {}, "action": "drop"}]}})
+    assert rules_from_config({"prescreen": {"enabled": False, **RULES}}) == []
+
+
+def test_skip_rule_short_circuits_the_models(tmp_path):
+    """
+    A tile matching a skip rule is logged with the rule's verdict without any model call, and stays cached.
+    """
+
+    with FakeOllama() as server:
+        pipeline = make_pipeline(tmp_path, server.host, TileSession(image=_encode(_tile(OCEAN))), prescreen=RULES)
+        record, cached = pipeline.analyse(-19.5, 22.5, 12)
+        again, cached_again = pipeline.analyse(-19.5, 22.5, 12)
+
+    assert server.calls("/api/chat") == []
+    assert not cached and cached_again
+    assert record["image_model"] == record["text_model"] == PRESCREEN_MODEL
+    assert again["prescreen"] == "open water" and again["danger"] == "N"
+    assert pipeline.store.get_tile_stats(record["image_sha256"])["water"] == 1.0
+
+
+def test_annotate_rule_and_duplicate_tiles(tmp_path):
+    """
+    An annotate rule is recorded while the models run; a tile with the same pixels is not described
+    again, while a tile that only looks alike (same content hash) is.
+    """
+
+    scene = _tile(OCEAN, FOREST)
+    with FakeOllama() as server:
+        pipeline = make_pipeline(tmp_path, server.host, TileSession(image=_encode(scene)), prescreen=RULES)
+        first, _ = pipeline.analyse(-19.5, 22.5, 12)
+        pipeline.tiles.session = TileSession(image=_encode(scene, compress_level=1))
+        duplicate, _ = pipeline.analyse(-19.5, 25.5, 12)
+        pipeline.tiles.session = TileSession(image=_encode(scene, "JPEG"))
+        lookalike, _ = pipeline.analyse(-19.5, 28.5, 12)
+
+    assert first["prescreen"] == duplicate["prescreen"] == lookalike["prescreen"] == "shoreline"
+    assert len({first["image_sha256"], duplicate["image_sha256"], lookalike["image_sha256"]}) == 3
+    assert [call["model"] for call in server.calls("/api/chat")] == ["llava", "mistral", "llava"]
\ No newline at end of file
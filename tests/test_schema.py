@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from app.okavango import OkavangoData, SchemaError, apply_schema
+
+
+def test_apply_schema_converts_to_compact_dtypes():
+    """
+    Entity/Code become categoricals, Year int16 and values float32.
+    """
+
+    df = pd.DataFrame({
+        "Entity": ["Portugal", "World"],
+        "Code": ["PRT", None],
+        "Year": [2020, 2020],
+        "Deforestation": [1.5, 2.5],
+    })
+
+    out = apply_schema(df, "deforestation")
+
+    assert out.dtypes.astype(str).tolist() == ["category", "category", "int16", "float32"]
+    assert (out["Code"].str.len() == 3).tolist() == [True, False]
+
+
+def test_apply_schema_rejects_drift():
+    """
+    A renamed value column or an out-of-range year fails loudly.
+    """
+
+    df = pd.DataFrame({"Entity": ["Portugal"], "Code": ["PRT"], "Year": [2020], "Forest loss": [1.5]})
+    with pytest.raises(SchemaError, match="missing columns"):
+        apply_schema(df, "deforestation")
+
+    df = pd.DataFrame({"Entity": ["Portugal"], "Code": ["PRT"], "Year": [40000], "Deforestation": [1.5]})
+    with pytest.raises(SchemaError, match="Year"):
+        apply_schema(df, "deforestation")
+
+
+def test_panel_and_views_work_with_schema_dtypes(tmp_path, monkeypatch):
+    """
+    The wide panel and the geo views can be built from schema-typed datasets.
+    """
+
+    import geopandas as gpd
+    from shapely.geometry import Point
+
+    world = gpd.GeoDataFrame({"ADM0_A3": ["PRT", "ESP"], "geometry": [Point(0, 0), Point(1, 1)]}, crs="EPSG:4326")
+    monkeypatch.setattr(gpd, "read_file", lambda path: world)
+
+    data = OkavangoData.__new__(OkavangoData)
+    data.download_dir = tmp_path
+    for name, columns in [
+        ("forest_change", ["Annual change in forest area"]),
+        ("deforestation", ["Deforestation"]),
+        ("land_protected", ["Terrestrial protected areas (% of total land area)"]),
+        ("land_degraded", ["Proportion of land that is degraded over total land area (%)"]),
+        ("forest_cover", ["Share of land covered by forest"]),
+    ]:
+        df = pd.DataFrame({"Entity": ["Portugal", "Spain"], "Code": ["PRT", "ESP"], "Year": [2020, 2021], columns[0]: [1.0, 2.0]})
+        setattr(data, name, apply_schema(df, name))
+
+    geo = data.geo_deforestation
+
+    assert geo.set_index("ADM0_A3").loc["ESP", "Entity"] == "Spain"
+    assert geo["Deforestation"].tolist() == [1.0, 2.0]
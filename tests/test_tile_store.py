@@ -0,0 +1,86 @@
+import sqlite3
+from pathlib import Path
+
+from app.tile_store import TileStore
+from app.tiles import tile_for
+from fakes import FakeTileServer, tile_png
+
+
+def test_tiles_are_downloaded_once_over_one_connection(tmp_path):
+    """
+    Missing tiles are fetched over a pooled connection and stored with MBTiles (TMS) rows.
+    """
+
+    with FakeTileServer() as server:
+        tiles = TileStore(tmp_path / "tiles.mbtiles", server.url)
+        assert tiles.get(3, 4, 1) == tile_png(3, 4, 1)
+        assert tiles.get(3, 5, 1) == tile_png(3, 5, 1)
+        assert tiles.get(3, 4, 1) == tile_png(3, 4, 1)
+
+    assert server.paths() == ["/3/1/4", "/3/1/5"]
+    assert server.connections() == 1
+    with sqlite3.connect(tmp_path / "tiles.mbtiles") as conn:
+        rows = conn.execute("SELECT zoom_level, tile_column, tile_row FROM tiles ORDER BY tile_column").fetchall()
+    assert rows == [(3, 4, 6), (3, 5, 6)]
+
+
+def test_transient_failures_are_retried(tmp_path):
+    """
+    A tile server answering 503 is retried with backoff until the tile arrives.
+    """
+
+    with FakeTileServer(failures={"/3/1/4": 1}) as server:
+        tiles = TileStore(tmp_path / "tiles.mbtiles", server.url)
+        assert tiles.get(3, 4, 1) == tile_png(3, 4, 1)
+
+    assert server.paths() == ["/3/1/4", "/3/1/4"]
+
+
+def test_neighbours_are_prefetched(tmp_path):
+    """
+    A download starts the background fetch of the surrounding tiles, wrapping around the antimeridian.
+    """
+
+    with FakeTileServer() as server:
+        tiles = TileStore(tmp_path / "tiles.mbtiles", server.url, prefetch_radius=1)
+        tiles.get(3, 0, 0)
+        tiles.wait_for_prefetch()
+        tiles.get(3, 7, 1)
+
+    assert len(tiles) == 6  # columns 7, 0, 1 of rows 0 and 1; row -1 does not exist
+    assert server.paths().count("/3/1/7") == 1
+
+
+def test_loose_tiles_are_imported(tmp_path, monkeypatch):
+    """
+    Tiles saved as loose {zoom}_{x}_{y}.png files by earlier versions are packed into the store.
+    """
+
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    (image_dir / "12_2274_2224.png").write_bytes(b"old tile")
+    (image_dir / "notes.png").write_bytes(b"not a tile name")
+    tiles = TileStore(tmp_path / "tiles.mbtiles", "http://unused")
+
+    assert tiles.import_directory(image_dir) == 1
+    assert tiles.get(12, 2274, 2224) == b"old tile"
+
+    # reopening reads no file again: imported files are recorded with their size and mtime
+    reads = []
+    monkeypatch.setattr(Path, "read_bytes", lambda path: reads.append(path.name) or b"")
+    assert TileStore(tmp_path / "tiles.mbtiles", "http://unused").import_directory(image_dir) == 0
+    assert reads == []
+
+
+def test_tiles_named_by_point_are_imported(tmp_path):
+    """
+    Files named {latitude}_{longitude}_{zoom}.png, as the first version saved them, are imported under their tile.
+    """
+
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    (image_dir / "-12.6604_-67.9793_12.png").write_bytes(b"first version tile")
+    tiles = TileStore(tmp_path / "tiles.mbtiles", "http://unused")
+
+    assert tiles.import_directory(image_dir) == 1
+    assert tiles.get_local(12, *tile_for(-12.6604, -67.9793, 12)) == b"first version tile"
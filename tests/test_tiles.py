@@ -0,0 +1,32 @@
+from app.tiles import tile_center, tile_for, tile_of_file
+
+
+def test_tile_for_matches_known_tiles():
+    """
+    Coordinates resolve to the standard XYZ tile, including the grid edges.
+    """
+
+    assert tile_for(51.5074, -0.1278, 10) == (511, 340)
+    assert tile_for(0.0, 0.0, 1) == (1, 1)
+    assert tile_for(-90.0, 180.0, 3) == (7, 7)
+
+
+def test_tile_center_round_trips():
+    """
+    The centre of a tile resolves back to the same tile.
+    """
+
+    for zoom, x, y in [(10, 511, 340), (12, 1310, 2100), (3, 0, 7)]:
+        assert tile_for(*tile_center(zoom, x, y), zoom) == (x, y)
+
+
+def test_tile_files_resolve_in_both_naming_schemes():
+    """
+    Tile files named by tile and files named by clicked point (earlier versions) resolve to their tile.
+    """
+
+    assert tile_of_file("10_511_340.png") == (10, 511, 340)
+    assert tile_of_file("51.5074_-0.1278_10.png") == (10, 511, 340)
+    assert tile_of_file("-12.6604_-67.9793_12.png") == (12, *tile_for(-12.6604, -67.9793, 12))
+    assert tile_of_file("-4.2_-69.9_10.png") == (10, *tile_for(-4.2, -69.9, 10))
+    assert tile_of_file("notes.png") is None
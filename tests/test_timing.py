@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from app.timing import StageTimer
+from fakes import FakeOllama
+from latency_report import latency_percentiles, over_budget
+from tests.fake_pipeline import TileSession, make_pipeline
+
+
+def test_stage_timings_are_stored_with_the_run(tmp_path):
+    """
+    Every stage of a run is timed and stored, with the model load time and token counts of model stages.
+    """
+
+    with FakeOllama(replies={"mistral": "Flooding.\nDANGER"}) as server:
+        pipeline = make_pipeline(tmp_path, server.host, TileSession())
+        pipeline.analyse(-19.5, 22.5, 12)
+
+    timings = pipeline.store.stage_timings().set_index("stage")
+
+    assert list(timings.index) == ["tile", "prescreen", "image", "text"]
+    assert (timings["seconds"] >= 0).all()
+    assert timings.loc["image", "model"] == "llava"
+    assert timings.loc["image", "load_seconds"] == 2.0
+    assert timings.loc["text", "output_tokens"] == 34
+    assert pd.isna(timings.loc["tile", "model"])
+
+
+def test_stream_stopped_at_the_verdict_stores_no_model_times(tmp_path):
+    """
+    A text stream closed at its verdict line has no final Ollama report: its model times are stored as NULL.
+    """
+
+    with FakeOllama(replies={"mistral": "1. YES\nDANGER\nextra words here"}) as server:
+        pipeline = make_pipeline(tmp_path, server.host, TileSession())
+        pipeline.analyse(-19.5, 22.5, 12)
+
+    text = pipeline.store.stage_timings().set_index("stage").loc["text"]
+
+    assert text["model"] == "mistral"
+    assert text["seconds"] > 0
+    assert text[["load_seconds", "inference_seconds", "prompt_tokens", "output_tokens"]].isna().all()
+
+
+def test_spans_accumulate():
+    """
+    A stage timed twice keeps the total of both spans.
+    """
+
+    timer = StageTimer()
+    with timer.span("read"):
+        pass
+    first = timer.seconds()["read"]
+    with timer.span("read"):
+        pass
+
+    assert list(timer.seconds()) == ["read"]
+    assert timer.seconds()["read"] >= first
+
+
+def test_percentiles_per_stage_and_model():
+    """
+    Percentiles are computed per stage and model, plus whole runs; budgets are checked against p95.
+    """
+
+    timings = pd.DataFrame({
+        "assessment_id": [i for i in range(1, 101) for _ in range(2)],
+        "stage": ["tile", "image"] * 100,
+        "model": [None, "llava"] * 100,
+        "seconds": [v for i in range(1, 101) for v in (0.1, float(i))],
+        "load_seconds": [None, 0.0] * 100,
+        "inference_seconds": [None, 2.0] * 100,
+        "output_tokens": [None, 40] * 100,
+    })
+    # streams stopped at the verdict count for the durations only
+    timings.loc[timings["stage"].eq("image") & (timings["seconds"] > 50), "load_seconds"] = None
+    timings.loc[timings["stage"].eq("image") & (timings["seconds"] > 50), "output_tokens"] = None
+
+    summary = latency_percentiles(timings).set_index(["stage", "model"])
+
+    assert summary.loc[("image", "llava"), "runs"] == 100
+    assert summary.loc[("image", "llava"), "p50"] == pytest.approx(50.5)
+    assert summary.loc[("image", "llava"), "p95"] == pytest.approx(95.05)
+    assert summary.loc[("image", "llava"), "load_p50"] == 0
+    assert summary.loc[("image", "llava"), "tokens_per_s"] == 20
+    assert summary.loc[("total", ""), "p99"] == pytest.approx(99.11)
+    assert over_budget(summary.reset_index(), {"image": 60, "tile": 1}) == [
+        "image llava: p95 95.05s > budget 60.00s",
+    ]
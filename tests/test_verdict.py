@@ -0,0 +1,43 @@
+from app.verdict import DANGER, SAFE, VerdictWatcher, verdict_line, verdict_of
+
+
+def test_verdict_line_accepts_decorated_verdicts():
+    """
+    Lines starting with the verdict count, whatever their decoration or label.
+    """
+
+    assert verdict_line("DANGER") == DANGER
+    assert verdict_line("  **Safe.**") == SAFE
+    assert verdict_line("DANGER or SAFE: SAFE - mostly intact forest.") == SAFE
+    assert verdict_line("**Verdict:** DANGER") == DANGER
+    assert verdict_line("There is no danger here") is None
+    assert verdict_line("Danger of erosion is low") is None
+
+
+def test_verdict_of_prefers_the_verdict_line():
+    """
+    The verdict line decides, even if the explanation mentions the other word.
+    """
+
+    assert verdict_of("1. NO, there is no danger of drought.\nSAFE") == SAFE
+    assert verdict_of("4. YES\nDANGER\n") == DANGER
+    # no verdict line: fall back to looking for DANGER anywhere
+    assert verdict_of("Clear danger of erosion") == DANGER
+    assert verdict_of("Nothing notable") == SAFE
+
+
+def test_watcher_decides_once_the_verdict_line_is_complete():
+    """
+    Chunks may split the verdict; it is reported when its line ends (or at the end of the answer).
+    """
+
+    watcher = VerdictWatcher()
+    assert watcher.feed("1. YES, sprawl.\nDAN") is None
+    assert watcher.feed("GER") is None
+    assert watcher.feed("\nThanks") == DANGER
+    assert watcher.tail == "Thanks"
+
+    unterminated = VerdictWatcher()
+    unterminated.feed("4. NO\nSAFE")
+    assert unterminated.verdict is None
+    assert unterminated.finish() == SAFE